@@ -0,0 +1,9 @@
+"""
+Benchmarks for budget-tracker on large synthetic ledgers.
+
+Run from the repository root:
+
+    python -m benchmarks.run --rows 100000
+    python -m benchmarks.run --rows 10000000 --output bench/main.json
+    python -m benchmarks.run --rows 100000 --compare bench/main.json
+"""
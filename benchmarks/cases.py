@@ -0,0 +1,112 @@
+"""
+Benchmark cases, asv style: each case is a function taking a BenchContext and
+doing one unit of work; the runner times repeated calls.
+"""
+
+from datetime import date
+from typing import Callable, List, Tuple
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class BenchContext:
+    def __init__(self, spec, db_path: str, workdir: str):
+        from budget_tracker.database import get_session
+
+        self.spec = spec
+        self.db_path = db_path
+        self.workdir = workdir
+        self.session = get_session(db_path)
+        self.calls = 0
+
+    def close(self):
+        self.session.close()
+
+CASES: List[Tuple[str, Callable[[BenchContext], object]]] = []
+
+def case(name: str):
+    def register(func):
+        CASES.append((name, func))
+        return func
+    return register
+
+def _quiet_console():
+    from rich.console import Console
+    return Console(file=open(os.devnull, 'w'), width=120)
+
+@case('add_transaction')
+def add_transaction(ctx: BenchContext):
+    from budget_tracker.transactions import add_transaction
+
+    ctx.calls += 1
+    add_transaction(
+        ctx.session, 'expense', 12.34, 'Category 001', f"bench {ctx.calls}",
+        date.today().strftime('%Y-%m-%d')
+    )
+
+@case('get_transactions.first_page')
+def get_transactions_first_page(ctx: BenchContext):
+    from budget_tracker.transactions import get_transactions
+    return get_transactions(ctx.session, limit=50)
+
+@case('get_transactions.category')
+def get_transactions_category(ctx: BenchContext):
+    from budget_tracker.transactions import get_transactions
+    return get_transactions(ctx.session, limit=50, category='Category 00', type='expense')
+
+@case('get_transactions.deep_page')
+def get_transactions_deep_page(ctx: BenchContext):
+    from budget_tracker.transactions import get_transactions
+    return get_transactions(ctx.session, limit=50, after=(ctx.spec.start, 1 << 62))
+
+@case('get_budget_summary.month')
+def get_budget_summary_month(ctx: BenchContext):
+    from budget_tracker.budgets import get_budget_summary
+    return get_budget_summary(ctx.session)
+
+@case('get_budget_summary.all_time')
+def get_budget_summary_all_time(ctx: BenchContext):
+    from budget_tracker.budgets import get_budget_summary
+    return get_budget_summary(ctx.session, all_time=True)
+
+@case('generate_monthly_report')
+def generate_monthly_report(ctx: BenchContext):
+    from budget_tracker import reports
+
+    console, reports.console = reports.console, _quiet_console()
+    try:
+        reports.generate_monthly_report(ctx.session)
+    finally:
+        reports.console.file.close()
+        reports.console = console
+
+@case('export_to_csv')
+def export_to_csv(ctx: BenchContext):
+    from budget_tracker import reports
+
+    console, reports.console = reports.console, _quiet_console()
+    try:
+        reports.export_to_csv(ctx.session, os.path.join(ctx.workdir, 'export.csv'))
+    finally:
+        reports.console.file.close()
+        reports.console = console
+
+def _cli(ctx: BenchContext, *command: str):
+    subprocess.run(
+        [sys.executable, '-m', 'budget_tracker', '--db', ctx.db_path, *command],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True
+    )
+
+@case('cli.cold_start.version')
+def cli_version(ctx: BenchContext):
+    _cli(ctx, 'version')
+
+@case('cli.cold_start.list')
+def cli_list(ctx: BenchContext):
+    _cli(ctx, 'list', '--limit', '20')
+
+@case('cli.cold_start.summary')
+def cli_summary(ctx: BenchContext):
+    _cli(ctx, 'summary')
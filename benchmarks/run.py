@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Run the benchmark suite against a synthetic ledger and write JSON results.
+
+    python -m benchmarks.run                                  # 100k rows, all cases
+    python -m benchmarks.run --rows 10000000 --categories 200
+    python -m benchmarks.run -k get_transactions -k summary   # substring filter
+    python -m benchmarks.run --output bench/main.json
+    python -m benchmarks.run --compare bench/main.json --fail-above 1.25
+
+Ledgers are cached in .bench_cache/ and copied to a scratch directory before
+each run, so write benchmarks never change the cached data.
+"""
+
+from datetime import date, datetime, timezone
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from .synthetic import LedgerSpec, cached_ledger, working_copy
+from .cases import CASES, ROOT, BenchContext
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def time_case(func, ctx: BenchContext, repeat: int, warmup: int, max_time: float):
+    for _ in range(warmup):
+        func(ctx)
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < repeat:
+        start = time.perf_counter()
+        func(ctx)
+        timings.append((time.perf_counter() - start) * 1000)
+        # Slow cases (a full export of 10M rows) stop early once they've had a fair sample.
+        if len(timings) >= min(3, repeat) and time.perf_counter() - started > max_time:
+            break
+    return {
+        'runs': len(timings),
+        'min_ms': round(min(timings), 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'max_ms': round(max(timings), 3),
+        'stdev_ms': round(statistics.stdev(timings), 3) if len(timings) > 1 else 0.0,
+    }
+
+def compare(results, baseline, fail_above):
+    regressions = []
+    print(f"\n{'case':<32} {'baseline':>12} {'current':>12} {'ratio':>8}")
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            print(f"{name:<32} {'-':>12} {current['median_ms']:>10.2f}ms {'new':>8}")
+            continue
+        ratio = current['median_ms'] / previous['median_ms'] if previous['median_ms'] else float('inf')
+        marker = ''
+        if fail_above is not None and ratio > fail_above:
+            regressions.append(name)
+            marker = '  REGRESSION'
+        print(f"{name:<32} {previous['median_ms']:>10.2f}ms {current['median_ms']:>10.2f}ms {ratio:>7.2f}x{marker}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for budget-tracker on a synthetic ledger")
+    parser.add_argument("--rows", type=int, default=100000, help="transactions in the ledger (default: 100000)")
+    parser.add_argument("--categories", type=int, default=40, help="distinct categories (default: 40)")
+    parser.add_argument("--days", type=int, default=3650, help="date spread in days, ending at --end (default: 3650)")
+    parser.add_argument("--end", type=date.fromisoformat, help="last date in the ledger (default: today)")
+    parser.add_argument("--income-ratio", type=float, default=0.1, help="share of income rows (default: 0.1)")
+    parser.add_argument("--seed", type=int, default=42, help="random seed (default: 42)")
+    parser.add_argument("-k", "--filter", action="append", default=[], help="only run cases containing this substring")
+    parser.add_argument("--repeat", type=int, default=10, help="timed runs per case (default: 10)")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs per case (default: 1)")
+    parser.add_argument("--max-time", type=float, default=10.0, help="seconds per case before stopping early (default: 10)")
+    parser.add_argument("--output", "-o", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results from an earlier run to compare against")
+    parser.add_argument("--fail-above", type=float, help="with --compare, exit 1 if any median ratio exceeds this")
+    parser.add_argument("--build-only", action="store_true", help="generate and cache the ledger, then exit")
+    args = parser.parse_args()
+
+    spec = LedgerSpec(args.rows, args.categories, args.days, args.end, args.income_ratio, args.seed)
+    start = time.perf_counter()
+    path = cached_ledger(spec)
+    print(f"ledger {os.path.basename(path)} ready in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    if args.build_only:
+        return 0
+
+    cases = [(name, func) for name, func in CASES if not args.filter or any(f in name for f in args.filter)]
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='budget-bench-') as workdir:
+        ctx = BenchContext(spec, working_copy(spec, workdir), workdir)
+        try:
+            for name, func in cases:
+                results[name] = time_case(func, ctx, args.repeat, args.warmup, args.max_time)
+                stats = results[name]
+                print(f"{name:<32} median {stats['median_ms']:>10.2f} ms  min {stats['min_ms']:>10.2f} ms  ({stats['runs']} runs)")
+        finally:
+            ctx.close()
+            from budget_tracker.database import dispose_engines
+            dispose_engines()
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'ledger': spec.as_dict(),
+        },
+        'results': results,
+    }
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            json.dump(report, handle, indent=2)
+            handle.write('\n')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as handle:
+            baseline = json.load(handle)
+        if baseline['meta'].get('ledger') != report['meta']['ledger']:
+            print("warning: baseline was run on a different ledger", file=sys.stderr)
+        if compare(results, baseline['results'], args.fail_above):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
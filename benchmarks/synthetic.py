@@ -0,0 +1,115 @@
+"""
+Deterministic synthetic ledger generator.
+
+The same parameters always produce the same rows, so results from different
+commits are comparable. Generated ledgers are cached by parameters because
+building a 10M-row database takes minutes.
+"""
+
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Optional
+import os
+import random
+import shutil
+
+from sqlalchemy import insert
+
+from budget_tracker.database import Transaction, dispose_engines, get_session
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.bench_cache')
+
+WORDS = [
+    'amazon', 'refund', 'grocery', 'coffee', 'rent', 'uber', 'netflix', 'pharmacy',
+    'fuel', 'gym', 'lunch', 'dinner', 'market', 'transfer', 'insurance', 'parking',
+]
+
+class LedgerSpec:
+    def __init__(
+        self,
+        rows: int = 100000,
+        categories: int = 40,
+        days: int = 3650,
+        end: Optional[date] = None,
+        income_ratio: float = 0.1,
+        seed: int = 42
+    ):
+        self.rows = rows
+        self.categories = categories
+        self.days = days
+        self.end = end or date.today()
+        self.income_ratio = income_ratio
+        self.seed = seed
+
+    @property
+    def start(self) -> date:
+        return self.end - timedelta(days=self.days - 1)
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            'rows': self.rows,
+            'categories': self.categories,
+            'days': self.days,
+            'end': self.end.isoformat(),
+            'income_ratio': self.income_ratio,
+            'seed': self.seed,
+        }
+
+    def cache_name(self) -> str:
+        return 'ledger-{rows}-{categories}-{days}-{end}-{income_ratio}-{seed}.db'.format(**self.as_dict())
+
+def category_names(count: int) -> List[str]:
+    return [f"Category {index:03d}" for index in range(count)]
+
+def iter_rows(spec: LedgerSpec, chunk_size: int = 50000) -> Iterator[List[Dict]]:
+    rng = random.Random(spec.seed)
+    categories = category_names(spec.categories)
+    # Skewed popularity like a real ledger: a few categories dominate.
+    weights = [1.0 / (rank + 1) for rank in range(spec.categories)]
+    start = spec.start
+
+    produced = 0
+    while produced < spec.rows:
+        size = min(chunk_size, spec.rows - produced)
+        chosen = rng.choices(categories, weights, k=size)
+        chunk = []
+        for category in chosen:
+            is_income = rng.random() < spec.income_ratio
+            chunk.append({
+                'type': 'income' if is_income else 'expense',
+                'amount_minor': rng.randint(50000, 500000) if is_income else rng.randint(100, 25000),
+                'category': category,
+                'description': ' '.join(rng.sample(WORDS, 2)),
+                'date': start + timedelta(days=rng.randrange(spec.days)),
+            })
+        produced += size
+        yield chunk
+
+def build_ledger(spec: LedgerSpec, path: str, chunk_size: int = 50000) -> str:
+    if os.path.exists(path):
+        os.remove(path)
+    session = get_session(path)
+    try:
+        for chunk in iter_rows(spec, chunk_size):
+            session.execute(insert(Transaction), chunk)
+        session.commit()
+    finally:
+        session.close()
+    dispose_engines()
+    return path
+
+def cached_ledger(spec: LedgerSpec, cache_dir: str = CACHE_DIR) -> str:
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, spec.cache_name())
+    if not os.path.exists(path):
+        partial = path + '.partial'
+        build_ledger(spec, partial)
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(partial + suffix):
+                os.remove(partial + suffix)
+        os.replace(partial, path)
+    return path
+
+def working_copy(spec: LedgerSpec, directory: str) -> str:
+    path = os.path.join(directory, 'budget.db')
+    shutil.copyfile(cached_ledger(spec), path)
+    return path
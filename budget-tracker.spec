@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('budget_tracker/*.py', 'budget_tracker'), ('budget_tracker/__init__.py', 'budget_tracker')],
-    hiddenimports=['budget_tracker.database', 'budget_tracker.transactions', 'budget_tracker.budgets', 'budget_tracker.reports', 'budget_tracker.settings', 'budget_tracker.utils', 'sqlalchemy', 'rich', 'typer'],
+    hiddenimports=['budget_tracker.config', 'budget_tracker.database', 'budget_tracker.transactions', 'budget_tracker.budgets', 'budget_tracker.reports', 'budget_tracker.settings', 'budget_tracker.utils', 'budget_tracker.importers', 'budget_tracker.exporters', 'budget_tracker.rollups', 'budget_tracker.search', 'budget_tracker.client', 'budget_tracker.daemon', 'budget_tracker.ledgers', 'budget_tracker.recurring', 'budget_tracker.batch', 'budget_tracker.profiling', 'budget_tracker.output', 'budget_tracker.currency', 'budget_tracker.aio', 'dateutil.rrule', 'sqlalchemy', 'sqlalchemy.dialects.sqlite', 'rich', 'typer'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -3,7 +3,7 @@
 Budget Tracker - Main entry point for PyInstaller
 """
 
-from .cli import main
+from .client import main
 
 if __name__ == "__main__":
     main()
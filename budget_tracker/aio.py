@@ -0,0 +1,100 @@
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+import threading
+from . import budgets, reports, transactions
+from .config import get_ledger, get_sqlite_pragmas
+from .database import _apply_pragmas, _engine_options, get_engine, resolve_db_path
+from .reports import CategoryTrendRow, MonthlyReport, TrendRow
+from .transactions import Cursor, TransactionRow, transaction_row
+
+# Async variants of the core API for asyncio applications. Queries run through
+# AsyncSession.run_sync on the aiosqlite driver, so they share their SQL with
+# the sync functions but never block the event loop on SQLite I/O. Results are
+# plain tuples, never ORM objects, so nothing lazy-loads after the call.
+
+_async_engines: Dict[str, AsyncEngine] = {}
+_async_session_factories: Dict[str, async_sessionmaker] = {}
+_registry_lock = threading.Lock()
+
+def get_async_engine(db_path: Optional[str] = None, ledger: Optional[str] = None) -> AsyncEngine:
+    path = resolve_db_path(db_path, ledger)
+    engine = _async_engines.get(path)
+    if engine is not None:
+        return engine
+
+    with _registry_lock:
+        engine = _async_engines.get(path)
+        if engine is None:
+            # Schema creation and migrations run once, synchronously, through
+            # the regular engine; call this at application startup.
+            get_engine(path)
+            url, options = _engine_options(path, 'sqlite+aiosqlite')
+            engine = create_async_engine(url, echo=False, **options)
+            _apply_pragmas(engine.sync_engine, get_sqlite_pragmas())
+            _async_engines[path] = engine
+            _async_session_factories[path] = async_sessionmaker(engine, expire_on_commit=False)
+    return engine
+
+def get_async_session(db_path: Optional[str] = None, ledger: Optional[str] = None) -> AsyncSession:
+    ledger = ledger or get_ledger()
+    get_async_engine(db_path, ledger)
+    return _async_session_factories[resolve_db_path(db_path, ledger)](info={'ledger': ledger})
+
+async def dispose_async_engines():
+    with _registry_lock:
+        engines = list(_async_engines.values())
+        _async_engines.clear()
+        _async_session_factories.clear()
+    for engine in engines:
+        await engine.dispose()
+
+async def add_transaction(
+    session: AsyncSession,
+    type: str,
+    amount: float,
+    category: str,
+    description: str = "",
+    transaction_date: Optional[str] = None,
+    currency: Optional[str] = None
+) -> TransactionRow:
+    return await session.run_sync(lambda sync_session: transaction_row(transactions.add_transaction(
+        sync_session, type, amount, category, description, transaction_date, currency=currency
+    )))
+
+async def get_transactions(
+    session: AsyncSession,
+    limit: int = 50,
+    category: Optional[str] = None,
+    type: Optional[str] = None,
+    after: Optional[Cursor] = None,
+    category_match: str = 'contains'
+) -> List[TransactionRow]:
+    return await session.run_sync(lambda sync_session: [
+        transaction_row(transaction)
+        for transaction in transactions.get_transactions(sync_session, limit, category, type, after, category_match)
+    ])
+
+async def delete_transaction(session: AsyncSession, transaction_id: int) -> bool:
+    return await session.run_sync(transactions.delete_transaction, transaction_id)
+
+async def get_budget_summary(session: AsyncSession, all_time: bool = False) -> Tuple[float, float, float]:
+    return await session.run_sync(budgets.get_budget_summary, all_time)
+
+async def get_savings_progress(session: AsyncSession) -> Tuple[float, float, float]:
+    return await session.run_sync(budgets.get_savings_progress)
+
+async def get_monthly_report(session: AsyncSession, month: Optional[date] = None) -> MonthlyReport:
+    return await session.run_sync(reports.get_monthly_report, month)
+
+async def get_period_trends(
+    session: AsyncSession,
+    start_date: date,
+    end_date: date,
+    by: str = 'month',
+    window: int = 3
+) -> List[TrendRow]:
+    return await session.run_sync(reports.get_period_trends, start_date, end_date, by, window)
+
+async def get_category_trends(session: AsyncSession, start_date: date, end_date: date) -> List[CategoryTrendRow]:
+    return await session.run_sync(reports.get_category_trends, start_date, end_date)
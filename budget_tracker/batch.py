@@ -0,0 +1,223 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from itertools import repeat
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+import os
+from rich.console import Console
+from .currency import foreign_totals
+from .database import FOREIGN, NATIVE, NOT_DELETED, SCHEMA_VERSION, MonthlyRollup, Settings, Transaction, create_readonly_engine
+from .reports import MonthlyCategoryRow, _month_periods
+from .rollups import month_key
+from .utils import add_months, format_currency, from_minor
+
+console = Console()
+
+# (month, category, type) -> total in minor units. Partials from different
+# files merge by plain addition, so workers return them unrendered.
+Totals = Dict[Tuple[str, str, str], int]
+
+class FilePartial(NamedTuple):
+    path: str
+    currency_symbol: str
+    totals: Totals
+
+def open_readonly_session(db_path: str) -> Session:
+    # A private engine per worker: nothing is shared across the fork, and
+    # mode=ro means a batch run can never migrate or write to a ledger file.
+    return Session(bind=create_readonly_engine(db_path, poolclass=NullPool))
+
+def _add_rows(totals: Totals, rows: Iterable[Tuple[str, str, str, int]]):
+    for month, category, trans_type, total in rows:
+        key = (month, category, trans_type)
+        totals[key] = totals.get(key, 0) + total
+
+def get_partial_totals(session: Session, start_date: date, end_date: date, ledger: Optional[str] = None) -> Totals:
+    # Same split as reports._monthly_totals: whole months from the rollups,
+    # partial edge months from transactions, and rows in other currencies
+    # converted into their own ledger's currency.
+    first_full = start_date if start_date.day == 1 else add_months(start_date, 1)
+    last_full = date(end_date.year, end_date.month, 1)
+    totals: Totals = {}
+
+    if first_full < last_full:
+        query = session.query(
+            MonthlyRollup.month, MonthlyRollup.category, MonthlyRollup.type, func.sum(MonthlyRollup.total)
+        ).filter(MonthlyRollup.month >= month_key(first_full), MonthlyRollup.month < month_key(last_full))
+        if ledger:
+            query = query.filter(MonthlyRollup.ledger_id == ledger)
+        _add_rows(totals, query.group_by(MonthlyRollup.month, MonthlyRollup.category, MonthlyRollup.type))
+        edges = [(start_date, first_full), (last_full, end_date)]
+    else:
+        edges = [(start_date, end_date)]
+
+    month = func.strftime('%Y-%m', Transaction.date)
+    for low, high in edges:
+        if low >= high:
+            continue
+        query = session.query(month, Transaction.category, Transaction.type, func.sum(Transaction.amount_minor)).filter(
+            NOT_DELETED, NATIVE, Transaction.date >= low, Transaction.date < high
+        )
+        if ledger:
+            query = query.filter(Transaction.ledger_id == ledger)
+        _add_rows(totals, query.group_by(month, Transaction.category, Transaction.type))
+
+    if ledger:
+        foreign_ledgers = [ledger]
+    else:
+        foreign_ledgers = [row[0] for row in session.query(Transaction.ledger_id).filter(
+            FOREIGN, NOT_DELETED, Transaction.date >= start_date, Transaction.date < end_date
+        ).distinct()]
+    for ledger_id in foreign_ledgers:
+        target = session.query(Settings.currency_code).filter(Settings.ledger_id == ledger_id).scalar()
+        foreign = foreign_totals(
+            session, [month, Transaction.category, Transaction.type], start_date, end_date,
+            conditions=[Transaction.ledger_id == ledger_id], target=target or ''
+        )
+        _add_rows(totals, (key + (total,) for key, total in foreign.items()))
+    return totals
+
+def aggregate_file(db_path: str, start_date: date, end_date: date, ledger: Optional[str] = None) -> FilePartial:
+    session = open_readonly_session(db_path)
+    try:
+        version = session.connection().exec_driver_sql("PRAGMA user_version").scalar()
+        if version < SCHEMA_VERSION:
+            raise ValueError(
+                f"{db_path}: schema version {version} is older than {SCHEMA_VERSION}; "
+                f"run any budget command on it once to upgrade"
+            )
+        symbols = session.query(Settings.currency_symbol)
+        if ledger:
+            symbols = symbols.filter(Settings.ledger_id == ledger)
+        symbol = symbols.order_by(Settings.id).limit(1).scalar() or '$'
+        return FilePartial(db_path, symbol, get_partial_totals(session, start_date, end_date, ledger))
+    finally:
+        session.close()
+        session.get_bind().dispose()
+
+def merge_totals(partials: Iterable[Totals]) -> Totals:
+    merged: Totals = {}
+    for totals in partials:
+        for key, total in totals.items():
+            merged[key] = merged.get(key, 0) + total
+    return merged
+
+class BatchFileRow(NamedTuple):
+    path: str
+    income: float
+    expenses: float
+    net: float
+
+class BatchMonthRow(NamedTuple):
+    month: str
+    income: float
+    expenses: float
+    net: float
+
+class BatchReport(NamedTuple):
+    start: date
+    # Exclusive, like every other end date in the reports.
+    end: date
+    files: List[BatchFileRow]
+    months: List[BatchMonthRow]
+    categories: List[MonthlyCategoryRow]
+    total_income: float
+    total_expenses: float
+    net: float
+    # Empty when the files disagree on their currency symbol.
+    currency_symbol: str
+
+def _type_sums(totals: Totals) -> Tuple[int, int]:
+    income = sum(total for (_, _, trans_type), total in totals.items() if trans_type == 'income')
+    expenses = sum(total for (_, _, trans_type), total in totals.items() if trans_type == 'expense')
+    return income, expenses
+
+def build_batch_report(partials: List[FilePartial], start_date: date, end_date: date) -> BatchReport:
+    merged = merge_totals(partial.totals for partial in partials)
+
+    files = []
+    for partial in partials:
+        income, expenses = _type_sums(partial.totals)
+        files.append(BatchFileRow(partial.path, from_minor(income), from_minor(expenses), from_minor(income - expenses)))
+
+    by_month = {month: [0, 0] for month in _month_periods(start_date, end_date)}
+    by_category: Dict[str, int] = {}
+    for (month, category, trans_type), total in merged.items():
+        is_expense = trans_type == 'expense'
+        by_month.setdefault(month, [0, 0])[is_expense] += total
+        by_category[category] = by_category.get(category, 0) + (total if is_expense else -total)
+
+    months = [
+        BatchMonthRow(month, from_minor(income), from_minor(expenses), from_minor(income - expenses))
+        for month, (income, expenses) in sorted(by_month.items())
+    ]
+    categories = [
+        MonthlyCategoryRow(category, from_minor(amount), 'expense' if amount > 0 else 'income')
+        for category, amount in sorted(by_category.items(), key=lambda x: abs(x[1]), reverse=True)
+    ]
+    income, expenses = _type_sums(merged)
+    symbols = {partial.currency_symbol for partial in partials}
+    return BatchReport(
+        start_date, end_date, files, months, categories,
+        from_minor(income), from_minor(expenses), from_minor(income - expenses),
+        symbols.pop() if len(symbols) == 1 else ''
+    )
+
+def batch_report(
+    db_paths: List[str],
+    start_date: date,
+    end_date: date,
+    jobs: Optional[int] = None,
+    ledger: Optional[str] = None
+) -> BatchReport:
+    jobs = min(jobs or os.cpu_count() or 1, len(db_paths))
+    args = (db_paths, repeat(start_date), repeat(end_date), repeat(ledger))
+    if jobs <= 1:
+        partials = list(map(aggregate_file, *args))
+    else:
+        # One task per file; each worker opens its own read-only connection and
+        # only the small partial aggregates travel back to be merged here.
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            partials = list(executor.map(aggregate_file, *args))
+    return build_batch_report(partials, start_date, end_date)
+
+def render_batch_report(report: BatchReport, title: str):
+    from rich.table import Table
+    from rich import box
+
+    symbol = report.currency_symbol
+
+    def money(value: float) -> str:
+        return ("-" if value < 0 else "") + format_currency(value, symbol)
+
+    files = Table(title=title, box=box.ROUNDED)
+    files.add_column("File", style="cyan")
+    files.add_column("Income", style="green", justify="right")
+    files.add_column("Expenses", style="red", justify="right")
+    files.add_column("Net", style="blue", justify="right")
+    for row in report.files:
+        files.add_row(row.path, money(row.income), money(row.expenses), money(row.net))
+    console.print(files)
+
+    months = Table(title="By Month", box=box.ROUNDED)
+    months.add_column("Month", style="cyan")
+    months.add_column("Income", style="green", justify="right")
+    months.add_column("Expenses", style="red", justify="right")
+    months.add_column("Net", style="blue", justify="right")
+    for row in report.months:
+        months.add_row(row.month, money(row.income), money(row.expenses), money(row.net))
+    console.print(months)
+
+    categories = Table(title="By Category", box=box.ROUNDED)
+    categories.add_column("Category", style="cyan")
+    categories.add_column("Amount", style="green", justify="right")
+    categories.add_column("Type", style="magenta")
+    for row in report.categories:
+        categories.add_row(row.category, format_currency(row.amount, symbol), row.type.capitalize())
+    console.print(categories)
+
+    console.print(f"\nTotal Income: [green]{format_currency(report.total_income, symbol)}[/green]")
+    console.print(f"Total Expenses: [red]{format_currency(report.total_expenses, symbol)}[/red]")
+    console.print(f"Net: [blue]{money(report.net)}[/blue]")
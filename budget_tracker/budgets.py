@@ -1,71 +1,62 @@
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from datetime import date
-from typing import Tuple
-from rich.progress import Progress, BarColumn, TextColumn
+from typing import Dict, List, NamedTuple, Optional, Tuple
 from rich.console import Console
-from .database import Settings, Transaction
-from .utils import get_current_month_range, format_currency
+from .currency import foreign_totals
+from .database import CategoryBudget, MonthlyRollup, Settings, Transaction, normalize_category, session_ledger
+from .profiling import timed
+from .settings import load_settings, update_settings
+from .rollups import get_type_totals, month_key
+from .utils import get_current_month_range, format_currency, from_minor, parse_period_bound, to_minor
 
 console = Console()
 
 def set_monthly_budget(session: Session, amount: float) -> Settings:
-    settings = session.query(Settings).first()
-    if not settings:
-        settings = Settings(monthly_budget=amount)
-        session.add(settings)
-    else:
-        settings.monthly_budget = amount
-
-    session.commit()
-    return settings
+    return update_settings(session, monthly_budget=amount)
 
 def set_savings_goal(session: Session, amount: float, name: str = "Savings Goal") -> Settings:
-    settings = session.query(Settings).first()
-    if not settings:
-        settings = Settings(savings_goal_amount=amount, savings_goal_name=name)
-        session.add(settings)
-    else:
-        settings.savings_goal_amount = amount
-        settings.savings_goal_name = name
+    return update_settings(session, savings_goal_amount=amount, savings_goal_name=name)
 
-    session.commit()
-    return settings
+class BudgetSummary(NamedTuple):
+    budget: float
+    spent: float
+    remaining: float
 
-def get_budget_summary(session: Session, all_time: bool = False) -> Tuple[float, float, float]:
-    settings = session.query(Settings).first()
-    if not settings or settings.monthly_budget == 0:
-        return 0.0, 0.0, 0.0
+    @property
+    def progress(self) -> Optional[float]:
+        return self.spent / self.budget * 100 if self.budget > 0 else None
+
+@timed()
+def get_budget_summary(session: Session, all_time: bool = False) -> BudgetSummary:
+    settings = load_settings(session)
+    if settings.monthly_budget_minor == 0:
+        return BudgetSummary(0.0, 0.0, 0.0)
 
     if all_time:
-        transactions = session.query(Transaction).filter(
-            Transaction.type == 'expense'
-        ).all()
+        totals = get_type_totals(session)
     else:
         start_date, end_date = get_current_month_range()
-        transactions = session.query(Transaction).filter(
-            Transaction.date >= start_date,
-            Transaction.date < end_date,
-            Transaction.type == 'expense'
-        ).all()
-
-    total_spent = sum(t.amount for t in transactions)
-    remaining = settings.monthly_budget - total_spent
+        totals = get_type_totals(session, month_key(start_date))
 
-    return settings.monthly_budget, total_spent, remaining
-
-def show_budget_summary(session: Session, all_time: bool = False):
-    budget, spent, remaining = get_budget_summary(session, all_time)
-    settings = session.query(Settings).first()
-    currency_symbol = settings.currency_symbol if settings else '$'
+    spent_minor = totals.get('expense', 0)
+    return BudgetSummary(
+        settings.monthly_budget, from_minor(spent_minor), from_minor(settings.monthly_budget_minor - spent_minor)
+    )
 
+@timed()
+def render_budget_summary(summary: BudgetSummary, currency_symbol: str, all_time: bool = False):
+    budget, spent, remaining = summary
     time_period = "All Time" if all_time else "Current Month"
     console.print(f"\n[bold blue]📊 Budget Summary ({time_period})[/bold blue]")
     console.print(f"Monthly Budget: [green]{format_currency(budget, currency_symbol)}[/green]")
     console.print(f"Total Spent: [red]{format_currency(spent, currency_symbol)}[/red]")
     console.print(f"Remaining: [green]{format_currency(remaining, currency_symbol)}[/green]")
 
-    if budget > 0:
-        progress = (spent / budget) * 100
+    if summary.progress is not None:
+        from rich.progress import Progress, BarColumn, TextColumn
+
+        progress = summary.progress
         console.print(f"\nProgress: {progress:.1f}% spent")
 
         if progress <= 100:
@@ -78,19 +69,144 @@ def show_budget_summary(session: Session, all_time: bool = False):
         else:
             console.print("[red]⚠️  Budget exceeded![/red]")
 
+def show_budget_summary(session: Session, all_time: bool = False):
+    summary = get_budget_summary(session, all_time)
+    render_budget_summary(summary, load_settings(session).currency_symbol, all_time)
+
+@timed()
 def get_savings_progress(session: Session) -> Tuple[float, float, float]:
-    settings = session.query(Settings).first()
-    if not settings or settings.savings_goal_amount == 0:
+    settings = load_settings(session)
+    if settings.savings_goal_minor == 0:
         return 0.0, 0.0, 0.0
 
     start_date, end_date = get_current_month_range()
-    transactions = session.query(Transaction).filter(
-        Transaction.date >= start_date,
-        Transaction.date < end_date
-    ).all()
+    totals = get_type_totals(session, month_key(start_date))
 
-    total_income = sum(t.amount for t in transactions if t.type == 'income')
-    total_expenses = sum(t.amount for t in transactions if t.type == 'expense')
-    monthly_surplus = total_income - total_expenses
+    monthly_surplus = from_minor(totals.get('income', 0) - totals.get('expense', 0))
 
     return settings.savings_goal_amount, monthly_surplus, (monthly_surplus / settings.savings_goal_amount * 100) if settings.savings_goal_amount > 0 else 0
+
+DEFAULT_WARN_PERCENT = 80
+
+def set_category_budget(
+    session: Session,
+    category: str,
+    amount: float,
+    warn_percent: int = DEFAULT_WARN_PERCENT
+) -> Optional[CategoryBudget]:
+    # A zero amount removes the category's budget.
+    if not 0 < warn_percent <= 100:
+        raise ValueError("Warning threshold must be between 1 and 100 percent")
+    ledger = session_ledger(session)
+    key = normalize_category(category)
+    budget = session.get(CategoryBudget, (ledger, key))
+    if to_minor(amount) <= 0:
+        if budget:
+            session.delete(budget)
+            session.commit()
+        return None
+    if budget is None:
+        budget = CategoryBudget(ledger_id=ledger, category_key=key)
+        session.add(budget)
+    budget.category = category.strip()
+    budget.amount_minor = to_minor(amount)
+    budget.warn_percent = warn_percent
+    session.commit()
+    return budget
+
+def _month_expenses_by_key(session: Session, month: str, key: Optional[str] = None) -> Dict[str, int]:
+    # The month's running totals from the trigger-maintained rollups, read off
+    # the (ledger, month, category_key) index; given a key, only that key's
+    # rows are read. Only expenses in another currency come from the
+    # transactions, converted.
+    ledger = session_ledger(session)
+    query = session.query(MonthlyRollup.category_key, func.sum(MonthlyRollup.total)).filter(
+        MonthlyRollup.ledger_id == ledger,
+        MonthlyRollup.month == month,
+        MonthlyRollup.type == 'expense'
+    )
+    conditions = [Transaction.ledger_id == ledger, Transaction.type == 'expense']
+    if key is not None:
+        query = query.filter(MonthlyRollup.category_key == key)
+        conditions.append(Transaction.category_key == key)
+    totals: Dict[str, int] = dict(query.group_by(MonthlyRollup.category_key).all())
+    for (category_key,), total in foreign_totals(
+        session, [Transaction.category_key], parse_period_bound(month), parse_period_bound(month, end=True),
+        conditions=conditions
+    ).items():
+        totals[category_key] = totals.get(category_key, 0) + total
+    return totals
+
+class BudgetAlert(NamedTuple):
+    category: str
+    # The highest threshold crossed by the transaction: warn_percent or 100.
+    threshold: int
+    spent: float
+    budget: float
+
+@timed()
+def check_category_budget(session: Session, category: str, day: date, amount_minor: int) -> Optional[BudgetAlert]:
+    key = normalize_category(category)
+    budget = session.get(CategoryBudget, (session_ledger(session), key))
+    if budget is None:
+        return None
+    spent = _month_expenses_by_key(session, month_key(day), key).get(key, 0)
+    before = spent - amount_minor
+    crossed = [
+        threshold for threshold in (budget.warn_percent, 100)
+        if before * 100 < threshold * budget.amount_minor <= spent * 100
+    ]
+    if not crossed:
+        return None
+    return BudgetAlert(budget.category, max(crossed), from_minor(spent), budget.amount)
+
+class CategoryBudgetRow(NamedTuple):
+    category: str
+    budget: float
+    spent: float
+    remaining: float
+    percent: float
+    warn_percent: int
+
+@timed()
+def get_category_budgets(session: Session, month: Optional[date] = None) -> List[CategoryBudgetRow]:
+    budgets = session.query(CategoryBudget).filter(
+        CategoryBudget.ledger_id == session_ledger(session)
+    ).order_by(CategoryBudget.category_key).all()
+    if not budgets:
+        return []
+    spent = _month_expenses_by_key(session, month_key(month or get_current_month_range()[0]))
+    rows = []
+    for budget in budgets:
+        total = spent.get(budget.category_key, 0)
+        rows.append(CategoryBudgetRow(
+            budget.category,
+            budget.amount,
+            from_minor(total),
+            from_minor(budget.amount_minor - total),
+            total / budget.amount_minor * 100,
+            budget.warn_percent
+        ))
+    return rows
+
+@timed()
+def render_category_budgets(rows: List[CategoryBudgetRow], currency_symbol: str):
+    from rich.table import Table
+    from rich import box
+
+    table = Table(title="Category Budgets (Current Month)", box=box.ROUNDED)
+    table.add_column("Category", style="cyan")
+    table.add_column("Budget", justify="right")
+    table.add_column("Spent", style="red", justify="right")
+    table.add_column("Remaining", justify="right")
+    table.add_column("Used", justify="right")
+    for row in rows:
+        style = "red" if row.percent >= 100 else "yellow" if row.percent >= row.warn_percent else "green"
+        table.add_row(
+            row.category,
+            format_currency(row.budget, currency_symbol),
+            format_currency(row.spent, currency_symbol),
+            ("-" if row.remaining < 0 else "") + format_currency(row.remaining, currency_symbol),
+            f"[{style}]{row.percent:.0f}%[/{style}]"
+        )
+    console.print(table)
@@ -1,18 +1,45 @@
 import typer
 from rich.console import Console
-from rich.table import Table
-from rich.panel import Panel
-from rich import box
-from datetime import datetime
-from typing import Optional
+from datetime import timedelta
+from typing import Callable, Iterator, List, Optional
 import sys
-from .database import get_session
-from . import transactions, budgets, reports, settings
-from .utils import validate_amount, validate_date
+from . import config
+from .utils import validate_amount, validate_date, get_current_month_range, add_months, parse_period_bound, format_minor
+
+# SQLAlchemy, rich tables/progress and the feature modules are imported inside
+# the commands that use them, so `budget version`/`budget help` start fast.
 
 app = typer.Typer(help="Terminal-based budget tracker", add_completion=False)
+recurring_app = typer.Typer(help="Recurring transactions such as salary, rent and subscriptions")
+app.add_typer(recurring_app, name="recurring")
+rates_app = typer.Typer(help="Exchange-rate tables for amounts in other currencies")
+app.add_typer(rates_app, name="rates")
 console = Console()
 
+def get_session(post_due: bool = True, read_only: bool = False):
+    from .database import get_readonly_session, get_session as open_session
+
+    if read_only:
+        # Read-only commands read one snapshot through a mode=ro connection, so
+        # they never wait on a writer. Only when a recurring rule has fallen due
+        # do they briefly open a writable session to post it first.
+        session = get_readonly_session()
+        if not post_due:
+            return session
+        from .recurring import has_due
+        if not has_due(session):
+            return session
+        session.close()
+        get_session().close()
+        return get_readonly_session()
+
+    session = open_session()
+    if post_due:
+        from .recurring import materialize
+        # Recurring rules post whatever fell due since the last command.
+        materialize(session)
+    return session
+
 def show_welcome():
     welcome_art = """
 [bold cyan]
@@ -28,78 +55,351 @@ def show_welcome():
 """
     console.print(welcome_art)
 
+def finish_profile(show: bool):
+    from . import profiling
+
+    report = profiling.disable()
+    if show:
+        # stderr, so --format json/csv output stays machine-readable.
+        profiling.render_profile(report, Console(stderr=True))
+
 @app.callback(invoke_without_command=True)
-def main_callback(ctx: typer.Context):
+def main_callback(
+    ctx: typer.Context,
+    db: Optional[str] = typer.Option(None, "--db", envvar="BUDGET_DB", help="Path to the SQLite database file"),
+    ledger: Optional[str] = typer.Option(None, "--ledger", envvar="BUDGET_LEDGER", help="Ledger to work on (default: 'default')"),
+    profile: bool = typer.Option(False, "--profile", help="Print a timing and SQL breakdown to stderr after the command"),
+    profile_out: Optional[str] = typer.Option(None, "--profile-out", help="Write cProfile stats to this file (read with python -m pstats)")
+):
     """Budget Tracker - Manage your finances from terminal"""
+    try:
+        if db and config.get_shard_dir():
+            raise ValueError("--db/BUDGET_DB cannot be combined with BUDGET_SHARD_DIR")
+        config.set_ledger(ledger)
+        config.get_sqlite_pragmas()
+    except ValueError as e:
+        console.print(f"[red]Error: {e}[/red]")
+        raise typer.Exit(1)
+    config.set_db_path(db)
+    if profile or profile_out:
+        from . import profiling
+        profiling.enable(profile_out)
+        ctx.call_on_close(lambda: finish_profile(profile))
     if ctx.invoked_subcommand is None:
         show_welcome()
 
 @app.command()
 def add(
-    type: str = typer.Argument(..., help="Type: expense or income"),
-    amount: str = typer.Argument(..., help="Transaction amount"),
-    category: str = typer.Argument(..., help="Transaction category"),
+    type: Optional[str] = typer.Argument(None, help="Type: expense or income"),
+    amount: Optional[str] = typer.Argument(None, help="Transaction amount"),
+    category: Optional[str] = typer.Argument(None, help="Transaction category"),
     description: str = typer.Argument("", help="Transaction description"),
-    date: Optional[str] = typer.Option(None, "--date", "-d", help="Date (YYYY-MM-DD, MM/DD/YYYY, or DD/MM/YYYY)")
+    date: Optional[str] = typer.Option(None, "--date", "-d", help="Date (YYYY-MM-DD, MM/DD/YYYY, or DD/MM/YYYY)"),
+    currency: Optional[str] = typer.Option(None, "--currency", "-C", help="ISO code when the amount is not in the ledger's currency"),
+    stdin: bool = typer.Option(False, "--stdin", help="Read one JSON record per line from stdin instead"),
+    batch_size: int = typer.Option(config.DEFAULT_ADD_BATCH_SIZE, "--batch-size", help="With --stdin: records per commit"),
+    batch_window: float = typer.Option(config.DEFAULT_ADD_BATCH_WINDOW, "--batch-window", help="With --stdin: seconds before a partial batch is committed")
 ):
     """Add a new transaction"""
+    if stdin:
+        if type is not None:
+            console.print("[red]Error: --stdin takes no TYPE/AMOUNT/CATEGORY arguments[/red]")
+            raise typer.Exit(1)
+        add_from_stdin(batch_size, batch_window)
+        return
+    if type is None or amount is None or category is None:
+        console.print("[red]Error: TYPE, AMOUNT and CATEGORY are required (or use --stdin)[/red]")
+        raise typer.Exit(1)
+
+    from . import transactions, settings
+    from .currency import Converter, MissingRateError, format_amount
+
     session = get_session()
     try:
         validated_amount = validate_amount(amount)
+        alerts = []
         transaction = transactions.add_transaction(
-            session, type, validated_amount, category, description, date
+            session, type, validated_amount, category, description, date, on_alert=alerts.append, currency=currency
         )
         currency_symbol = settings.get_currency_symbol(session)
-        console.print(f"[green]✓ Added {type}: {currency_symbol}{validated_amount:.2f} to {category}[/green]")
+        if transaction.currency:
+            amount_display = format_amount(validated_amount, transaction.currency, currency_symbol)
+            console.print(f"[green]✓ Added {type}: {amount_display} to {category}[/green]")
+            try:
+                Converter(session).factor(transaction.currency, transaction.date)
+            except MissingRateError as e:
+                console.print(f"[yellow]⚠️  {e}. Until then this amount is left out of totals.[/yellow]")
+        else:
+            console.print(f"[green]✓ Added {type}: {currency_symbol}{validated_amount:.2f} to {category}[/green]")
+        for alert in alerts:
+            style = "red" if alert.threshold >= 100 else "yellow"
+            console.print(
+                f"[{style}]⚠️  {alert.category} is at {alert.spent / alert.budget * 100:.0f}% of its "
+                f"{currency_symbol}{alert.budget:.2f} monthly budget ({currency_symbol}{alert.spent:.2f} spent)[/{style}]"
+            )
+    except ValueError as e:
+        console.print(f"[red]Error: {e}[/red]")
+    finally:
+        session.close()
+
+def read_lines(handle, timeout: Callable[[], Optional[float]]) -> Iterator[Optional[str]]:
+    # Lines from handle, read on a helper thread so the caller never blocks for
+    # longer than timeout() seconds: None is yielded each time it runs out.
+    import queue
+    import threading
+
+    lines: "queue.Queue" = queue.Queue()
+
+    def reader():
+        try:
+            for line in handle:
+                lines.put(line)
+        except Exception as e:
+            lines.put(e)
+        finally:
+            lines.put(StopIteration)
+
+    threading.Thread(target=reader, name="budget-stdin", daemon=True).start()
+    while True:
+        try:
+            line = lines.get(timeout=timeout())
+        except queue.Empty:
+            yield None
+            continue
+        if line is StopIteration:
+            return
+        if isinstance(line, Exception):
+            raise line
+        yield line
+
+def add_from_stdin(batch_size: int, batch_window: float):
+    import json
+    from . import transactions
+
+    errors = []
+    session = get_session()
+    try:
+        # Same fields `export --format jsonl` writes, so an export can be replayed; 'id' is ignored.
+        with transactions.TransactionBatch(session, batch_size, batch_window) as batch:
+            line_number = 0
+            for line in read_lines(sys.stdin, batch.time_left):
+                if line is None:
+                    # The stream went quiet: commit what is pending within the window.
+                    batch.flush()
+                    continue
+                line_number += 1
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    if not isinstance(record, dict):
+                        raise ValueError("Expected a JSON object")
+                    missing = [field for field in ('type', 'amount', 'category') if record.get(field) in (None, '')]
+                    if missing:
+                        raise ValueError(f"Missing {', '.join(missing)}")
+                    batch.add(
+                        str(record['type']), record['amount'], str(record['category']),
+                        str(record.get('description') or ''), record.get('date') or None,
+                        record.get('currency') or None
+                    )
+                except ValueError as e:
+                    errors.append((line_number, str(e)))
     except ValueError as e:
         console.print(f"[red]Error: {e}[/red]")
+        raise typer.Exit(1)
     finally:
         session.close()
 
+    console.print(f"[green]✓ Added {batch.committed} transactions[/green]")
+    if errors:
+        console.print(f"[yellow]Skipped {len(errors)} invalid lines[/yellow]")
+        print_row_errors(errors)
+
 @app.command(name="list")
 def list_transactions(
     limit: int = typer.Option(20, "--limit", "-l", help="Number of transactions to show (default: 20)"),
-    category: Optional[str] = typer.Option(None, "--category", "-c", help="Filter by category"),
-    type: Optional[str] = typer.Option(None, "--type", "-t", help="Filter by type: expense or income")
+    category: Optional[str] = typer.Option(None, "--category", "-c", help="Filter by category (case-insensitive)"),
+    type: Optional[str] = typer.Option(None, "--type", "-t", help="Filter by type: expense or income"),
+    match: str = typer.Option("contains", "--match", "-m", help="Category match, ignoring case: contains (substring), prefix or exact"),
+    after: Optional[str] = typer.Option(None, "--after", help="Continue after cursor DATE,ID from the previous page"),
+    output_format: str = typer.Option("table", "--format", help="Output format: table, json or csv")
 ):
     """List recent transactions with optional filtering"""
-    session = get_session()
+    from . import transactions, reports, settings, output
+
+    session = get_session(read_only=True)
     try:
-        reports.show_category_report(session, category, type, limit)
+        output.check_format(output_format)
+        cursor = transactions.parse_cursor(after) if after else None
+        page = reports.get_transaction_page(session, category, type, limit, cursor, match)
+        output.emit(
+            output_format, page,
+            lambda: reports.render_transaction_page(page, settings.get_currency_symbol(session), category, type),
+            page.transactions, transactions.TransactionRow._fields
+        )
+    except ValueError as e:
+        console.print(f"[red]Error: {e}[/red]")
     finally:
         session.close()
 
 @app.command()
-def delete(transaction_id: int = typer.Argument(..., help="ID of transaction to delete")):
-    """Delete a transaction by ID"""
+def search(
+    query: str = typer.Argument(..., help="Words to find in descriptions and categories"),
+    limit: int = typer.Option(20, "--limit", "-l", help="Number of results to show (default: 20)"),
+    prefix: bool = typer.Option(False, "--prefix", "-p", help="Match words starting with each term"),
+    phrase: bool = typer.Option(False, "--phrase", help="Match the whole query as an exact phrase"),
+    raw: bool = typer.Option(False, "--raw", help="Pass the query through as FTS5 syntax (AND/OR/NOT, NEAR, col:)"),
+    start: Optional[str] = typer.Option(None, "--from", help="Only transactions on or after this date"),
+    end: Optional[str] = typer.Option(None, "--to", help="Only transactions on or before this date"),
+    type: Optional[str] = typer.Option(None, "--type", "-t", help="Filter by type: expense or income")
+):
+    """Full-text search over transaction descriptions, ranked by relevance"""
+    from .search import show_search_results
+
+    mode = "raw" if raw else "phrase" if phrase else "prefix" if prefix else "terms"
+    session = get_session(read_only=True)
+    try:
+        start_date = validate_date(start) if start else None
+        end_date = validate_date(end) + timedelta(days=1) if end else None
+        show_search_results(session, query, mode, limit, start_date, end_date, type)
+    except ValueError as e:
+        console.print(f"[red]Error: {e}[/red]")
+    finally:
+        session.close()
+
+@app.command()
+def delete(
+    transaction_ids: Optional[List[str]] = typer.Argument(None, help="IDs or ranges to delete, e.g. 5 10-20"),
+    start: Optional[str] = typer.Option(None, "--from", help="Only transactions on or after this date"),
+    end: Optional[str] = typer.Option(None, "--to", help="Only transactions on or before this date"),
+    category: Optional[str] = typer.Option(None, "--category", "-c", help="Only this category"),
+    type: Optional[str] = typer.Option(None, "--type", "-t", help="Only this type: expense or income"),
+    category_match: str = typer.Option("exact", "--match", help="How --category matches: exact, prefix or contains"),
+    hard: bool = typer.Option(False, "--hard", help="Remove the rows now instead of keeping them for undo")
+):
+    """Delete transactions by ID, range or filter (undo with `budget undo`)"""
+    from . import transactions
+
     session = get_session()
     try:
-        if transactions.delete_transaction(session, transaction_id):
-            console.print(f"[green]✓ Deleted transaction #{transaction_id}[/green]")
+        ids = transactions.parse_id_ranges(transaction_ids or [])
+        start_date = validate_date(start) if start else None
+        end_date = validate_date(end) + timedelta(days=1) if end else None
+        count = transactions.delete_transactions(
+            session, ids, start_date, end_date, category, type, category_match, hard
+        )
+        single = len(ids) == 1 and ids[0][0] == ids[0][1] and not (start or end or category or type)
+        if single:
+            if count:
+                console.print(f"[green]✓ Deleted transaction #{ids[0][0]}[/green]")
+            else:
+                console.print(f"[red]Transaction #{ids[0][0]} not found[/red]")
+        elif count:
+            console.print(f"[green]✓ Deleted {count} transactions[/green]")
         else:
-            console.print(f"[red]Transaction #{transaction_id} not found[/red]")
+            console.print("[yellow]No transactions matched[/yellow]")
+        if count and not hard:
+            console.print("[dim]Run `budget undo` to restore[/dim]")
+    except ValueError as e:
+        console.print(f"[red]Error: {e}[/red]")
+        raise typer.Exit(1)
+    finally:
+        session.close()
+
+@app.command()
+def undo(
+    list_entries: bool = typer.Option(False, "--list", help="Show the undo journal instead of undoing")
+):
+    """Restore the transactions removed by the most recent delete"""
+    from . import transactions
+
+    session = get_session(read_only=list_entries)
+    try:
+        if list_entries:
+            from rich.table import Table
+            from rich import box
+
+            entries = transactions.get_undo_journal(session)
+            if not entries:
+                console.print("[yellow]Nothing to undo[/yellow]")
+                return
+            table = Table(title="Undo Journal (newest first)", box=box.ROUNDED)
+            table.add_column("ID", style="cyan", justify="right")
+            table.add_column("Deleted", style="yellow")
+            table.add_column("Rows", justify="right")
+            table.add_column("Filter")
+            for entry in entries:
+                table.add_row(str(entry.id), entry.created_at.strftime('%Y-%m-%d %H:%M'), str(entry.count), entry.description)
+            console.print(table)
+            return
+
+        entry = transactions.undo_delete(session)
+        if entry is None:
+            console.print("[yellow]Nothing to undo[/yellow]")
+        else:
+            console.print(f"[green]✓ Restored {entry.count} transactions ({entry.description})[/green]")
     finally:
         session.close()
 
 @app.command()
 def summary(
-    all_time: bool = typer.Option(False, "--all-time", "-a", help="Show all-time summary instead of current month")
+    all_time: bool = typer.Option(False, "--all-time", "-a", help="Show all-time summary instead of current month"),
+    output_format: str = typer.Option("table", "--format", help="Output format: table, json or csv")
 ):
     """Show budget summary with spending progress"""
-    session = get_session()
+    from . import budgets, settings, output
+
+    session = get_session(read_only=True)
     try:
-        budgets.show_budget_summary(session, all_time)
+        output.check_format(output_format)
+        result = budgets.get_budget_summary(session, all_time)
+        record = {
+            'period': 'all-time' if all_time else get_current_month_range()[0].strftime('%Y-%m'),
+            **result._asdict(),
+            'progress': result.progress,
+        }
+        categories = budgets.get_category_budgets(session)
+
+        def render():
+            currency_symbol = settings.get_currency_symbol(session)
+            budgets.render_budget_summary(result, currency_symbol, all_time)
+            if categories:
+                console.print()
+                budgets.render_category_budgets(categories, currency_symbol)
+
+        output.emit(
+            output_format, {**record, 'categories': categories}, render,
+            [list(record.values())], list(record)
+        )
+    except ValueError as e:
+        console.print(f"[red]Error: {e}[/red]")
     finally:
         session.close()
 
 @app.command()
-def set_budget(amount: float = typer.Argument(..., help="Monthly budget amount")):
-    """Set monthly budget amount"""
+def set_budget(
+    amount: float = typer.Argument(..., help="Monthly budget amount (0 removes a category budget)"),
+    category: Optional[str] = typer.Option(None, "--category", "-c", help="Budget one category instead of the whole month"),
+    warn_at: int = typer.Option(80, "--warn-at", help="Warn when a category reaches this percent of its budget")
+):
+    """Set monthly budget amount, overall or per category"""
+    from . import budgets, settings
+
     session = get_session()
     try:
-        budgets.set_monthly_budget(session, amount)
         currency_symbol = settings.get_currency_symbol(session)
-        console.print(f"[green]✓ Monthly budget set to {currency_symbol}{amount:.2f}[/green]")
+        if category is None:
+            budgets.set_monthly_budget(session, amount)
+            console.print(f"[green]✓ Monthly budget set to {currency_symbol}{amount:.2f}[/green]")
+        elif budgets.set_category_budget(session, category, amount, warn_at):
+            console.print(
+                f"[green]✓ Monthly budget for {category} set to {currency_symbol}{amount:.2f} "
+                f"(warning at {warn_at}%)[/green]"
+            )
+        else:
+            console.print(f"[green]✓ Removed the budget for {category}[/green]")
+    except ValueError as e:
+        console.print(f"[red]Error: {e}[/red]")
     finally:
         session.close()
 
@@ -109,6 +409,8 @@ def set_goal(
     name: str = typer.Option("Savings Goal", "--name", "-n", help="Savings goal name")
 ):
     """Set savings goal with optional name"""
+    from . import budgets, settings
+
     session = get_session()
     try:
         budgets.set_savings_goal(session, amount, name)
@@ -119,43 +421,535 @@ def set_goal(
 
 @app.command()
 def report(
-    report_type: str = typer.Argument("monthly", help="Report type: monthly or categories")
+    report_type: str = typer.Argument("monthly", help="Report type: monthly, categories or trends"),
+    start: Optional[str] = typer.Option(None, "--from", help="Trends start (YYYY-MM or date, default: 11 months ago)"),
+    end: Optional[str] = typer.Option(None, "--to", help="Trends end, inclusive (YYYY-MM or date, default: this month)"),
+    by: str = typer.Option("month", "--by", help="Trends grouping: month, week or category"),
+    window: int = typer.Option(3, "--window", "-w", help="Periods in the trends rolling average"),
+    output_format: str = typer.Option("table", "--format", help="Output format: table, json or csv")
 ):
     """Generate financial reports"""
-    session = get_session()
+    from . import reports, settings, output
+    from .transactions import TransactionRow
+
+    session = get_session(read_only=True)
     try:
+        output.check_format(output_format)
         if report_type == "monthly":
-            reports.generate_monthly_report(session)
+            result = reports.get_monthly_report(session)
+            output.emit(
+                output_format, result,
+                lambda: reports.render_monthly_report(result, settings.get_currency_symbol(session)),
+                result.categories, reports.MonthlyCategoryRow._fields
+            )
         elif report_type == "categories":
-            reports.show_category_report(session)
+            page = reports.get_transaction_page(session)
+            output.emit(
+                output_format, page,
+                lambda: reports.render_transaction_page(page, settings.get_currency_symbol(session)),
+                page.transactions, TransactionRow._fields
+            )
+        elif report_type == "trends":
+            if by not in reports.TREND_GROUPINGS:
+                raise ValueError("Grouping must be 'month', 'week' or 'category'")
+            if window < 1:
+                raise ValueError("Window must be at least 1")
+            this_month = get_current_month_range()[0]
+            start_date = parse_period_bound(start) if start else add_months(this_month, -11)
+            end_date = parse_period_bound(end, end=True) if end else add_months(this_month, 1)
+            if start_date >= end_date:
+                raise ValueError("--from must be before --to")
+            title = reports.trend_title(start_date, end_date, by)
+            if by == "category":
+                rows = reports.get_category_trends(session, start_date, end_date)
+                render = lambda: reports.render_category_trends(rows, settings.get_currency_symbol(session), title)
+                fields = reports.CategoryTrendRow._fields
+            else:
+                rows = reports.get_period_trends(session, start_date, end_date, by, window)
+                render = lambda: reports.render_period_trends(rows, settings.get_currency_symbol(session), title, by, window)
+                fields = reports.TrendRow._fields
+            output.emit(output_format, rows, render, rows, fields)
         else:
-            console.print("[red]Invalid report type. Use 'monthly' or 'categories'[/red]")
+            console.print("[red]Invalid report type. Use 'monthly', 'categories' or 'trends'[/red]")
+    except ValueError as e:
+        console.print(f"[red]Error: {e}[/red]")
     finally:
         session.close()
 
+@app.command()
+def batch_report(
+    files: List[str] = typer.Argument(..., help="Database files to consolidate, e.g. accounts/*.db"),
+    start: Optional[str] = typer.Option(None, "--from", help="Start (YYYY-MM or date, default: January this year)"),
+    end: Optional[str] = typer.Option(None, "--to", help="End, inclusive (YYYY-MM or date, default: December this year)"),
+    jobs: Optional[int] = typer.Option(None, "--jobs", "-j", help="Worker processes (default: one per CPU)"),
+    output_format: str = typer.Option("table", "--format", help="Output format: table, json or csv")
+):
+    """Consolidated report over many database files, aggregated in parallel"""
+    from . import batch, output
+    from datetime import date
+
+    try:
+        output.check_format(output_format)
+        this_year = date(date.today().year, 1, 1)
+        start_date = parse_period_bound(start) if start else this_year
+        end_date = parse_period_bound(end, end=True) if end else add_months(this_year, 12)
+        if start_date >= end_date:
+            raise ValueError("--from must be before --to")
+        if jobs is not None and jobs < 1:
+            raise ValueError("--jobs must be at least 1")
+        result = batch.batch_report(files, start_date, end_date, jobs)
+    except ValueError as e:
+        console.print(f"[red]Error: {e}[/red]")
+        raise typer.Exit(1)
+
+    title = f"Batch Report - {len(files)} files, {start_date.isoformat()} to {(end_date - timedelta(days=1)).isoformat()}"
+    output.emit(
+        output_format, result,
+        lambda: batch.render_batch_report(result, title),
+        result.months, batch.BatchMonthRow._fields
+    )
+
 @app.command()
 def export(
-    filename: str = typer.Option("budget_export.csv", "--filename", "-f", help="Export filename")
+    filename: Optional[str] = typer.Option(None, "--filename", "-f", help="Export filename, or - for stdout (default: budget_export.<format>)"),
+    file_format: str = typer.Option("csv", "--format", help="Output format: csv, jsonl, parquet or arrow"),
+    compress: bool = typer.Option(False, "--gzip", "-z", help="Gzip-compress csv/jsonl output"),
+    start: Optional[str] = typer.Option(None, "--from", help="Only transactions on or after this date"),
+    end: Optional[str] = typer.Option(None, "--to", help="Only transactions on or before this date"),
+    type: Optional[str] = typer.Option(None, "--type", "-t", help="Filter by type: expense or income"),
+    category: Optional[str] = typer.Option(None, "--category", "-c", help="Filter by exact category")
+):
+    """Export transactions to CSV, JSON Lines, Parquet or Arrow"""
+    from .exporters import export_transactions
+
+    if filename is None:
+        filename = f"budget_export.{file_format}" + (".gz" if compress else "")
+    compress = compress or filename.endswith(".gz")
+    status_console = Console(stderr=True) if filename == "-" else console
+
+    session = get_session(read_only=True)
+    try:
+        start_date = validate_date(start) if start else None
+        end_date = validate_date(end) + timedelta(days=1) if end else None
+        count = export_transactions(
+            session, filename, file_format, compress,
+            start_date, end_date, type, category
+        )
+        status_console.print(f"[green]✓ Exported {count} transactions to {'stdout' if filename == '-' else filename}[/green]")
+    except ValueError as e:
+        status_console.print(f"[red]Error: {e}[/red]")
+        raise typer.Exit(1)
+    finally:
+        session.close()
+
+def print_row_errors(errors: List, limit: int = 20):
+    from rich.table import Table
+    from rich import box
+
+    table = Table(box=box.ROUNDED)
+    table.add_column("Line", style="cyan", justify="right")
+    table.add_column("Error", style="red")
+    for line_number, message in errors[:limit]:
+        table.add_row(str(line_number), message)
+    console.print(table)
+    if len(errors) > limit:
+        console.print(f"... and {len(errors) - limit} more")
+
+@app.command(name="import")
+def import_file(
+    filename: str = typer.Argument(..., help="CSV, OFX or QIF file to import"),
+    file_format: Optional[str] = typer.Option(None, "--format", help="File format: csv, ofx or qif (default: from extension)"),
+    mapping: List[str] = typer.Option([], "--map", "-m", help="CSV column mapping FIELD=COLUMN, e.g. amount=Value"),
+    category: str = typer.Option(config.DEFAULT_IMPORT_CATEGORY, "--category", "-c", help="Category for rows without one"),
+    chunk_size: int = typer.Option(config.DEFAULT_IMPORT_CHUNK_SIZE, "--chunk-size", help="Rows inserted per batch"),
+    errors_file: Optional[str] = typer.Option(None, "--errors", help="Write rejected rows to this CSV file")
 ):
-    """Export transactions to CSV file"""
+    """Bulk import transactions from a CSV, OFX or QIF file"""
+    from rich.progress import Progress, SpinnerColumn, TextColumn
+    import csv
+    from . import importers
+
+    try:
+        file_format = file_format.lower() if file_format else importers.detect_format(filename)
+        if file_format not in importers.READERS:
+            raise ValueError(f"Unsupported import format '{file_format}'. Use csv, ofx or qif")
+        column_map = importers.parse_column_map(mapping)
+    except ValueError as e:
+        console.print(f"[red]Error: {e}[/red]")
+        raise typer.Exit(1)
+
     session = get_session()
     try:
-        reports.export_to_csv(session, filename)
+        with open(filename, newline='', encoding='utf-8-sig') as handle:
+            if file_format == 'csv':
+                rows = importers.read_csv(handle, column_map)
+            else:
+                rows = importers.READERS[file_format](handle)
+
+            with Progress(
+                SpinnerColumn(),
+                TextColumn("Importing {task.completed} rows"),
+                console=console,
+                transient=True,
+            ) as progress_bar:
+                task = progress_bar.add_task("Importing", total=None)
+                result = importers.import_transactions(
+                    session, rows, chunk_size, category,
+                    on_progress=lambda count: progress_bar.advance(task, count)
+                )
+    except OSError as e:
+        console.print(f"[red]Error: {e}[/red]")
+        raise typer.Exit(1)
     finally:
         session.close()
 
+    console.print(f"[green]✓ Imported {result.imported} transactions from {filename}[/green]")
+    if result.errors:
+        console.print(f"[yellow]Skipped {result.skipped} invalid rows[/yellow]")
+        print_row_errors(result.errors)
+        if errors_file:
+            with open(errors_file, 'w', newline='', encoding='utf-8') as handle:
+                writer = csv.writer(handle)
+                writer.writerow(['line', 'error'])
+                writer.writerows(result.errors)
+            console.print(f"Error report written to {errors_file}")
+
+@app.command()
+def rebuild_rollups(
+    check: bool = typer.Option(False, "--check", help="Only verify the rollups against transactions")
+):
+    """Recompute monthly rollups from transactions, or check their consistency"""
+    from rich.table import Table
+    from rich import box
+    from . import rollups
+
+    session = get_session(read_only=check)
+    try:
+        mismatches = rollups.check_rollups(session)
+        if check:
+            if not mismatches:
+                console.print("[green]✓ Monthly rollups are consistent[/green]")
+                return
+            table = Table(title=f"Rollup mismatches ({len(mismatches)} found)", box=box.ROUNDED)
+            table.add_column("Month", style="yellow")
+            table.add_column("Category", style="blue")
+            table.add_column("Type", style="magenta")
+            table.add_column("Expected", justify="right", style="green")
+            table.add_column("Stored", justify="right", style="red")
+            for (month, category, trans_type), want, have in mismatches:
+                table.add_row(
+                    month, category, trans_type,
+                    f"{format_minor(want[0])} ({want[1]})", f"{format_minor(have[0])} ({have[1]})"
+                )
+            console.print(table)
+            raise typer.Exit(1)
+
+        count = rollups.rebuild_rollups(session)
+        console.print(f"[green]✓ Rebuilt {count} monthly rollups ({len(mismatches)} were out of date)[/green]")
+    finally:
+        session.close()
+
+@app.command()
+def compact(
+    no_vacuum: bool = typer.Option(False, "--no-vacuum", help="Only purge deleted rows; skip rebuilding the file")
+):
+    """Purge soft-deleted transactions for good and reclaim disk space"""
+    from . import transactions
+
+    session = get_session()
+    try:
+        result = transactions.compact(session, vacuum=not no_vacuum)
+    finally:
+        session.close()
+    console.print(f"[green]✓ Purged {result.purged} deleted transactions; the undo journal is now empty[/green]")
+    if not no_vacuum:
+        console.print(
+            f"Database size: {result.bytes_before / 1024:.0f} KiB -> {result.bytes_after / 1024:.0f} KiB"
+        )
+
 @app.command()
 def set_currency(
-    symbol: str = typer.Argument(..., help="Currency symbol ($, €, £, ¥, MAD, etc.)")
+    symbol: Optional[str] = typer.Argument(None, help="Currency symbol ($, €, £, ¥, MAD, etc.)"),
+    code: Optional[str] = typer.Option(None, "--code", help="ISO 4217 code of the ledger's currency, e.g. USD; amounts in other currencies are converted into it")
 ):
-    """Set default currency symbol"""
+    """Set default currency symbol and code"""
+    from . import currency, settings
+
+    if symbol is None and code is None:
+        console.print("[red]Error: give a SYMBOL, --code, or both[/red]")
+        raise typer.Exit(1)
     session = get_session()
     try:
-        settings.set_currency_symbol(session, symbol)
-        console.print(f"[green]✓ Currency symbol set to '{symbol}'[/green]")
+        if symbol is not None:
+            settings.set_currency_symbol(session, symbol)
+            console.print(f"[green]✓ Currency symbol set to '{symbol}'[/green]")
+        if code is not None:
+            code = currency.normalize_currency_code(code)
+            settings.set_currency_code(session, code)
+            console.print(f"[green]✓ Currency code set to {code}[/green]")
+    except ValueError as e:
+        console.print(f"[red]Error: {e}[/red]")
+    finally:
+        session.close()
+
+@rates_app.command(name="import")
+def rates_import(
+    filename: str = typer.Argument(..., help="CSV file with date, currency and rate columns, plus an optional base column"),
+    base: Optional[str] = typer.Option(None, "--base", "-b", help="Base currency for files without a base column; rows read 1 BASE = RATE CURRENCY")
+):
+    """Load exchange rates from a CSV file"""
+    from . import currency
+
+    session = get_session(post_due=False)
+    try:
+        base = currency.normalize_currency_code(base) if base else None
+        with open(filename, newline='', encoding='utf-8-sig') as handle:
+            imported, errors = currency.import_rates(session, currency.read_rates_csv(handle), base)
+    except (OSError, ValueError) as e:
+        console.print(f"[red]Error: {e}[/red]")
+        raise typer.Exit(1)
+    finally:
+        session.close()
+
+    console.print(f"[green]✓ Imported {imported} exchange rates from {filename}[/green]")
+    if errors:
+        console.print(f"[yellow]Skipped {len(errors)} invalid rows[/yellow]")
+        print_row_errors(errors)
+
+@rates_app.command(name="list")
+def rates_list(
+    output_format: str = typer.Option("table", "--format", help="Output format: table, json or csv")
+):
+    """List the loaded exchange-rate series"""
+    from . import currency, output
+
+    session = get_session(post_due=False, read_only=True)
+    try:
+        output.check_format(output_format)
+        rows = currency.get_rate_series(session)
+        if not rows and output_format == "table":
+            console.print("[yellow]No exchange rates loaded; see `budget rates import --help`[/yellow]")
+            return
+        output.emit(
+            output_format, rows,
+            lambda: currency.render_rate_series(rows),
+            rows, currency.RateSeriesRow._fields
+        )
+    except ValueError as e:
+        console.print(f"[red]Error: {e}[/red]")
+    finally:
+        session.close()
+
+@recurring_app.command(name="add")
+def recurring_add(
+    type: str = typer.Argument(..., help="Type: expense or income"),
+    amount: str = typer.Argument(..., help="Amount of each occurrence"),
+    category: str = typer.Argument(..., help="Transaction category"),
+    description: str = typer.Argument("", help="Transaction description"),
+    every: str = typer.Option("monthly", "--every", "-e", help="RRULE like FREQ=MONTHLY;BYMONTHDAY=1, or daily, weekly, biweekly, monthly, quarterly, yearly"),
+    start: Optional[str] = typer.Option(None, "--start", help="First date of the schedule (default: today)"),
+    until: Optional[str] = typer.Option(None, "--until", help="Last date of the schedule (default: forever)")
+):
+    """Add a recurring rule and post the occurrences already due"""
+    from . import recurring, settings
+
+    session = get_session(post_due=False)
+    try:
+        rule = recurring.add_rule(session, type, validate_amount(amount), category, every, description, start, until)
+        rule_id, first_date = rule.id, rule.next_date
+        posted = recurring.materialize(session)
+        currency_symbol = settings.get_currency_symbol(session)
+        console.print(
+            f"[green]✓ Added recurring rule #{rule_id}: {type} {currency_symbol}{rule.amount:.2f} to {category} "
+            f"({rule.rrule}) from {first_date.isoformat()}[/green]"
+        )
+        if posted:
+            console.print(f"Posted {posted} occurrences already due")
+    except ValueError as e:
+        console.print(f"[red]Error: {e}[/red]")
+    finally:
+        session.close()
+
+@recurring_app.command(name="list")
+def recurring_list(
+    output_format: str = typer.Option("table", "--format", help="Output format: table, json or csv")
+):
+    """List recurring rules"""
+    from . import recurring, settings, output
+
+    session = get_session(read_only=True)
+    try:
+        output.check_format(output_format)
+        rows = recurring.get_rules(session)
+        if not rows and output_format == "table":
+            console.print("[yellow]No recurring rules yet[/yellow]")
+            return
+        output.emit(
+            output_format, rows,
+            lambda: recurring.render_rules(rows, settings.get_currency_symbol(session)),
+            rows, recurring.RecurringRuleRow._fields
+        )
+    except ValueError as e:
+        console.print(f"[red]Error: {e}[/red]")
+    finally:
+        session.close()
+
+@recurring_app.command(name="delete")
+def recurring_delete(rule_id: int = typer.Argument(..., help="ID of the rule to delete")):
+    """Delete a recurring rule, keeping the transactions it already posted"""
+    from . import recurring
+
+    session = get_session(post_due=False)
+    try:
+        if recurring.delete_rule(session, rule_id):
+            console.print(f"[green]✓ Deleted recurring rule #{rule_id}[/green]")
+        else:
+            console.print(f"[red]Recurring rule #{rule_id} not found[/red]")
+    finally:
+        session.close()
+
+@recurring_app.command(name="run")
+def recurring_run(
+    start: Optional[str] = typer.Option(None, "--from", help="Also backfill occurrences from this date"),
+    end: Optional[str] = typer.Option(None, "--to", help="Post occurrences up to this date (default: today)")
+):
+    """Post due occurrences now, or every occurrence in a date range"""
+    from . import recurring
+
+    session = get_session(post_due=False)
+    try:
+        start_date = validate_date(start) if start else None
+        end_date = validate_date(end) if end else None
+        posted = recurring.materialize(session, end_date, start_date)
+        console.print(f"[green]✓ Posted {posted} recurring transactions[/green]")
+    except ValueError as e:
+        console.print(f"[red]Error: {e}[/red]")
     finally:
         session.close()
 
+@app.command()
+def forecast(
+    end: Optional[str] = typer.Option(None, "--to", help="Last month to project, inclusive (YYYY-MM, default: 12 months ahead)"),
+    output_format: str = typer.Option("table", "--format", help="Output format: table, json or csv")
+):
+    """Project monthly balances from recurring rules without posting anything"""
+    from . import recurring, settings, output
+
+    session = get_session(read_only=True)
+    try:
+        output.check_format(output_format)
+        this_month = get_current_month_range()[0]
+        end_date = parse_period_bound(end, end=True) if end else add_months(this_month, 12)
+        if end_date <= this_month:
+            raise ValueError("--to must not be before the current month")
+        rows = recurring.get_forecast(session, end_date)
+        title = f"Forecast {rows[0].month} to {rows[-1].month}"
+        output.emit(
+            output_format, rows,
+            lambda: recurring.render_forecast(rows, settings.get_currency_symbol(session), title),
+            rows, recurring.ForecastRow._fields
+        )
+    except ValueError as e:
+        console.print(f"[red]Error: {e}[/red]")
+    finally:
+        session.close()
+
+def run_command(args: List[str]) -> int:
+    from .currency import reset_rate_warnings
+
+    # The settings and rate caches revalidate themselves, so they carry over
+    # between shell and daemon commands; only the missing-rate warnings restart.
+    reset_rate_warnings()
+    try:
+        result = app(args, prog_name="budget", standalone_mode=False)
+    except typer.Abort:
+        return 1
+    except Exception as e:
+        # Usage errors from typer's click layer know how to print themselves.
+        if not hasattr(e, "show"):
+            raise
+        e.show()
+        return e.exit_code
+    return result if isinstance(result, int) else 0
+
+@app.command()
+def shell():
+    """Interactive prompt that keeps the database connection warm between commands"""
+    import shlex
+    try:
+        import readline  # noqa: F401 - line editing and history for input()
+    except ImportError:
+        pass
+
+    db_args = [] if config.get_shard_dir() else ["--db", config.get_db_path()]
+    ledger = config.get_ledger()
+    console.print(
+        f"[bold cyan]Budget shell[/bold cyan] on {config.get_shard_dir() or config.get_db_path()} "
+        f"(ledger {ledger}) - type a command like 'list -l 5', or 'exit'"
+    )
+    while True:
+        try:
+            line = input("budget> ").strip()
+        except (EOFError, KeyboardInterrupt):
+            console.print()
+            break
+        if line in ("exit", "quit"):
+            break
+        try:
+            args = shlex.split(line)
+        except ValueError as e:
+            console.print(f"[red]Error: {e}[/red]")
+            continue
+        if not args:
+            continue
+        if args[0] in ("shell", "serve"):
+            console.print(f"[red]'{args[0]}' is not available inside the shell[/red]")
+            continue
+        try:
+            run_command([*db_args, "--ledger", ledger, *args])
+        except KeyboardInterrupt:
+            console.print("[yellow]Interrupted[/yellow]")
+
+@app.command()
+def serve(
+    stop: bool = typer.Option(False, "--stop", help="Stop the daemon serving this database")
+):
+    """Run a local daemon so forwarded commands skip startup (Unix only)"""
+    from . import daemon
+
+    # With sharded ledgers one daemon serves the whole shard directory.
+    db_path = None if config.get_shard_dir() else config.get_db_path()
+    target = db_path or config.get_shard_dir()
+    if stop:
+        if daemon.stop(db_path):
+            console.print(f"[green]✓ Stopped the daemon for {target}[/green]")
+        else:
+            console.print(f"[yellow]No daemon is running for {target}[/yellow]")
+        return
+
+    try:
+        daemon.serve(db_path, on_ready=lambda path: console.print(
+            f"[green]Serving {target} on {path}[/green] (Ctrl+C or `budget serve --stop` to stop)"
+        ))
+    except KeyboardInterrupt:
+        pass
+    except (ValueError, OSError, AttributeError) as e:
+        console.print(f"[red]Error: {e}[/red]")
+        raise typer.Exit(1)
+
+@app.command()
+def ledgers():
+    """List the ledgers in the database (or shard directory)"""
+    from .ledgers import LedgerRouter
+
+    names = LedgerRouter().ledgers()
+    if not names:
+        console.print("[yellow]No ledgers yet[/yellow]")
+        return
+    current = config.get_ledger()
+    for name in names:
+        console.print(f"[bold green]* {name}[/bold green]" if name == current else f"  {name}")
+
 @app.command()
 def version():
     """Show version information"""
@@ -165,6 +959,9 @@ def version():
 @app.command()
 def help():
     """Show comprehensive guide with examples"""
+    from rich.panel import Panel
+    from rich import box
+
     console.print(Panel.fit(
         "[bold green]💰 Budget Tracker - Complete Command Guide[/bold green]\n\n"
         
@@ -172,21 +969,32 @@ def help():
         "  budget add [type] [amount] [category] [description] [--date]\n"
         "  budget add expense 25.00 Food \"Lunch\"\n"
         "  budget add income 1200.00 Salary \"Monthly\" --date 2024-01-15\n"
-        "  budget add expense 15.50 Coffee --date 01/15/2024\n\n"
+        "  budget add expense 15.50 Coffee --date 01/15/2024\n"
+        "  budget add expense 40.00 Hotel --currency EUR   (converted in summaries and reports)\n\n"
         
         "[bold]👀 VIEW TRANSACTIONS:[/bold]\n"
-        "  budget list [--limit N] [--category NAME] [--type TYPE]\n"
+        "  budget list [--limit N] [--category NAME] [--type TYPE] [--match MODE] [--after DATE,ID]\n"
         "  budget list --limit 50\n"
         "  budget list --category Food --type expense\n"
-        "  budget list -c Food -t expense -l 30\n\n"
+        "  budget list -c Food -t expense -l 30\n"
+        "  budget list -c gro --match prefix --after 2024-01-15,42\n\n"
+        
+        "[bold]🔍 SEARCH:[/bold]\n"
+        "  budget search [query] [--prefix] [--phrase] [--from DATE] [--to DATE] [--type TYPE]\n"
+        "  budget search \"amazon refund\"\n"
+        "  budget search amaz --prefix --type income\n\n"
         
         "[bold]🗑️  DELETE TRANSACTIONS:[/bold]\n"
-        "  budget delete [ID]\n"
-        "  budget delete 5\n\n"
+        "  budget delete [IDS...] [--from DATE] [--to DATE] [--category NAME] [--type TYPE] [--hard]\n"
+        "  budget delete 5\n"
+        "  budget delete 10-20 31\n"
+        "  budget delete --category Coffee --from 2024-01-01 --to 2024-01-31\n"
+        "  budget undo [--list]         (restore the last delete)\n\n"
         
         "[bold]📊 BUDGET MANAGEMENT:[/bold]\n"
         "  budget set-budget [amount]\n"
         "  budget set-budget 2000\n"
+        "  budget set-budget 400 --category Food [--warn-at 80]\n"
         "  budget summary [--all-time]\n"
         "  budget summary -a\n\n"
         
@@ -194,16 +1002,52 @@ def help():
         "  budget set-goal [amount] [--name NAME]\n"
         "  budget set-goal 5000 --name \"New Laptop\"\n\n"
         
+        "[bold]📥 IMPORT:[/bold]\n"
+        "  budget import [file] [--format csv|ofx|qif] [--map FIELD=COLUMN]\n"
+        "  budget import history.csv --map amount=Value --map date=Posted\n"
+        "  budget import statement.ofx --category Bank\n\n"
+        
+        "[bold]🔧 MAINTENANCE:[/bold]\n"
+        "  budget rebuild-rollups [--check]\n"
+        "  budget compact [--no-vacuum]   (purge deleted rows, shrink the file)\n\n"
+        
         "[bold]⚙️  CONFIGURATION:[/bold]\n"
         "  budget set-currency [symbol]\n"
         "  budget set-currency \"€\"\n"
-        "  budget set-currency \"MAD\"\n\n"
+        "  budget set-currency \"MAD\"\n"
+        "  budget set-currency \"$\" --code USD   (the ledger's ISO currency)\n"
+        "  budget rates import rates.csv [--base EUR]   (columns: date, currency, rate[, base])\n"
+        "  budget rates list\n\n"
+        
+        "[bold]🔁 RECURRING:[/bold]\n"
+        "  budget recurring add [type] [amount] [category] [description] [--every RULE] [--start DATE] [--until DATE]\n"
+        "  budget recurring add income 3000 Salary --every \"FREQ=MONTHLY;BYMONTHDAY=25\"\n"
+        "  budget recurring add expense 9.99 Streaming --every monthly --start 2024-01-05\n"
+        "  budget recurring list | delete [ID] | run [--from DATE] [--to DATE]\n"
+        "  budget forecast [--to YYYY-MM]\n\n"
         
         "[bold]📈 REPORTS & EXPORT:[/bold]\n"
         "  budget report monthly\n"
         "  budget report categories\n"
-        "  budget export [--filename NAME]\n"
-        "  budget export -f my_data.csv\n\n"
+        "  budget report trends [--from YYYY-MM] [--to YYYY-MM] [--by month|week|category]\n"
+        "  budget report trends --from 2015-01 --to 2024-12 --window 6\n"
+        "  budget report monthly --format json   (also list/summary: json or csv)\n"
+        "  budget batch-report accounts/*.db --from 2024-01 --to 2024-12 [--jobs N]\n"
+        "  budget export [--filename NAME] [--format csv|jsonl|parquet|arrow] [--gzip]\n"
+        "  budget export -f my_data.csv\n"
+        "  budget export --format jsonl --from 2024-01-01 --to 2024-12-31 -f - | jq .\n\n"
+        
+        "[bold]📚 LEDGERS:[/bold]\n"
+        "  budget --ledger alice add expense 12 Food   (or BUDGET_LEDGER=alice)\n"
+        "  budget ledgers\n\n"
+        
+        "[bold]⚡ INTERACTIVE & DAEMON:[/bold]\n"
+        "  budget shell                 (prompt that keeps the database open)\n"
+        "  budget serve [--stop]        (add/list/summary/report... forward to it)\n\n"
+        
+        "[bold]⏱️  PROFILING:[/bold]\n"
+        "  budget --profile summary     (timings and SQL statements on stderr)\n"
+        "  budget --profile-out prof.out report trends   (cProfile stats for pstats)\n\n"
         
         "[bold]ℹ️  INFORMATION:[/bold]\n"
         "  budget version\n"
@@ -0,0 +1,143 @@
+"""
+Thin client for the `budget serve` daemon.
+
+Only the standard library is imported here, so forwarding a command to a
+running daemon costs an interpreter start and one socket round trip. When no
+daemon is listening the normal CLI runs in-process.
+"""
+
+import hashlib
+import json
+import os
+import socket
+import stat
+import sys
+from typing import List, Optional, Tuple
+from . import config
+
+# Commands that only touch the database and the terminal. import/export read
+# and write files relative to the caller's cwd, so they always run in-process.
+FORWARDED_COMMANDS = {
+    'add', 'list', 'search', 'delete', 'summary', 'set-budget', 'set-goal',
+    'report', 'rebuild-rollups', 'set-currency', 'ledgers', 'recurring', 'forecast', 'undo',
+}
+
+def socket_path(db_path: Optional[str] = None) -> str:
+    if os.environ.get('BUDGET_SOCKET'):
+        return os.environ['BUDGET_SOCKET']
+    # One daemon per database file, or per shard directory when ledgers are sharded.
+    target = os.path.abspath(db_path or config.get_shard_dir() or config.get_db_path())
+    digest = hashlib.sha1(target.encode('utf-8')).hexdigest()[:12]
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or '/tmp'
+    user = os.getuid() if hasattr(os, 'getuid') else 0
+    return os.path.join(runtime_dir, f"budget-{user}-{digest}.sock")
+
+def split_global_options(argv: List[str]) -> Tuple[Optional[str], Optional[str], List[str]]:
+    options = {'--db': None, '--ledger': None}
+    args = list(argv)
+    while args:
+        name, sep, value = args[0].partition('=')
+        if name not in options:
+            break
+        if sep:
+            options[name], args = value, args[1:]
+        elif len(args) > 1:
+            options[name], args = args[1], args[2:]
+        else:
+            break
+    return options['--db'], options['--ledger'], args
+
+def check_socket_owner(path: str):
+    # The default socket path in /tmp is predictable, so another local user
+    # could bind it first and read every forwarded command. Only talk to a
+    # socket we own that nobody else can open (the daemon binds it 0600).
+    info = os.lstat(path)
+    if not stat.S_ISSOCK(info.st_mode):
+        raise PermissionError(f"{path} is not a socket")
+    if hasattr(os, 'getuid') and info.st_uid != os.getuid():
+        raise PermissionError(f"{path} is owned by another user")
+    if info.st_mode & 0o077:
+        raise PermissionError(f"{path} is accessible to other users (mode {stat.S_IMODE(info.st_mode):o})")
+
+def connect(path: str, timeout: float = 0.2) -> socket.socket:
+    check_socket_owner(path)
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.settimeout(timeout)
+        conn.connect(path)
+        conn.settimeout(None)
+    except OSError:
+        conn.close()
+        raise
+    return conn
+
+def send_request(conn: socket.socket, request: dict) -> dict:
+    with conn:
+        conn.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        conn.shutdown(socket.SHUT_WR)
+        chunks = []
+        while True:
+            chunk = conn.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return json.loads(b''.join(chunks))
+
+def _terminal():
+    try:
+        width = os.get_terminal_size(sys.stdout.fileno()).columns
+    except (OSError, ValueError):
+        width = None
+    color = sys.stdout.isatty() and 'NO_COLOR' not in os.environ
+    if not color:
+        color_system = None
+    elif os.environ.get('COLORTERM') in ('truecolor', '24bit'):
+        color_system = 'truecolor'
+    elif '256' in os.environ.get('TERM', ''):
+        color_system = '256'
+    else:
+        color_system = 'standard'
+    return width, color_system
+
+def forward(argv: List[str]) -> Optional[int]:
+    if not hasattr(socket, 'AF_UNIX') or os.environ.get('BUDGET_NO_DAEMON'):
+        return None
+    db_path, ledger, args = split_global_options(argv)
+    if not args or args[0] not in FORWARDED_COMMANDS:
+        return None
+    if '--stdin' in args:
+        # The daemon cannot read the caller's stdin.
+        return None
+    try:
+        # The daemon's own environment may name another ledger; always send ours.
+        ledger = config.validate_ledger(ledger or config.get_ledger())
+    except ValueError:
+        return None
+
+    path = socket_path(db_path)
+    try:
+        conn = connect(path)
+    except PermissionError as e:
+        sys.stderr.write(f"Warning: not using budget daemon socket: {e}\n")
+        return None
+    except OSError:
+        return None
+
+    # Once connected the daemon may already have run the command, so never
+    # fall back to running it a second time in-process.
+    width, color_system = _terminal()
+    try:
+        response = send_request(conn, {'argv': ['--ledger', ledger, *args], 'width': width, 'color_system': color_system})
+    except (OSError, ValueError) as e:
+        sys.stderr.write(f"Error: lost connection to budget daemon: {e}\n")
+        return 1
+    sys.stdout.write(response.get('stdout', ''))
+    sys.stderr.write(response.get('stderr', ''))
+    return response.get('exit_code', 0)
+
+def main():
+    exit_code = forward(sys.argv[1:])
+    if exit_code is not None:
+        sys.exit(exit_code)
+    from .cli import main as cli_main
+    cli_main()
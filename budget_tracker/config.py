@@ -0,0 +1,116 @@
+from typing import Dict, Optional
+import os
+import re
+
+# Kept free of SQLAlchemy/rich imports: the CLI reads these before any command runs.
+
+DEFAULT_DB_PATH = 'budget.db'
+
+# SQLite tuning for a single-user ledger: WAL lets readers run alongside the
+# writer, NORMAL sync is durable under WAL, and mmap/cache keep hot pages in RAM.
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 268435456,
+    'cache_size': -16000,
+    'temp_store': 'MEMORY',
+}
+
+# Values a pragma may be set to (they are spliced into the PRAGMA statement):
+# one of the keywords, or any integer where the list is None.
+SQLITE_PRAGMA_VALUES = {
+    'journal_mode': ['DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'],
+    'synchronous': ['OFF', 'NORMAL', 'FULL', 'EXTRA', '0', '1', '2', '3'],
+    'mmap_size': None,
+    'cache_size': None,
+    'temp_store': ['DEFAULT', 'FILE', 'MEMORY', '0', '1', '2'],
+    'query_only': ['OFF', 'ON', 'FALSE', 'TRUE', '0', '1'],
+}
+
+DEFAULT_IMPORT_CATEGORY = 'Uncategorized'
+DEFAULT_IMPORT_CHUNK_SIZE = 5000
+
+# `budget add --stdin` commits once per this many records or this many seconds,
+# whichever comes first.
+DEFAULT_ADD_BATCH_SIZE = 1000
+DEFAULT_ADD_BATCH_WINDOW = 1.0
+
+# How MM/DD/YYYY vs DD/MM/YYYY is resolved when both readings are valid dates.
+DATE_ORDERS = ['mdy', 'dmy']
+DEFAULT_DATE_ORDER = 'mdy'
+
+# How long a connection waits on a locked database (seconds), and how many times
+# a read-only session retries taking its snapshot before giving up.
+DEFAULT_BUSY_TIMEOUT = 5.0
+DEFAULT_READ_RETRIES = 3
+
+DEFAULT_LEDGER = 'default'
+# Open engines kept by the registry; the least recently used is disposed beyond this.
+DEFAULT_MAX_ENGINES = 32
+
+# Ledger ids double as file names when ledgers are sharded into separate files.
+_LEDGER_ID = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$')
+
+_db_path_override: Optional[str] = None
+_ledger_override: Optional[str] = None
+
+def set_db_path(path: Optional[str]):
+    global _db_path_override
+    _db_path_override = path
+
+def get_db_path() -> str:
+    return _db_path_override or os.environ.get('BUDGET_DB', DEFAULT_DB_PATH)
+
+def validate_ledger(ledger: str) -> str:
+    if not _LEDGER_ID.match(ledger):
+        raise ValueError("Ledger id must be 1-64 letters, digits, '.', '_' or '-', starting with a letter or digit")
+    return ledger
+
+def set_ledger(ledger: Optional[str]):
+    global _ledger_override
+    _ledger_override = validate_ledger(ledger) if ledger else None
+
+def get_ledger() -> str:
+    return _ledger_override or validate_ledger(os.environ.get('BUDGET_LEDGER') or DEFAULT_LEDGER)
+
+def get_shard_dir() -> Optional[str]:
+    # When set, every ledger lives in its own <shard dir>/<ledger>.db file.
+    return os.environ.get('BUDGET_SHARD_DIR') or None
+
+def get_max_engines() -> int:
+    return max(1, int(os.environ.get('BUDGET_MAX_ENGINES', DEFAULT_MAX_ENGINES)))
+
+def get_busy_timeout() -> float:
+    return max(0.0, float(os.environ.get('BUDGET_BUSY_TIMEOUT', DEFAULT_BUSY_TIMEOUT)))
+
+def get_read_retries() -> int:
+    return max(0, int(os.environ.get('BUDGET_READ_RETRIES', DEFAULT_READ_RETRIES)))
+
+def get_date_order() -> str:
+    order = os.environ.get('BUDGET_DATE_ORDER', DEFAULT_DATE_ORDER).lower()
+    return order if order in DATE_ORDERS else DEFAULT_DATE_ORDER
+
+def validate_sqlite_pragma(name: str, value: object) -> object:
+    if name not in SQLITE_PRAGMA_VALUES:
+        raise ValueError(f"Unsupported SQLite pragma '{name}'")
+    allowed = SQLITE_PRAGMA_VALUES[name]
+    text = str(value).strip()
+    if allowed is None:
+        if not re.fullmatch(r'[+-]?\d+', text):
+            raise ValueError(f"SQLite pragma {name} must be an integer, not '{value}'")
+        return int(text)
+    if text.upper() not in allowed:
+        raise ValueError(f"SQLite pragma {name} must be one of {', '.join(allowed)}, not '{value}'")
+    return text.upper()
+
+def get_sqlite_pragmas() -> Dict[str, object]:
+    pragmas = dict(DEFAULT_SQLITE_PRAGMAS)
+    for name in pragmas:
+        variable = f'BUDGET_SQLITE_{name.upper()}'
+        override = os.environ.get(variable)
+        if override:
+            try:
+                pragmas[name] = validate_sqlite_pragma(name, override)
+            except ValueError as e:
+                raise ValueError(f"{variable}: {e}") from None
+    return pragmas
@@ -0,0 +1,278 @@
+from sqlalchemy import func, literal_column
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, TextIO, Tuple
+import csv
+import re
+from rich.console import Console
+from .database import FOREIGN, NOT_DELETED, ExchangeRate, Transaction, session_ledger
+from .profiling import timed
+from .settings import load_settings
+from .utils import DEFAULT_CURRENCY_EXPONENT, RowError, chunked, currency_exponent, format_currency, parse_dates
+
+console = Console()
+# Warnings go to stderr so --format json/csv output stays parseable.
+err_console = Console(stderr=True)
+
+_CURRENCY_CODE = re.compile(r'^[A-Z]{3}$')
+
+RATE_FIELDS = ['date', 'currency', 'rate', 'base']
+DEFAULT_RATE_CHUNK_SIZE = 5000
+# Rate series kept in memory, least recently used dropped first.
+MAX_CACHED_SERIES = 64
+
+class MissingRateError(ValueError):
+    pass
+
+def normalize_currency_code(code: str) -> str:
+    code = code.strip().upper()
+    if not _CURRENCY_CODE.match(code):
+        raise ValueError(f"Currency must be a three-letter ISO 4217 code, not '{code}'")
+    return code
+
+def read_rates_csv(handle: TextIO) -> Iterator[Tuple[int, Dict[str, str]]]:
+    reader = csv.DictReader(handle)
+    missing = {'date', 'currency', 'rate'} - set(field.strip().lower() for field in reader.fieldnames or [])
+    if missing:
+        raise ValueError(f"Rates file needs date, currency and rate columns (missing {', '.join(sorted(missing))})")
+    for line_number, row in enumerate(reader, start=2):
+        row = {(key or '').strip().lower(): (value or '').strip() for key, value in row.items()}
+        yield line_number, {field: row.get(field, '') for field in RATE_FIELDS}
+
+def _validate_rates(rows: List[Tuple[int, Dict[str, str]]], base: Optional[str]) -> Tuple[List[Dict], List[RowError]]:
+    dates = parse_dates([row['date'] for _, row in rows])
+    date_errors = dict(dates.errors)
+    records = []
+    errors = []
+    for index, (line_number, row) in enumerate(rows):
+        try:
+            if index in date_errors:
+                raise ValueError(date_errors[index])
+            row_base = row['base'] or base
+            if not row_base:
+                raise ValueError("No base currency: add a base column or pass --base")
+            rate = float(row['rate'])
+            if not 0 < rate < float('inf'):
+                raise ValueError("Rate must be a positive number")
+            records.append({
+                'base': normalize_currency_code(row_base),
+                'currency': normalize_currency_code(row['currency']),
+                'date': dates.values[index],
+                'rate': rate,
+            })
+        except ValueError as e:
+            errors.append((line_number, str(e)))
+    return records, errors
+
+@timed()
+def import_rates(
+    session: Session,
+    rows: Iterable[Tuple[int, Dict[str, str]]],
+    base: Optional[str] = None,
+    chunk_size: int = DEFAULT_RATE_CHUNK_SIZE
+) -> Tuple[int, List[RowError]]:
+    # Re-importing a day replaces its rate, so a corrected table can be loaded
+    # over an old one. REPLACE gives the new row a fresh rowid, which is what
+    # rates_version() watches.
+    imported = 0
+    errors: List[RowError] = []
+    statement = insert(ExchangeRate.__table__).prefix_with('OR REPLACE')
+    try:
+        for chunk in chunked(rows, chunk_size):
+            records, chunk_errors = _validate_rates(chunk, base)
+            if records:
+                session.execute(statement, records)
+            imported += len(records)
+            errors.extend(chunk_errors)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    clear_rate_cache()
+    return imported, errors
+
+Series = Tuple[List[date], List[float]]
+RatesVersion = Tuple[Optional[int], int]
+
+def rates_version(session: Session) -> RatesVersion:
+    # Changes with every rate imported by any connection or process, and only
+    # then: ingesting transactions leaves it alone. MAX(rowid) is one index
+    # probe; the count catches rows deleted by hand.
+    return tuple(session.query(func.max(literal_column('rowid')), func.count()).select_from(ExchangeRate).one())
+
+# (database, base, currency) -> (rates_version stamp, sorted dates, rates).
+# Series are loaded whole on first use, so a report converting millions of rows
+# issues one query per currency pair and then only bisects in memory. The stamp
+# makes a rates import from another process (while the daemon is running, say)
+# force a reload. Pairs without rates are not cached.
+_series: "OrderedDict[Tuple[str, str, str], Tuple[RatesVersion, Series]]" = OrderedDict()
+
+# Currencies already reported as missing a rate in this command.
+_warned: Set[str] = set()
+
+def clear_rate_cache():
+    _series.clear()
+
+def reset_rate_warnings():
+    _warned.clear()
+
+def warn_missing_rate(currency: str, error: MissingRateError):
+    if currency not in _warned:
+        _warned.add(currency)
+        err_console.print(f"[yellow]Warning: {currency} amounts are left out of totals. {error}[/yellow]")
+
+def _load_series(session: Session, version: RatesVersion, base: str, currency: str) -> Series:
+    key = (session.get_bind().url.database, base, currency)
+    cached = _series.get(key)
+    if cached is not None and cached[0] == version:
+        _series.move_to_end(key)
+        return cached[1]
+    rows = session.query(ExchangeRate.date, ExchangeRate.rate).filter(
+        ExchangeRate.base == base, ExchangeRate.currency == currency
+    ).order_by(ExchangeRate.date).all()
+    series = ([row[0] for row in rows], [row[1] for row in rows])
+    if not rows:
+        _series.pop(key, None)
+        return series
+    _series[key] = (version, series)
+    while len(_series) > MAX_CACHED_SERIES:
+        _series.popitem(last=False)
+    return series
+
+class Converter:
+    # Converts into one target currency using the latest rate on or before each
+    # day (rates are not published on weekends and holidays). Pairs without a
+    # direct series are crossed through any base that quotes both currencies.
+    # A converter lives for one aggregation and remembers every pair it looked
+    # up, missing ones included; the module cache only keeps pairs with rates.
+
+    def __init__(self, session: Session, target: Optional[str] = None):
+        self.session = session
+        self.target = target if target is not None else load_settings(session).currency_code
+        self._version = rates_version(session)
+        self._pairs: Dict[Tuple[str, str], Series] = {}
+        self._bases: Optional[List[str]] = None
+
+    def _rate(self, base: str, currency: str, day: date) -> Optional[float]:
+        if currency == base:
+            return 1.0
+        series = self._pairs.get((base, currency))
+        if series is None:
+            series = self._pairs[(base, currency)] = _load_series(self.session, self._version, base, currency)
+        dates, rates = series
+        index = bisect_right(dates, day) - 1
+        return rates[index] if index >= 0 else None
+
+    def factor(self, currency: str, day: date) -> float:
+        if currency == self.target:
+            return 1.0
+        if not self.target:
+            raise MissingRateError(
+                f"Found {currency} amounts but the ledger has no currency code; set one with `budget set-currency SYMBOL --code XXX`"
+            )
+        if self._bases is None:
+            self._bases = [base for (base,) in self.session.query(ExchangeRate.base).distinct().order_by(ExchangeRate.base)]
+        for base in self._bases:
+            source = self._rate(base, currency, day)
+            target = self._rate(base, self.target, day) if source is not None else None
+            if target is not None:
+                return target / source
+        raise MissingRateError(
+            f"No {currency}->{self.target} exchange rate on or before {day.isoformat()}; "
+            f"load one with `budget rates import FILE`"
+        )
+
+    def convert(self, amount_minor: int, currency: str, day: date) -> int:
+        # Foreign amounts are in their own minor units; the ledger's are always
+        # DEFAULT_CURRENCY_EXPONENT digits.
+        shift = DEFAULT_CURRENCY_EXPONENT - currency_exponent(currency)
+        value = amount_minor * self.factor(currency, day) * 10 ** shift
+        # Half away from zero, like utils.to_minor.
+        return int(value + 0.5) if value >= 0 else -int(-value + 0.5)
+
+    def try_convert(self, amount_minor: int, currency: str, day: date) -> Optional[int]:
+        # For totals: one row without a rate must not break a whole listing or
+        # report, so it is left out with a warning instead.
+        try:
+            return self.convert(amount_minor, currency, day)
+        except MissingRateError as e:
+            warn_missing_rate(currency, e)
+            return None
+
+def format_amount(amount: float, currency: Optional[str], currency_symbol: str) -> str:
+    # Foreign amounts are shown as recorded, with their code instead of the ledger's symbol.
+    if not currency:
+        return format_currency(amount, currency_symbol)
+    return f"{abs(amount):.{currency_exponent(currency)}f} {currency}"
+
+@timed()
+def foreign_totals(
+    session: Session,
+    group_by: Sequence,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    conditions: Optional[Sequence] = None,
+    target: Optional[str] = None
+) -> Dict[Tuple, int]:
+    # Totals of the rows in other currencies, converted and keyed by the
+    # group_by values. One grouped pass over the foreign-currency index: rows
+    # are summed per (day, currency, group) in SQL and each sum is converted once.
+    # Sums without a rate are left out (see Converter.try_convert).
+    query = session.query(Transaction.date, Transaction.currency, *group_by, func.sum(Transaction.amount_minor)).filter(
+        *(conditions if conditions is not None else [Transaction.ledger_id == session_ledger(session)]),
+        FOREIGN, NOT_DELETED
+    )
+    if start_date:
+        query = query.filter(Transaction.date >= start_date)
+    if end_date:
+        query = query.filter(Transaction.date < end_date)
+
+    totals: Dict[Tuple, int] = {}
+    converter = None
+    for day, currency, *key, total in query.group_by(Transaction.date, Transaction.currency, *group_by):
+        if converter is None:
+            converter = Converter(session, target)
+        converted = converter.try_convert(total, currency, day)
+        if converted is not None:
+            key = tuple(key)
+            totals[key] = totals.get(key, 0) + converted
+    return totals
+
+class RateSeriesRow(NamedTuple):
+    base: str
+    currency: str
+    first: date
+    last: date
+    count: int
+    latest: float
+
+def get_rate_series(session: Session) -> List[RateSeriesRow]:
+    rows = []
+    version = rates_version(session)
+    for base, currency, first, last, count in session.query(
+        ExchangeRate.base, ExchangeRate.currency,
+        func.min(ExchangeRate.date), func.max(ExchangeRate.date), func.count()
+    ).group_by(ExchangeRate.base, ExchangeRate.currency).order_by(ExchangeRate.base, ExchangeRate.currency):
+        dates, rates = _load_series(session, version, base, currency)
+        rows.append(RateSeriesRow(base, currency, first, last, count, rates[-1]))
+    return rows
+
+def render_rate_series(rows: List[RateSeriesRow]):
+    from rich.table import Table
+    from rich import box
+
+    table = Table(title="Exchange Rates", box=box.ROUNDED)
+    table.add_column("Base", style="cyan")
+    table.add_column("Currency", style="cyan")
+    table.add_column("From")
+    table.add_column("To")
+    table.add_column("Rates", justify="right")
+    table.add_column("Latest", style="green", justify="right")
+    for row in rows:
+        table.add_row(
+            row.base, row.currency, row.first.isoformat(), row.last.isoformat(), str(row.count), f"{row.latest:g}"
+        )
+    console.print(table)
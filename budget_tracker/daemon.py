@@ -0,0 +1,130 @@
+"""
+Local daemon behind `budget serve`.
+
+The daemon keeps one engine, the session factory and the imported command
+modules alive, and runs forwarded CLI commands serially over a Unix socket.
+See client.py for the other end.
+"""
+
+import contextlib
+import importlib
+import io
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+import traceback
+from typing import Dict, List, Optional
+from .client import connect, send_request, socket_path
+
+# Imported once at startup so the first forwarded command is as fast as the rest.
+PRELOADED_MODULES = ['transactions', 'budgets', 'reports', 'search', 'rollups', 'settings', 'recurring']
+
+def _read_request(conn: socket.socket) -> dict:
+    chunks = []
+    while True:
+        chunk = conn.recv(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    return json.loads(b''.join(chunks))
+
+@contextlib.contextmanager
+def _captured_consoles(stdout: io.StringIO, width: Optional[int], color_system: Optional[str]):
+    from rich.console import Console
+
+    console = Console(
+        file=stdout, width=width or 80, color_system=color_system,
+        force_terminal=color_system is not None, legacy_windows=False
+    )
+    # Every module prints through its own module-level console.
+    swapped = []
+    for name, module in list(sys.modules.items()):
+        if name.startswith('budget_tracker.') and isinstance(getattr(module, 'console', None), Console):
+            swapped.append((module, module.console))
+            module.console = console
+    try:
+        yield console
+    finally:
+        for module, original in swapped:
+            module.console = original
+
+def handle(db_path: Optional[str], argv: List[str], width: Optional[int] = None, color_system: Optional[str] = None) -> Dict:
+    from .cli import run_command
+
+    stdout, stderr = io.StringIO(), io.StringIO()
+    with _captured_consoles(stdout, width, color_system), \
+            contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        try:
+            exit_code = run_command((['--db', db_path] if db_path else []) + argv)
+        except Exception:
+            traceback.print_exc()
+            exit_code = 1
+    return {'stdout': stdout.getvalue(), 'stderr': stderr.getvalue(), 'exit_code': exit_code}
+
+def is_running(path: str) -> bool:
+    try:
+        connect(path).close()
+    except OSError:
+        return False
+    return True
+
+def stop(db_path: Optional[str]) -> bool:
+    try:
+        conn = connect(socket_path(db_path))
+    except OSError:
+        return False
+    send_request(conn, {'stop': True})
+    return True
+
+def serve(db_path: Optional[str], path: Optional[str] = None, on_ready=None):
+    # db_path is None when ledgers are sharded: commands then route by --ledger
+    # through the engine registry's LRU pool instead of one fixed file.
+    from .database import get_engine
+
+    db_path = os.path.abspath(db_path) if db_path else None
+    path = path or socket_path(db_path)
+    if is_running(path):
+        raise ValueError(f"A budget daemon is already serving on {path}")
+    if os.path.exists(path):
+        os.unlink(path)
+
+    if db_path:
+        get_engine(db_path)
+    for name in PRELOADED_MODULES:
+        importlib.import_module(f"{__package__}.{name}")
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    umask = os.umask(0o177)
+    try:
+        server.bind(path)
+    finally:
+        os.umask(umask)
+    server.listen(16)
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    if on_ready:
+        on_ready(path)
+
+    try:
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                try:
+                    request = _read_request(conn)
+                except ValueError:
+                    continue
+                if request.get('stop'):
+                    conn.sendall(json.dumps({'exit_code': 0}).encode('utf-8'))
+                    break
+                response = handle(db_path, request.get('argv', []), request.get('width'), request.get('color_system'))
+                try:
+                    conn.sendall(json.dumps(response).encode('utf-8'))
+                except OSError:
+                    pass
+    finally:
+        server.close()
+        if os.path.exists(path):
+            os.unlink(path)
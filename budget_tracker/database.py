@@ -1,42 +1,717 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, Date, DateTime
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy import create_engine, event, inspect, text, DDL, Column, Float, Index, Integer, String, Date, DateTime
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import declarative_base, sessionmaker, Session
 from datetime import datetime
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import quote
 import os
+import sqlite3
+import threading
+import time
+from .config import (
+    DEFAULT_LEDGER, get_busy_timeout, get_db_path, get_ledger, get_max_engines, get_read_retries,
+    get_shard_dir, get_sqlite_pragmas, validate_sqlite_pragma
+)
+from .profiling import Timer, timed, watch_sql
+from .utils import DEFAULT_CURRENCY_EXPONENT, currency_exponent, from_minor, to_minor
 
 Base = declarative_base()
 
+# Bump whenever the schema changes and register the upgrade step in _MIGRATIONS.
+SCHEMA_VERSION = 13
+
+def normalize_category(category: str) -> str:
+    return category.strip().casefold()
+
+def _default_category_key(context) -> str:
+    return normalize_category(context.get_current_parameters()['category'])
+
 class Transaction(Base):
     __tablename__ = 'transactions'
+    __table_args__ = (
+        # Tombstoned rows are left out of the read indexes; queries opt in with NOT_DELETED.
+        # The trailing currency and always-NULL deleted_by keep range sums index-only.
+        Index(
+            'ix_transactions_ledger_date_type_amount', 'ledger_id', 'date', 'type', 'amount_minor',
+            'currency', 'deleted_by', sqlite_where=text('deleted_by IS NULL')
+        ),
+        # Only rows in another currency; converted aggregations read just this.
+        Index(
+            'ix_transactions_ledger_foreign', 'ledger_id', 'date', 'currency', 'type', 'category',
+            'amount_minor', 'deleted_by', sqlite_where=text('currency IS NOT NULL AND deleted_by IS NULL')
+        ),
+        # The same rows by category, for the budget check after each insert.
+        Index(
+            'ix_transactions_ledger_foreign_category_key', 'ledger_id', 'category_key', 'date', 'currency', 'type',
+            'amount_minor', 'deleted_by', sqlite_where=text('currency IS NOT NULL AND deleted_by IS NULL')
+        ),
+        Index(
+            'ix_transactions_ledger_category_key_date', 'ledger_id', 'category_key', 'date',
+            sqlite_where=text('deleted_by IS NULL')
+        ),
+        Index('ix_transactions_deleted_by', 'deleted_by', sqlite_where=text('deleted_by IS NOT NULL')),
+        # One live row per rule occurrence, so re-running the materializer inserts nothing
+        # twice; a backfill may re-post an occurrence whose row was soft-deleted.
+        Index(
+            'ix_transactions_recurring_rule_date', 'recurring_rule_id', 'date',
+            unique=True, sqlite_where=text('recurring_rule_id IS NOT NULL AND deleted_by IS NULL')
+        ),
+    )
 
     id = Column(Integer, primary_key=True)
+    # Every query filters on the session's ledger, so indexes lead with it.
+    ledger_id = Column(String, nullable=False, default=DEFAULT_LEDGER, server_default=DEFAULT_LEDGER)
     type = Column(String, nullable=False)
-    amount = Column(Float, nullable=False)
+    # Integer minor units (cents) so sums are exact; see utils.to_minor.
+    amount_minor = Column(Integer, nullable=False)
     category = Column(String, nullable=False)
+    # Case-folded copy of category so filters are an index seek, not ilike().
+    category_key = Column(String, default=_default_category_key)
     description = Column(String)
     date = Column(Date, nullable=False)
+    # Set on rows posted by the recurring materializer.
+    recurring_rule_id = Column(Integer)
+    # Soft-delete tombstone: the undo_journal entry that deleted the row.
+    deleted_by = Column(Integer)
+    # ISO 4217 code when the amount is not in the ledger's own currency, else NULL.
+    # Foreign amounts are in that currency's minor units (yen have none).
+    currency = Column(String)
     created_at = Column(DateTime, default=datetime.now)
 
+    @property
+    def amount(self) -> float:
+        return from_minor(self.amount_minor, currency_exponent(self.currency))
+
+    @amount.setter
+    def amount(self, value: float):
+        self.amount_minor = to_minor(value, currency_exponent(self.currency))
+
     def __repr__(self):
         return f"<Transaction({self.type}, {self.amount}, {self.category})>"
 
+# Every read of transactions filters on this, which also lets SQLite use the partial indexes.
+NOT_DELETED = Transaction.deleted_by.is_(None)
+# Rows in the ledger's own currency (the ones the rollups count) and the rest.
+NATIVE = Transaction.currency.is_(None)
+FOREIGN = Transaction.currency.is_not(None)
+
+class ExchangeRate(Base):
+    __tablename__ = 'exchange_rates'
+
+    # One unit of base buys rate units of currency on date, as in the ECB tables.
+    base = Column(String, primary_key=True)
+    currency = Column(String, primary_key=True)
+    date = Column(Date, primary_key=True)
+    rate = Column(Float, nullable=False)
+
+class UndoEntry(Base):
+    __tablename__ = 'undo_journal'
+    __table_args__ = (
+        Index('ix_undo_journal_ledger_id', 'ledger_id', 'id'),
+        # Tombstones point at these ids, so they are never reused.
+        {'sqlite_autoincrement': True},
+    )
+
+    id = Column(Integer, primary_key=True)
+    ledger_id = Column(String, nullable=False, default=DEFAULT_LEDGER, server_default=DEFAULT_LEDGER)
+    # What was deleted, for `budget undo --list`.
+    description = Column(String, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.now)
+
+class RecurringRule(Base):
+    __tablename__ = 'recurring_rules'
+    __table_args__ = (
+        Index('ix_recurring_rules_ledger_next_date', 'ledger_id', 'next_date'),
+        # Never reuse a deleted rule's id: its posted rows still carry it.
+        {'sqlite_autoincrement': True},
+    )
+
+    id = Column(Integer, primary_key=True)
+    ledger_id = Column(String, nullable=False, default=DEFAULT_LEDGER, server_default=DEFAULT_LEDGER)
+    type = Column(String, nullable=False)
+    amount_minor = Column(Integer, nullable=False)
+    category = Column(String, nullable=False)
+    description = Column(String)
+    # RFC 5545 RRULE body, e.g. FREQ=MONTHLY;BYMONTHDAY=1; COUNT is folded into end_date.
+    rrule = Column(String, nullable=False)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date)
+    # First occurrence not yet posted; NULL once the rule is exhausted.
+    next_date = Column(Date)
+    created_at = Column(DateTime, default=datetime.now)
+
+    @property
+    def amount(self) -> float:
+        return from_minor(self.amount_minor)
+
 class Settings(Base):
     __tablename__ = 'settings'
+    __table_args__ = (
+        Index('ix_settings_ledger_id', 'ledger_id', unique=True),
+    )
 
     id = Column(Integer, primary_key=True)
+    ledger_id = Column(String, nullable=False, default=DEFAULT_LEDGER, server_default=DEFAULT_LEDGER)
     currency_symbol = Column(String, default='$')
-    monthly_budget = Column(Float, default=0.0)
-    savings_goal_amount = Column(Float, default=0.0)
+    # ISO 4217 code of the ledger's own currency; reports convert into it.
+    currency_code = Column(String)
+    monthly_budget_minor = Column(Integer, default=0)
+    savings_goal_minor = Column(Integer, default=0)
     savings_goal_name = Column(String, default='Savings Goal')
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
 
-def init_db():
-    engine = create_engine('sqlite:///budget.db', echo=False)
-    Base.metadata.create_all(engine)
+    @property
+    def monthly_budget(self) -> float:
+        return from_minor(self.monthly_budget_minor or 0)
+
+    @monthly_budget.setter
+    def monthly_budget(self, value: float):
+        self.monthly_budget_minor = to_minor(value)
+
+    @property
+    def savings_goal_amount(self) -> float:
+        return from_minor(self.savings_goal_minor or 0)
+
+    @savings_goal_amount.setter
+    def savings_goal_amount(self, value: float):
+        self.savings_goal_minor = to_minor(value)
+
+class CategoryBudget(Base):
+    __tablename__ = 'category_budgets'
+
+    ledger_id = Column(String, primary_key=True, default=DEFAULT_LEDGER, server_default=DEFAULT_LEDGER)
+    # Budgets match categories case-insensitively, like the category filters.
+    category_key = Column(String, primary_key=True)
+    category = Column(String, nullable=False)
+    amount_minor = Column(Integer, nullable=False)
+    # Percent of the budget that triggers the early warning; 100% always alerts.
+    warn_percent = Column(Integer, nullable=False, default=80)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+    @property
+    def amount(self) -> float:
+        return from_minor(self.amount_minor)
+
+class MonthlyRollup(Base):
+    __tablename__ = 'monthly_rollups'
+    __table_args__ = (
+        # A category budget check after an insert reads only its own key's rows, index-only.
+        Index('ix_monthly_rollups_ledger_month_category_key', 'ledger_id', 'month', 'category_key', 'type', 'total'),
+    )
+
+    ledger_id = Column(String, primary_key=True, default=DEFAULT_LEDGER, server_default=DEFAULT_LEDGER)
+    month = Column(String, primary_key=True)
+    category = Column(String, primary_key=True)
+    type = Column(String, primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
+    category_key = Column(String)
+
+# monthly_rollups is kept in step with transactions by these triggers, so every
+# write path (ORM, bulk insert, raw SQL) updates the month x category x type sums.
+# Tombstoning a row takes it out of the sums and undoing the delete puts it back.
+# Only rows in the ledger's own currency are summed; the rest are converted at
+# read time (see currency.foreign_totals), since their value depends on the day.
+_ROLLUP_TRIGGERS = {
+    'trg_transactions_rollup_insert': """
+        CREATE TRIGGER trg_transactions_rollup_insert AFTER INSERT ON transactions
+        WHEN NEW.deleted_by IS NULL AND NEW.currency IS NULL
+        BEGIN
+            INSERT INTO monthly_rollups (ledger_id, month, category, type, total, count, category_key)
+            VALUES (NEW.ledger_id, strftime('%Y-%m', NEW.date), NEW.category, NEW.type, NEW.amount_minor, 1, NEW.category_key)
+            ON CONFLICT (ledger_id, month, category, type) DO UPDATE SET
+                total = total + excluded.total,
+                count = count + 1;
+        END
+    """,
+    'trg_transactions_rollup_delete': """
+        CREATE TRIGGER trg_transactions_rollup_delete AFTER DELETE ON transactions
+        WHEN OLD.deleted_by IS NULL AND OLD.currency IS NULL
+        BEGIN
+            UPDATE monthly_rollups SET total = total - OLD.amount_minor, count = count - 1
+            WHERE ledger_id = OLD.ledger_id AND month = strftime('%Y-%m', OLD.date)
+              AND category = OLD.category AND type = OLD.type;
+            DELETE FROM monthly_rollups
+            WHERE ledger_id = OLD.ledger_id AND month = strftime('%Y-%m', OLD.date)
+              AND category = OLD.category AND type = OLD.type AND count <= 0;
+        END
+    """,
+    'trg_transactions_rollup_update': """
+        CREATE TRIGGER trg_transactions_rollup_update
+        AFTER UPDATE OF amount_minor, category, type, date, ledger_id, deleted_by, currency ON transactions
+        BEGIN
+            UPDATE monthly_rollups SET total = total - OLD.amount_minor, count = count - 1
+            WHERE ledger_id = OLD.ledger_id AND month = strftime('%Y-%m', OLD.date)
+              AND category = OLD.category AND type = OLD.type
+              AND OLD.deleted_by IS NULL AND OLD.currency IS NULL;
+            DELETE FROM monthly_rollups
+            WHERE ledger_id = OLD.ledger_id AND month = strftime('%Y-%m', OLD.date)
+              AND category = OLD.category AND type = OLD.type AND count <= 0;
+            INSERT INTO monthly_rollups (ledger_id, month, category, type, total, count, category_key)
+            SELECT NEW.ledger_id, strftime('%Y-%m', NEW.date), NEW.category, NEW.type, NEW.amount_minor, 1, NEW.category_key
+            WHERE NEW.deleted_by IS NULL AND NEW.currency IS NULL
+            ON CONFLICT (ledger_id, month, category, type) DO UPDATE SET
+                total = total + excluded.total,
+                count = count + 1;
+        END
+    """,
+}
+
+# External-content FTS5 index over description/category; rows live in transactions.
+# Like the rollups, it only covers rows that are not tombstoned.
+CREATE_FTS_SQL = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+        description, category,
+        content='transactions', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+"""
+
+event.listen(Transaction.__table__, 'after_create', DDL(CREATE_FTS_SQL))
+
+_FTS_TRIGGERS = {
+    'trg_transactions_fts_insert': """
+        CREATE TRIGGER trg_transactions_fts_insert AFTER INSERT ON transactions
+        WHEN NEW.deleted_by IS NULL
+        BEGIN
+            INSERT INTO transactions_fts (rowid, description, category)
+            VALUES (NEW.id, NEW.description, NEW.category);
+        END
+    """,
+    'trg_transactions_fts_delete': """
+        CREATE TRIGGER trg_transactions_fts_delete AFTER DELETE ON transactions
+        WHEN OLD.deleted_by IS NULL
+        BEGIN
+            INSERT INTO transactions_fts (transactions_fts, rowid, description, category)
+            VALUES ('delete', OLD.id, OLD.description, OLD.category);
+        END
+    """,
+    'trg_transactions_fts_update': """
+        CREATE TRIGGER trg_transactions_fts_update
+        AFTER UPDATE OF description, category, deleted_by ON transactions
+        BEGIN
+            INSERT INTO transactions_fts (transactions_fts, rowid, description, category)
+            SELECT 'delete', OLD.id, OLD.description, OLD.category WHERE OLD.deleted_by IS NULL;
+            INSERT INTO transactions_fts (rowid, description, category)
+            SELECT NEW.id, NEW.description, NEW.category WHERE NEW.deleted_by IS NULL;
+        END
+    """,
+}
+
+REBUILD_ROLLUPS_SQL = """
+    INSERT INTO monthly_rollups (ledger_id, month, category, type, total, count, category_key)
+    SELECT ledger_id, strftime('%Y-%m', date), category, type, SUM(amount_minor), COUNT(*), MAX(category_key)
+    FROM transactions
+    WHERE deleted_by IS NULL AND currency IS NULL
+    GROUP BY ledger_id, strftime('%Y-%m', date), category, type
+"""
+
+def session_ledger(session: Session) -> str:
+    return session.info.get('ledger', DEFAULT_LEDGER)
+
+DataVersion = Tuple[object, int]
+
+def data_version(session: Session) -> DataVersion:
+    # PRAGMA data_version changes whenever another connection (in any process)
+    # commits, so an in-memory cache stamped with it knows when to reload. The
+    # value is only comparable on one connection, hence the per-connection token.
+    connection = session.connection()
+    token = connection.connection.info.setdefault('data_version_token', object())
+    return token, connection.exec_driver_sql("PRAGMA data_version").scalar()
+
+# Least recently used first; bounded by config.get_max_engines() so a process
+# routing many sharded ledgers holds a fixed number of open files.
+_engines: "OrderedDict[str, Engine]" = OrderedDict()
+_session_factories: Dict[str, sessionmaker] = {}
+_registry_lock = threading.Lock()
+
+def _migrate_to_1(connection):
+    # Pre-versioned databases only ever had the tables create_all() builds.
+    pass
+
+# Migrations below 7 ran against the Float amount column and spell out their
+# SQL so later model changes don't leak into them.
+
+def _migrate_to_2(connection):
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_transactions_date_type ON transactions (date, type)"))
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_transactions_category_date ON transactions (category, date)"))
+
+def _migrate_to_3(connection):
+    connection.execute(text("DELETE FROM monthly_rollups"))
+    connection.execute(text("""
+        INSERT INTO monthly_rollups (month, category, type, total, count)
+        SELECT strftime('%Y-%m', date), category, type, SUM(amount), COUNT(*)
+        FROM transactions
+        GROUP BY strftime('%Y-%m', date), category, type
+    """))
+
+def _migrate_to_4(connection):
+    # Extend the (date, type) index with amount so range sums are index-only scans.
+    connection.execute(text("DROP INDEX IF EXISTS ix_transactions_date_type"))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_transactions_date_type_amount ON transactions (date, type, amount)"
+    ))
+
+def _has_column(connection, table_name: str, column_name: str) -> bool:
+    return column_name in {column['name'] for column in inspect(connection).get_columns(table_name)}
+
+def _add_column(connection, table, column_name: str):
+    if not _has_column(connection, table.name, column_name):
+        column = table.c[column_name]
+        column_type = column.type.compile(connection.dialect)
+        connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_name} {column_type}"))
+
+def _migrate_to_5(connection):
+    _add_column(connection, Transaction.__table__, 'category_key')
+    categories = connection.execute(text("SELECT DISTINCT category FROM transactions")).scalars().all()
+    for category in categories:
+        connection.execute(
+            text("UPDATE transactions SET category_key = :key WHERE category = :category"),
+            {'key': normalize_category(category), 'category': category}
+        )
+    connection.execute(text("DROP INDEX IF EXISTS ix_transactions_category_date"))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_transactions_category_key_date ON transactions (category_key, date)"
+    ))
+
+def _migrate_to_6(connection):
+    connection.execute(text(CREATE_FTS_SQL))
+    connection.execute(text("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')"))
+
+def _rebuild_table(connection, table, column_sql: Dict[str, str]):
+    # SQLite cannot change a column's type in place: copy into a fresh table.
+    old_name = f"{table.name}_old"
+    for index in inspect(connection).get_indexes(table.name):
+        connection.execute(text(f"DROP INDEX IF EXISTS {index['name']}"))
+    connection.execute(text(f"ALTER TABLE {table.name} RENAME TO {old_name}"))
+    table.create(connection)
+    connection.execute(text(
+        f"INSERT INTO {table.name} ({', '.join(column_sql)}) "
+        f"SELECT {', '.join(column_sql.values())} FROM {old_name}"
+    ))
+    connection.execute(text(f"DROP TABLE {old_name}"))
+
+def _migrate_to_7(connection):
+    to_minor_sql = "CAST(ROUND({column} * %d) AS INTEGER)" % 10 ** DEFAULT_CURRENCY_EXPONENT
+    if _has_column(connection, 'transactions', 'amount'):
+        _rebuild_table(connection, Transaction.__table__, {
+            'id': 'id',
+            'type': 'type',
+            'amount_minor': to_minor_sql.format(column='amount'),
+            'category': 'category',
+            'category_key': 'category_key',
+            'description': 'description',
+            'date': 'date',
+            'created_at': 'created_at',
+        })
+    if _has_column(connection, 'settings', 'monthly_budget'):
+        _rebuild_table(connection, Settings.__table__, {
+            'id': 'id',
+            'currency_symbol': 'currency_symbol',
+            'monthly_budget_minor': to_minor_sql.format(column='COALESCE(monthly_budget, 0)'),
+            'savings_goal_minor': to_minor_sql.format(column='COALESCE(savings_goal_amount, 0)'),
+            'savings_goal_name': 'savings_goal_name',
+            'created_at': 'created_at',
+            'updated_at': 'updated_at',
+        })
+    MonthlyRollup.__table__.drop(connection)
+    MonthlyRollup.__table__.create(connection)
+    connection.execute(text("""
+        INSERT INTO monthly_rollups (month, category, type, total, count)
+        SELECT strftime('%Y-%m', date), category, type, SUM(amount_minor), COUNT(*)
+        FROM transactions
+        GROUP BY strftime('%Y-%m', date), category, type
+    """))
+
+def _migrate_to_8(connection):
+    default = f"NOT NULL DEFAULT '{DEFAULT_LEDGER}'"
+    if not _has_column(connection, 'transactions', 'ledger_id'):
+        connection.execute(text(f"ALTER TABLE transactions ADD COLUMN ledger_id VARCHAR {default}"))
+    connection.execute(text("DROP INDEX IF EXISTS ix_transactions_date_type_amount"))
+    connection.execute(text("DROP INDEX IF EXISTS ix_transactions_category_key_date"))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_transactions_ledger_date_type_amount "
+        "ON transactions (ledger_id, date, type, amount_minor)"
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_transactions_ledger_category_key_date "
+        "ON transactions (ledger_id, category_key, date)"
+    ))
+
+    # Settings was a single row; it becomes the default ledger's row.
+    if not _has_column(connection, 'settings', 'ledger_id'):
+        connection.execute(text("DELETE FROM settings WHERE id <> (SELECT MIN(id) FROM settings)"))
+        connection.execute(text(f"ALTER TABLE settings ADD COLUMN ledger_id VARCHAR {default}"))
+    for index in Settings.__table__.indexes:
+        index.create(connection, checkfirst=True)
+
+    if not _has_column(connection, 'monthly_rollups', 'ledger_id'):
+        MonthlyRollup.__table__.drop(connection)
+        MonthlyRollup.__table__.create(connection)
+        connection.execute(text("""
+            INSERT INTO monthly_rollups (ledger_id, month, category, type, total, count)
+            SELECT ledger_id, strftime('%Y-%m', date), category, type, SUM(amount_minor), COUNT(*)
+            FROM transactions
+            GROUP BY ledger_id, strftime('%Y-%m', date), category, type
+        """))
+
+def _migrate_to_9(connection):
+    # recurring_rules itself is created by create_all().
+    _add_column(connection, Transaction.__table__, 'recurring_rule_id')
+    connection.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_transactions_recurring_rule_date "
+        "ON transactions (recurring_rule_id, date) WHERE recurring_rule_id IS NOT NULL"
+    ))
+
+def _migrate_to_10(connection):
+    # category_budgets is a new table; create_all() already made it.
+    pass
+
+def _migrate_to_11(connection):
+    # undo_journal is created by create_all(); the read indexes become partial.
+    if not _has_column(connection, 'transactions', 'deleted_by'):
+        connection.execute(text("ALTER TABLE transactions ADD COLUMN deleted_by INTEGER"))
+    connection.execute(text("DROP INDEX IF EXISTS ix_transactions_ledger_date_type_amount"))
+    connection.execute(text("DROP INDEX IF EXISTS ix_transactions_ledger_category_key_date"))
+    connection.execute(text(
+        "CREATE INDEX ix_transactions_ledger_date_type_amount "
+        "ON transactions (ledger_id, date, type, amount_minor, deleted_by) WHERE deleted_by IS NULL"
+    ))
+    connection.execute(text(
+        "CREATE INDEX ix_transactions_ledger_category_key_date "
+        "ON transactions (ledger_id, category_key, date) WHERE deleted_by IS NULL"
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_transactions_deleted_by "
+        "ON transactions (deleted_by) WHERE deleted_by IS NOT NULL"
+    ))
+    connection.execute(text("DROP INDEX IF EXISTS ix_transactions_recurring_rule_date"))
+    connection.execute(text(
+        "CREATE UNIQUE INDEX ix_transactions_recurring_rule_date ON transactions (recurring_rule_id, date) "
+        "WHERE recurring_rule_id IS NOT NULL AND deleted_by IS NULL"
+    ))
+
+def _migrate_to_12(connection):
+    # exchange_rates is created by create_all(); existing rows are all in the ledger's currency.
+    if not _has_column(connection, 'transactions', 'currency'):
+        connection.execute(text("ALTER TABLE transactions ADD COLUMN currency VARCHAR"))
+    if not _has_column(connection, 'settings', 'currency_code'):
+        connection.execute(text("ALTER TABLE settings ADD COLUMN currency_code VARCHAR"))
+    connection.execute(text("DROP INDEX IF EXISTS ix_transactions_ledger_date_type_amount"))
+    connection.execute(text(
+        "CREATE INDEX ix_transactions_ledger_date_type_amount "
+        "ON transactions (ledger_id, date, type, amount_minor, currency, deleted_by) WHERE deleted_by IS NULL"
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_transactions_ledger_foreign "
+        "ON transactions (ledger_id, date, currency, type, category, amount_minor, deleted_by) "
+        "WHERE currency IS NOT NULL AND deleted_by IS NULL"
+    ))
+
+def _migrate_to_13(connection):
+    _add_column(connection, MonthlyRollup.__table__, 'category_key')
+    categories = connection.execute(text("SELECT DISTINCT category FROM monthly_rollups")).scalars().all()
+    for category in categories:
+        connection.execute(
+            text("UPDATE monthly_rollups SET category_key = :key WHERE category = :category"),
+            {'key': normalize_category(category), 'category': category}
+        )
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_monthly_rollups_ledger_month_category_key "
+        "ON monthly_rollups (ledger_id, month, category_key, type, total)"
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_transactions_ledger_foreign_category_key "
+        "ON transactions (ledger_id, category_key, date, currency, type, amount_minor, deleted_by) "
+        "WHERE currency IS NOT NULL AND deleted_by IS NULL"
+    ))
+
+_MIGRATIONS = {
+    1: _migrate_to_1,
+    2: _migrate_to_2,
+    3: _migrate_to_3,
+    4: _migrate_to_4,
+    5: _migrate_to_5,
+    6: _migrate_to_6,
+    7: _migrate_to_7,
+    8: _migrate_to_8,
+    9: _migrate_to_9,
+    10: _migrate_to_10,
+    11: _migrate_to_11,
+    12: _migrate_to_12,
+    13: _migrate_to_13,
+}
+
+def _create_triggers(connection):
+    for name, ddl in {**_ROLLUP_TRIGGERS, **_FTS_TRIGGERS}.items():
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        connection.execute(text(ddl))
+
+def _apply_pragmas(engine: Engine, pragmas: Dict[str, object]):
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={validate_sqlite_pragma(name, value)}")
+        cursor.close()
+
+def _ensure_schema(engine: Engine):
+    with engine.begin() as connection:
+        version = connection.exec_driver_sql("PRAGMA user_version").scalar()
+        if version >= SCHEMA_VERSION:
+            return
+
+        is_new = version == 0 and not inspect(connection).has_table(Transaction.__tablename__)
+        Base.metadata.create_all(connection)
+        if not is_new:
+            for target in range(version + 1, SCHEMA_VERSION + 1):
+                _MIGRATIONS[target](connection)
+        _create_triggers(connection)
+
+        connection.exec_driver_sql(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+def resolve_db_path(db_path: Optional[str] = None, ledger: Optional[str] = None) -> str:
+    if db_path:
+        return os.path.abspath(db_path)
+    shard_dir = get_shard_dir()
+    if shard_dir:
+        return os.path.abspath(os.path.join(shard_dir, f"{ledger or get_ledger()}.db"))
+    return os.path.abspath(get_db_path())
+
+def _evict_engines():
+    while len(_engines) > get_max_engines():
+        path, engine = _engines.popitem(last=False)
+        _session_factories.pop(path, None)
+        # Checked-out connections stay valid and are closed when their session ends.
+        engine.dispose()
+
+def _engine_options(path: str, driver: str = 'sqlite') -> Tuple[str, Dict[str, Any]]:
+    # URL and connect_args shared by the sync and async engines, so every
+    # writer waits up to BUDGET_BUSY_TIMEOUT on a lock instead of failing.
+    return f'{driver}:///{path}', {'connect_args': {'timeout': get_busy_timeout()}}
+
+def get_engine(db_path: Optional[str] = None, ledger: Optional[str] = None) -> Engine:
+    path = resolve_db_path(db_path, ledger)
+    watch_sql()
+    with _registry_lock:
+        engine = _engines.get(path)
+        if engine is None:
+            with Timer('database.create_engine'):
+                url, options = _engine_options(path)
+                engine = create_engine(url, echo=False, **options)
+                _apply_pragmas(engine, get_sqlite_pragmas())
+            with Timer('database.ensure_schema'):
+                _ensure_schema(engine)
+            _engines[path] = engine
+            _session_factories[path] = sessionmaker(bind=engine)
+            _evict_engines()
+        else:
+            _engines.move_to_end(path)
+    return engine
+
+def init_db(db_path: Optional[str] = None) -> Engine:
+    return get_engine(db_path)
+
+# Pragmas that only shape how a connection reads; journal_mode and synchronous
+# are the writer's business and cannot be changed through a read-only handle.
+_READ_PRAGMAS = ('mmap_size', 'cache_size', 'temp_store')
+
+def _is_busy(error: sqlite3.OperationalError) -> bool:
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+def _begin_snapshot(dbapi_connection, retries: int):
+    # BEGIN plus a first read pins the WAL snapshot: every query in the session
+    # then sees the database as of this moment, whatever the writer commits
+    # meanwhile. busy_timeout covers short waits (WAL recovery, a checkpoint,
+    # a writer in rollback-journal mode); past that, back off and try again.
+    for attempt in range(retries + 1):
+        try:
+            dbapi_connection.execute("BEGIN")
+            dbapi_connection.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+            return
+        except sqlite3.OperationalError as e:
+            if dbapi_connection.in_transaction:
+                dbapi_connection.rollback()
+            if not _is_busy(e) or attempt == retries:
+                raise
+            time.sleep(0.05 * 2 ** attempt)
+
+def create_readonly_engine(path: str, **kwargs) -> Engine:
+    # mode=ro: the connection can never write, migrate or take the write lock,
+    # so readers and the writer do not wait on each other under WAL.
+    if not os.path.isfile(path):
+        raise ValueError(f"{path}: no such database file")
+    uri = f"file:{quote(os.path.abspath(path))}?mode=ro"
+    engine = create_engine(
+        f"sqlite:///{uri}&uri=true", echo=False, connect_args={'timeout': get_busy_timeout()}, **kwargs
+    )
+    pragmas = get_sqlite_pragmas()
+    _apply_pragmas(engine, {**{name: pragmas[name] for name in _READ_PRAGMAS}, 'query_only': 1})
+    retries = get_read_retries()
+
+    @event.listens_for(engine, "connect")
+    def _manual_transactions(dbapi_connection, connection_record):
+        # Let SQLAlchemy's begin event issue BEGIN, so reads share one transaction.
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _snapshot(connection):
+        _begin_snapshot(connection.connection.driver_connection, retries)
+
+    return engine
+
+def get_readonly_engine(db_path: Optional[str] = None, ledger: Optional[str] = None) -> Engine:
+    path = resolve_db_path(db_path, ledger)
+    key = f"{path}?mode=ro"
+    watch_sql()
+    with _registry_lock:
+        engine = _engines.get(key)
+        if engine is not None:
+            _engines.move_to_end(key)
+            return engine
+
+    # A read-only handle cannot create or upgrade the file, so the first open
+    # of a new or older database goes through the normal engine once.
+    if not os.path.isfile(path):
+        get_engine(path)
+    with Timer('database.create_engine'):
+        engine = create_readonly_engine(path)
+    with engine.connect() as connection:
+        version = connection.exec_driver_sql("PRAGMA user_version").scalar()
+    if version < SCHEMA_VERSION:
+        get_engine(path)
+
+    with _registry_lock:
+        if key in _engines:
+            engine.dispose()
+            engine = _engines[key]
+        else:
+            _engines[key] = engine
+            _session_factories[key] = sessionmaker(bind=engine, autoflush=False)
+            _evict_engines()
     return engine
 
-def get_session():
-    engine = init_db()
-    Session = sessionmaker(bind=engine)
-    return Session()
+@timed()
+def get_readonly_session(db_path: Optional[str] = None, ledger: Optional[str] = None) -> Session:
+    ledger = ledger or get_ledger()
+    engine = get_readonly_engine(db_path, ledger)
+    factory = _session_factories.get(f"{resolve_db_path(db_path, ledger)}?mode=ro") or sessionmaker(bind=engine)
+    return factory(info={'ledger': ledger, 'read_only': True})
+
+@timed()
+def get_session(db_path: Optional[str] = None, ledger: Optional[str] = None) -> Session:
+    ledger = ledger or get_ledger()
+    engine = get_engine(db_path, ledger)
+    factory = _session_factories.get(resolve_db_path(db_path, ledger)) or sessionmaker(bind=engine)
+    return factory(info={'ledger': ledger})
+
+def dispose_engines():
+    with _registry_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+        _session_factories.clear()
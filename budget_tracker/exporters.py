@@ -0,0 +1,150 @@
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from datetime import date
+from typing import Iterator, Optional, Sequence, Tuple
+import csv
+import gzip
+import io
+import json
+import sys
+from .database import NOT_DELETED, Transaction, normalize_category, session_ledger
+from .utils import currency_exponent, format_minor, from_minor
+
+# currency is empty for amounts in the ledger's own currency.
+EXPORT_FIELDS = ['id', 'type', 'amount', 'category', 'description', 'date', 'currency']
+EXPORT_FORMATS = ['csv', 'jsonl', 'parquet', 'arrow']
+DEFAULT_BATCH_SIZE = 10000
+
+def iter_export_batches(
+    session: Session,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    type: Optional[str] = None,
+    category: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE
+) -> Iterator[Sequence[Tuple]]:
+    query = select(
+        Transaction.id, Transaction.type, Transaction.amount_minor,
+        Transaction.category, Transaction.description, Transaction.date, Transaction.currency
+    ).where(Transaction.ledger_id == session_ledger(session), NOT_DELETED)
+    if start_date:
+        query = query.where(Transaction.date >= start_date)
+    if end_date:
+        query = query.where(Transaction.date < end_date)
+    if type:
+        query = query.where(Transaction.type == type)
+    if category:
+        query = query.where(Transaction.category_key == normalize_category(category))
+    query = query.order_by(Transaction.date.desc(), Transaction.id.desc())
+
+    result = session.execute(query.execution_options(yield_per=batch_size))
+    for partition in result.partitions():
+        yield partition
+
+def _open_text(filename: str, compress: bool):
+    if filename == '-':
+        stream = sys.stdout.buffer
+        if compress:
+            return gzip.open(stream, 'wt', encoding='utf-8', newline='')
+        return io.TextIOWrapper(stream, encoding='utf-8', newline='', write_through=True)
+    if compress:
+        return gzip.open(filename, 'wt', encoding='utf-8', newline='')
+    return open(filename, 'w', newline='', encoding='utf-8')
+
+def _write_csv(batches, handle) -> int:
+    writer = csv.writer(handle)
+    writer.writerow(EXPORT_FIELDS)
+    count = 0
+    for batch in batches:
+        writer.writerows(
+            (row[0], row[1], format_minor(row[2], currency_exponent(row[6])), row[3], row[4], row[5].isoformat(), row[6] or '')
+            for row in batch
+        )
+        count += len(batch)
+    return count
+
+def _write_jsonl(batches, handle) -> int:
+    dumps = json.dumps
+    count = 0
+    for batch in batches:
+        handle.writelines(
+            dumps({
+                'id': row[0], 'type': row[1], 'amount': from_minor(row[2], currency_exponent(row[6])), 'category': row[3],
+                'description': row[4], 'date': row[5].isoformat(), 'currency': row[6]
+            }, ensure_ascii=False) + '\n'
+            for row in batch
+        )
+        count += len(batch)
+    return count
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError("Parquet/Arrow export requires pyarrow: pip install 'budget-tracker[arrow]'")
+    return pyarrow
+
+def _write_columnar(batches, filename: str, file_format: str) -> int:
+    pa = _import_pyarrow()
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('type', pa.string()),
+        ('amount', pa.float64()),
+        ('category', pa.string()),
+        ('description', pa.string()),
+        ('date', pa.date32()),
+        ('currency', pa.string()),
+    ])
+    sink = sys.stdout.buffer if filename == '-' else filename
+    if file_format == 'parquet':
+        writer = pa.parquet.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_file(sink, schema)
+
+    count = 0
+    try:
+        for batch in batches:
+            columns = list(zip(*batch))
+            columns[2] = [
+                from_minor(amount_minor, currency_exponent(currency))
+                for amount_minor, currency in zip(columns[2], columns[6])
+            ]
+            writer.write_batch(pa.RecordBatch.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema
+            ))
+            count += len(batch)
+    finally:
+        writer.close()
+    return count
+
+def export_transactions(
+    session: Session,
+    filename: str,
+    file_format: str = 'csv',
+    compress: bool = False,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    type: Optional[str] = None,
+    category: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE
+) -> int:
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{file_format}'. Use {', '.join(EXPORT_FORMATS)}")
+
+    batches = iter_export_batches(session, start_date, end_date, type, category, batch_size)
+    if file_format in ('parquet', 'arrow'):
+        return _write_columnar(batches, filename, file_format)
+
+    handle = _open_text(filename, compress)
+    try:
+        if file_format == 'csv':
+            return _write_csv(batches, handle)
+        return _write_jsonl(batches, handle)
+    finally:
+        if filename == '-' and not compress:
+            handle.detach()
+        else:
+            handle.close()
@@ -0,0 +1,204 @@
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+import csv
+import re
+from .config import DEFAULT_IMPORT_CATEGORY, DEFAULT_IMPORT_CHUNK_SIZE
+from .currency import normalize_currency_code
+from .database import Transaction, session_ledger
+from .settings import load_settings
+from .utils import DEFAULT_CURRENCY_EXPONENT, chunked, currency_exponent, parse_amounts_minor, parse_dates
+
+DEFAULT_CHUNK_SIZE = DEFAULT_IMPORT_CHUNK_SIZE
+DEFAULT_CATEGORY = DEFAULT_IMPORT_CATEGORY
+
+# Same columns reports.export_to_csv writes; 'id' is ignored on import.
+CSV_FIELDS = ['type', 'amount', 'category', 'description', 'date', 'currency']
+
+RawRow = Tuple[int, Dict[str, str]]
+RowError = Tuple[int, str]
+
+class ImportResult:
+    def __init__(self):
+        self.imported = 0
+        self.errors: List[RowError] = []
+
+    @property
+    def skipped(self) -> int:
+        return len(self.errors)
+
+def parse_column_map(mappings: Iterable[str]) -> Dict[str, str]:
+    column_map = {}
+    for mapping in mappings:
+        field, sep, column = mapping.partition('=')
+        field = field.strip()
+        if not sep or field not in CSV_FIELDS or not column.strip():
+            raise ValueError(f"Invalid column mapping '{mapping}', expected FIELD=COLUMN with FIELD in {', '.join(CSV_FIELDS)}")
+        column_map[field] = column.strip()
+    return column_map
+
+def read_csv(handle: TextIO, column_map: Optional[Dict[str, str]] = None) -> Iterator[RawRow]:
+    column_map = column_map or {}
+    reader = csv.DictReader(handle)
+    for line_number, row in enumerate(reader, start=2):
+        yield line_number, {
+            field: row.get(column_map.get(field, field)) or ''
+            for field in CSV_FIELDS
+        }
+
+_OFX_TAG = re.compile(r'<(\w+)>([^<\r\n]*)')
+
+def read_ofx(handle: TextIO) -> Iterator[RawRow]:
+    record: Optional[Dict[str, str]] = None
+    start_line = 0
+    for line_number, line in enumerate(handle, start=1):
+        upper = line.upper()
+        if '<STMTTRN>' in upper:
+            record, start_line = {}, line_number
+        elif '</STMTTRN>' in upper and record is not None:
+            amount = record.get('TRNAMT', '')
+            posted = record.get('DTPOSTED', '')[:8]
+            yield start_line, {
+                'type': '',
+                'amount': amount,
+                'category': DEFAULT_CATEGORY,
+                'description': record.get('NAME') or record.get('MEMO', ''),
+                'date': f"{posted[:4]}-{posted[4:6]}-{posted[6:8]}" if len(posted) == 8 else posted,
+            }
+            record = None
+        elif record is not None:
+            for tag, value in _OFX_TAG.findall(line):
+                record[tag.upper()] = value.strip()
+
+def _normalize_qif_date(value: str) -> str:
+    # QIF writers use M/D'YY or M/D/YYYY; 'YY is always 20YY in practice.
+    value = value.strip().replace(' ', '')
+    match = re.match(r"^(\d{1,2})/(\d{1,2})['/](\d{2}|\d{4})$", value)
+    if not match:
+        return value
+    month, day, year = match.groups()
+    if len(year) == 2:
+        year = f"20{year}"
+    return f"{month}/{day}/{year}"
+
+def read_qif(handle: TextIO) -> Iterator[RawRow]:
+    record: Dict[str, str] = {}
+    start_line = 0
+    for line_number, line in enumerate(handle, start=1):
+        line = line.rstrip('\r\n')
+        if not line or line.startswith('!'):
+            continue
+        code, value = line[0], line[1:].strip()
+        if code == '^':
+            if record:
+                yield start_line, {
+                    'type': '',
+                    'amount': record.get('T', ''),
+                    'category': record.get('L') or DEFAULT_CATEGORY,
+                    'description': record.get('P') or record.get('M', ''),
+                    'date': _normalize_qif_date(record.get('D', '')),
+                }
+            record = {}
+            continue
+        if not record:
+            start_line = line_number
+        record[code] = value
+
+READERS = {
+    'csv': read_csv,
+    'ofx': read_ofx,
+    'qif': read_qif,
+}
+
+def detect_format(filename: str) -> str:
+    extension = filename.rsplit('.', 1)[-1].lower()
+    if extension not in READERS:
+        raise ValueError(f"Unsupported import format '{extension}'. Use csv, ofx or qif")
+    return extension
+
+def validate_rows(
+    rows: List[RawRow],
+    default_category: str = DEFAULT_CATEGORY,
+    ledger_currency: Optional[str] = None
+) -> Tuple[List[Dict], List[RowError]]:
+    types = []
+    raw_amounts = []
+    for _, row in rows:
+        raw_amount = row['amount'].replace(',', '').strip()
+        trans_type = row['type'].strip().lower()
+        if not trans_type:
+            # Bank exports carry a signed amount instead of a type column.
+            trans_type = 'expense' if raw_amount.startswith('-') else 'income'
+            raw_amount = raw_amount.lstrip('+-')
+        types.append(trans_type)
+        raw_amounts.append(raw_amount)
+
+    # Amounts and dates are parsed a column at a time; errors come back by row index.
+    amounts = parse_amounts_minor(raw_amounts)
+    dates = parse_dates([row['date'] for _, row in rows])
+    amount_errors = dict(amounts.errors)
+    date_errors = dict(dates.errors)
+
+    records = []
+    errors = []
+    for index, (line_number, row) in enumerate(rows):
+        date_error = date_errors.get(index)
+        if types[index] not in ('expense', 'income'):
+            error = "Type must be 'expense' or 'income'"
+        elif date_error == "Date is required":
+            error = date_error
+        else:
+            error = amount_errors.get(index) or date_error
+        amount_minor = amounts.values[index]
+        currency = row.get('currency', '').strip()
+        if not error and currency:
+            try:
+                currency = normalize_currency_code(currency)
+                exponent = currency_exponent(currency)
+                if currency != ledger_currency and exponent != DEFAULT_CURRENCY_EXPONENT:
+                    # Rare enough to parse one at a time in the currency's own minor units.
+                    parsed = parse_amounts_minor([raw_amounts[index]], exponent)
+                    if parsed.errors:
+                        raise ValueError(parsed.errors[0][1])
+                    amount_minor = parsed.values[0]
+            except ValueError as e:
+                error = str(e)
+        if error:
+            errors.append((line_number, error))
+            continue
+        records.append({
+            'type': types[index],
+            'amount_minor': amount_minor,
+            'category': row['category'].strip() or default_category,
+            'description': row['description'].strip(),
+            'date': dates.values[index],
+            'currency': None if currency == ledger_currency else currency or None,
+        })
+    return records, errors
+
+def import_transactions(
+    session: Session,
+    rows: Iterable[RawRow],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    default_category: str = DEFAULT_CATEGORY,
+    on_progress: Optional[Callable[[int], None]] = None
+) -> ImportResult:
+    result = ImportResult()
+    ledger = session_ledger(session)
+    ledger_currency = load_settings(session).currency_code
+    try:
+        for chunk in chunked(rows, chunk_size):
+            records, errors = validate_rows(chunk, default_category, ledger_currency)
+            for record in records:
+                record['ledger_id'] = ledger
+            if records:
+                session.execute(insert(Transaction), records)
+            result.imported += len(records)
+            result.errors.extend(errors)
+            if on_progress:
+                on_progress(len(chunk))
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return result
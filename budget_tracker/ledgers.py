@@ -0,0 +1,52 @@
+from sqlalchemy import union
+from sqlalchemy.orm import Session
+from typing import List, Optional
+import os
+from .config import get_shard_dir, validate_ledger
+from .database import (
+    FOREIGN, NOT_DELETED, MonthlyRollup, RecurringRule, Settings, Transaction,
+    get_readonly_session, get_session, resolve_db_path
+)
+
+def list_ledgers(session: Session) -> List[str]:
+    # Ledgers with settings, transactions or recurring rules in this file. The
+    # rollups only cover the ledger's own currency, so foreign-currency rows
+    # are read from their index.
+    query = union(
+        session.query(Settings.ledger_id).statement,
+        session.query(MonthlyRollup.ledger_id).statement,
+        session.query(Transaction.ledger_id).filter(FOREIGN, NOT_DELETED).statement,
+        session.query(RecurringRule.ledger_id).statement
+    )
+    return sorted(session.execute(query).scalars().all())
+
+class LedgerRouter:
+    # Maps ledger ids to sessions: all ledgers in one file, or one file per
+    # ledger under shard_dir. Engines come from the database registry, which
+    # keeps at most config.get_max_engines() open and disposes the rest.
+
+    def __init__(self, db_path: Optional[str] = None, shard_dir: Optional[str] = None):
+        self.db_path = db_path
+        self.shard_dir = shard_dir if db_path else shard_dir or get_shard_dir()
+
+    def path_for(self, ledger: str) -> str:
+        validate_ledger(ledger)
+        if self.shard_dir:
+            return os.path.abspath(os.path.join(self.shard_dir, f"{ledger}.db"))
+        return resolve_db_path(self.db_path)
+
+    def session(self, ledger: str, read_only: bool = False) -> Session:
+        if read_only:
+            return get_readonly_session(self.path_for(ledger), ledger)
+        return get_session(self.path_for(ledger), ledger)
+
+    def ledgers(self) -> List[str]:
+        if not self.shard_dir:
+            session = get_readonly_session(self.db_path)
+            try:
+                return list_ledgers(session)
+            finally:
+                session.close()
+        if not os.path.isdir(self.shard_dir):
+            return []
+        return sorted(name[:-3] for name in os.listdir(self.shard_dir) if name.endswith('.db'))
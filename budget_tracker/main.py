@@ -3,7 +3,7 @@
 Budget Tracker - Terminal-based personal finance manager
 """
 
-from .cli import main
+from .client import main
 
 if __name__ == "__main__":
     main()
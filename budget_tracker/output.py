@@ -0,0 +1,52 @@
+from datetime import date
+from typing import Callable, Optional, Sequence, TextIO
+import csv
+import json
+import sys
+
+OUTPUT_FORMATS = ['table', 'json', 'csv']
+
+def check_format(output_format: str) -> str:
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError("Output format must be 'table', 'json' or 'csv'")
+    return output_format
+
+def to_plain(value):
+    if hasattr(value, '_asdict'):
+        return {name: to_plain(item) for name, item in value._asdict().items()}
+    if isinstance(value, dict):
+        return {name: to_plain(item) for name, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_plain(item) for item in value]
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+def write_json(value, handle: Optional[TextIO] = None):
+    handle = handle or sys.stdout
+    json.dump(to_plain(value), handle, indent=2, ensure_ascii=False)
+    handle.write('\n')
+
+def write_csv(rows: Sequence[Sequence], fields: Sequence[str], handle: Optional[TextIO] = None):
+    writer = csv.writer(handle or sys.stdout, lineterminator='\n')
+    writer.writerow(fields)
+    for row in rows:
+        writer.writerow([
+            '' if item is None else item.isoformat() if isinstance(item, date) else item
+            for item in row
+        ])
+
+def emit(
+    output_format: str,
+    value,
+    render: Callable[[], None],
+    rows: Optional[Sequence[Sequence]] = None,
+    fields: Optional[Sequence[str]] = None
+):
+    # JSON gets the whole result; CSV gets its main table (rows/fields).
+    if output_format == 'json':
+        write_json(value)
+    elif output_format == 'csv':
+        write_csv(rows if rows is not None else value, fields)
+    else:
+        render()
@@ -0,0 +1,188 @@
+from functools import wraps
+from typing import Callable, Dict, List, NamedTuple, Optional
+import re
+import sys
+import time
+
+# Instrumentation for `budget --profile`. Kept to the standard library at import
+# time: timed() wrappers sit on hot paths and cost a single flag check while
+# profiling is off, and the SQLAlchemy event hooks are only attached by enable().
+
+_enabled = False
+_watching = False
+_started = 0.0
+# Nesting depth of running timers and the time spent inside outermost ones,
+# so the report can show what no timer covered (imports, parsing, output).
+_depth = 0
+_covered = 0.0
+_profiler = None
+_stats_path: Optional[str] = None
+# name -> [calls, seconds]; timers are inclusive, so nested ones overlap.
+_timers: Dict[str, List[float]] = {}
+_statements: Dict[str, List[float]] = {}
+
+def is_enabled() -> bool:
+    return _enabled
+
+def _record(table: Dict[str, List[float]], name: str, seconds: float):
+    global _covered
+    if table is _timers and _depth == 0:
+        _covered += seconds
+    entry = table.get(name)
+    if entry is None:
+        table[name] = [1, seconds]
+    else:
+        entry[0] += 1
+        entry[1] += seconds
+
+def timed(name: Optional[str] = None) -> Callable:
+    def decorate(func: Callable) -> Callable:
+        label = name or f"{func.__module__.rpartition('.')[2]}.{func.__name__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            global _depth
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            _depth += 1
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _depth -= 1
+                _record(_timers, label, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+class Timer:
+    # Context-manager form of timed() for blocks that are not whole functions.
+
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        global _depth
+        if _enabled:
+            self.start = time.perf_counter()
+            _depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        global _depth
+        if _enabled and self.start:
+            _depth -= 1
+            _record(_timers, self.name, time.perf_counter() - self.start)
+        return False
+
+def _statement_key(statement: str) -> str:
+    key = re.sub(r'\s+', ' ', statement).strip()
+    return key if len(key) <= 100 else key[:97] + '...'
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('profiling_started', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('profiling_started')
+    if started:
+        _record(_statements, _statement_key(statement), time.perf_counter() - started.pop())
+
+def watch_sql():
+    # Called by database.get_engine; attaches the statement hooks on first use so
+    # enable() itself never imports SQLAlchemy and import time shows in the timers.
+    global _watching
+    if not _enabled or _watching:
+        return
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    _watching = True
+
+def enable(stats_path: Optional[str] = None):
+    global _enabled, _started, _profiler, _stats_path, _depth, _covered
+    _depth = 0
+    _covered = 0.0
+    _timers.clear()
+    _statements.clear()
+    _stats_path = stats_path
+    if stats_path:
+        import cProfile
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    _enabled = True
+    _started = time.perf_counter()
+    if 'sqlalchemy' in sys.modules:
+        watch_sql()
+
+class TimerRow(NamedTuple):
+    name: str
+    calls: int
+    total_ms: float
+
+class ProfileReport(NamedTuple):
+    total_ms: float
+    # Time outside every timer: mostly lazy imports, CLI parsing and output.
+    untimed_ms: float
+    timers: List[TimerRow]
+    statements: List[TimerRow]
+    sql_calls: int
+    sql_ms: float
+
+def _rows(table: Dict[str, List[float]]) -> List[TimerRow]:
+    rows = [TimerRow(name, int(calls), seconds * 1000) for name, (calls, seconds) in table.items()]
+    return sorted(rows, key=lambda row: row.total_ms, reverse=True)
+
+def disable() -> ProfileReport:
+    global _enabled, _profiler, _watching
+    total = time.perf_counter() - _started
+    _enabled = False
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(_stats_path)
+        _profiler = None
+    if _watching:
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+
+        event.remove(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.remove(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _watching = False
+
+    statements = _rows(_statements)
+    return ProfileReport(
+        total * 1000,
+        max(total - _covered, 0.0) * 1000,
+        _rows(_timers),
+        statements,
+        sum(row.calls for row in statements),
+        sum(row.total_ms for row in statements)
+    )
+
+def render_profile(report: ProfileReport, console, limit: int = 15):
+    from rich.table import Table
+    from rich import box
+
+    timers = Table(title=f"Profile - {report.total_ms:.1f} ms in command", box=box.ROUNDED)
+    timers.add_column("Timer (inclusive)", style="cyan")
+    timers.add_column("Calls", justify="right")
+    timers.add_column("ms", style="yellow", justify="right")
+    for row in report.timers:
+        timers.add_row(row.name, str(row.calls), f"{row.total_ms:.2f}")
+    timers.add_row("[dim](untimed: imports, parsing, output)[/dim]", "", f"{report.untimed_ms:.2f}")
+    console.print(timers)
+
+    statements = Table(
+        title=f"SQL - {report.sql_calls} statements, {report.sql_ms:.1f} ms", box=box.ROUNDED
+    )
+    statements.add_column("Statement", style="cyan", overflow="fold")
+    statements.add_column("Calls", justify="right")
+    statements.add_column("ms", style="yellow", justify="right")
+    for row in report.statements[:limit]:
+        statements.add_row(row.name, str(row.calls), f"{row.total_ms:.2f}")
+    if len(report.statements) > limit:
+        statements.add_row(f"... {len(report.statements) - limit} more", "", "")
+    console.print(statements)
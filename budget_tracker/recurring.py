@@ -0,0 +1,325 @@
+from sqlalchemy import func, insert, update
+from sqlalchemy.orm import Session
+from datetime import date, datetime, time
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from rich.console import Console
+from .currency import foreign_totals
+from .database import MonthlyRollup, RecurringRule, Transaction, normalize_category, session_ledger
+from .profiling import timed
+from .rollups import month_key
+from .utils import add_months, format_currency, from_minor, to_minor, validate_amount, validate_date
+
+console = Console()
+
+# Shorthands accepted wherever an RRULE is expected.
+RULE_ALIASES = {
+    'daily': 'FREQ=DAILY',
+    'weekly': 'FREQ=WEEKLY',
+    'biweekly': 'FREQ=WEEKLY;INTERVAL=2',
+    'monthly': 'FREQ=MONTHLY',
+    'quarterly': 'FREQ=MONTHLY;INTERVAL=3',
+    'yearly': 'FREQ=YEARLY',
+}
+
+def normalize_rule(rule: str) -> str:
+    rule = rule.strip()
+    alias = RULE_ALIASES.get(rule.lower())
+    if alias:
+        return alias
+    if rule.upper().startswith('RRULE:'):
+        rule = rule[len('RRULE:'):]
+    return rule.upper()
+
+def _midnight(day: date) -> datetime:
+    return datetime.combine(day, time())
+
+def parse_rule(rule: str, start: date, end: Optional[date] = None):
+    # dateutil is only needed once rules exist, so it loads here rather than at import.
+    from dateutil.rrule import DAILY, rrule, rrulestr
+
+    text = normalize_rule(rule)
+    if 'DTSTART' in text:
+        raise ValueError("Give the first date with --start, not DTSTART")
+    try:
+        parsed = rrulestr(text, dtstart=_midnight(start))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid recurrence rule '{rule}': {e}")
+    if not isinstance(parsed, rrule):
+        raise ValueError("Only a single RRULE is supported")
+    if parsed._freq > DAILY:
+        raise ValueError("Rules must repeat daily or less often")
+    if end is not None:
+        parsed = parsed.replace(count=None, until=_midnight(end))
+    return parsed
+
+# Rules are always re-expanded from their next unposted occurrence rather than
+# from start_date, so the cost of a run is the number of new occurrences, not
+# the age of the rule. That is only sound because next_date is itself an
+# occurrence and COUNT has been folded into end_date when the rule was added.
+def _expand_from(rule: RecurringRule, start: date):
+    return parse_rule(rule.rrule, start, rule.end_date)
+
+class RecurringRuleRow(NamedTuple):
+    id: int
+    type: str
+    amount: float
+    category: str
+    description: str
+    rule: str
+    start_date: date
+    end_date: Optional[date]
+    next_date: Optional[date]
+
+def rule_row(rule: RecurringRule) -> RecurringRuleRow:
+    return RecurringRuleRow(
+        rule.id, rule.type, rule.amount, rule.category, rule.description or '',
+        rule.rrule, rule.start_date, rule.end_date, rule.next_date
+    )
+
+def add_rule(
+    session: Session,
+    type: str,
+    amount: float,
+    category: str,
+    rule: str,
+    description: str = "",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
+) -> RecurringRule:
+    if type not in ['expense', 'income']:
+        raise ValueError("Type must be 'expense' or 'income'")
+
+    amount_minor = to_minor(validate_amount(str(amount)))
+    if amount_minor <= 0:
+        raise ValueError("Amount is smaller than the currency's minor unit")
+    start = validate_date(start_date)
+    end = validate_date(end_date) if end_date else None
+    if end and end < start:
+        raise ValueError("--until must not be before --start")
+
+    parsed = parse_rule(rule, start)
+    if parsed._count:
+        last = list(parsed)[-1].date()
+        end = min(end, last) if end else last
+    first = parse_rule(rule, start, end).after(_midnight(start), inc=True)
+    if first is None:
+        raise ValueError("The rule has no occurrences")
+
+    recurring_rule = RecurringRule(
+        ledger_id=session_ledger(session),
+        type=type,
+        amount_minor=amount_minor,
+        category=category.strip(),
+        description=description.strip(),
+        rrule=normalize_rule(rule),
+        start_date=start,
+        end_date=end,
+        next_date=first.date()
+    )
+    session.add(recurring_rule)
+    session.commit()
+    return recurring_rule
+
+def get_rules(session: Session) -> List[RecurringRuleRow]:
+    rules = session.query(RecurringRule).filter(
+        RecurringRule.ledger_id == session_ledger(session)
+    ).order_by(RecurringRule.id)
+    return [rule_row(rule) for rule in rules]
+
+def delete_rule(session: Session, rule_id: int) -> bool:
+    # Transactions already posted by the rule are kept.
+    rule = session.query(RecurringRule).filter(
+        RecurringRule.id == rule_id, RecurringRule.ledger_id == session_ledger(session)
+    ).first()
+    if rule:
+        session.delete(rule)
+        session.commit()
+        return True
+    return False
+
+def _occurrence_record(rule: RecurringRule, day: date) -> Dict[str, object]:
+    return {
+        'ledger_id': rule.ledger_id,
+        'type': rule.type,
+        'amount_minor': rule.amount_minor,
+        'category': rule.category,
+        'category_key': normalize_category(rule.category),
+        'description': rule.description or '',
+        'date': day,
+        'recurring_rule_id': rule.id,
+    }
+
+def has_due(session: Session, through: Optional[date] = None) -> bool:
+    return session.query(RecurringRule.id).filter(
+        RecurringRule.ledger_id == session_ledger(session),
+        RecurringRule.next_date <= (through or date.today())
+    ).first() is not None
+
+@timed()
+def materialize(session: Session, through: Optional[date] = None, start: Optional[date] = None) -> int:
+    through = through or date.today()
+    query = session.query(RecurringRule).filter(RecurringRule.ledger_id == session_ledger(session))
+    if start is None:
+        # The common case: one index seek that finds nothing due.
+        query = query.filter(RecurringRule.next_date <= through)
+    else:
+        # Backfilling a range re-expands from each rule's start; the unique
+        # (rule, date) index turns already-posted occurrences into no-ops.
+        query = query.filter(
+            RecurringRule.start_date <= through,
+            (RecurringRule.end_date.is_(None)) | (RecurringRule.end_date >= start)
+        )
+
+    records = []
+    advanced = []
+    for rule in query.all():
+        if start is None:
+            schedule = _expand_from(rule, rule.next_date)
+            days = []
+            next_date = None
+            for occurrence in schedule:
+                if occurrence.date() > through:
+                    next_date = occurrence.date()
+                    break
+                days.append(occurrence.date())
+        else:
+            schedule = _expand_from(rule, rule.start_date)
+            days = [occurrence.date() for occurrence in schedule.between(_midnight(start), _midnight(through), inc=True)]
+            following = schedule.after(_midnight(through))
+            next_date = following.date() if following else None
+        records.extend(_occurrence_record(rule, day) for day in days)
+        if rule.next_date is not None and (next_date is None or next_date > rule.next_date):
+            advanced.append({'id': rule.id, 'next_date': next_date})
+
+    inserted = 0
+    if records:
+        inserted = session.execute(insert(Transaction.__table__).prefix_with('OR IGNORE'), records).rowcount
+    if advanced:
+        session.execute(update(RecurringRule), advanced)
+    if records or advanced:
+        session.commit()
+    return inserted
+
+class ForecastRow(NamedTuple):
+    month: str
+    income: float
+    expenses: float
+    net: float
+    # Projected balance at the end of the month: everything recorded so far
+    # plus every rule occurrence not yet posted.
+    balance: float
+
+# Identical schedules (every subscription billed "FREQ=MONTHLY" from the same
+# day, say) expand once per process.
+@lru_cache(maxsize=4096)
+def _month_counts(rule: str, start: date, end: Optional[date], horizon: date) -> Tuple[Tuple[str, int], ...]:
+    counts: Dict[str, int] = {}
+    stop = _midnight(horizon)
+    for occurrence in parse_rule(rule, start, end):
+        if occurrence >= stop:
+            break
+        key = month_key(occurrence)
+        counts[key] = counts.get(key, 0) + 1
+    return tuple(counts.items())
+
+@timed()
+def get_forecast(session: Session, end_month: date, start_month: Optional[date] = None) -> List[ForecastRow]:
+    start_month = (start_month or date.today()).replace(day=1)
+    months = []
+    month = start_month
+    while month < end_month:
+        months.append(month_key(month))
+        month = add_months(month, 1)
+    if not months:
+        return []
+
+    ledger = session_ledger(session)
+    totals = {key: {'income': 0, 'expense': 0} for key in months}
+    opening = 0
+    for month, trans_type, total in session.query(
+        MonthlyRollup.month, MonthlyRollup.type, MonthlyRollup.total
+    ).filter(MonthlyRollup.ledger_id == ledger, MonthlyRollup.month <= months[-1]):
+        if month < months[0]:
+            opening += total if trans_type == 'income' else -total
+        else:
+            totals[month][trans_type] += total
+    foreign = foreign_totals(
+        session, [func.strftime('%Y-%m', Transaction.date), Transaction.type],
+        end_date=add_months(start_month, len(months))
+    )
+    for (month, trans_type), total in foreign.items():
+        if month < months[0]:
+            opening += total if trans_type == 'income' else -total
+        else:
+            totals[month][trans_type] += total
+
+    rules = session.query(
+        RecurringRule.rrule, RecurringRule.next_date, RecurringRule.end_date,
+        RecurringRule.type, RecurringRule.amount_minor
+    ).filter(
+        RecurringRule.ledger_id == ledger,
+        RecurringRule.next_date.is_not(None),
+        RecurringRule.next_date < end_month
+    )
+    for rule, next_date, end_date, trans_type, amount_minor in rules:
+        sign = 1 if trans_type == 'income' else -1
+        for month, count in _month_counts(rule, next_date, end_date, end_month):
+            if month in totals:
+                totals[month][trans_type] += amount_minor * count
+            else:
+                # Due before the first month but not posted yet.
+                opening += sign * amount_minor * count
+
+    rows = []
+    balance = opening
+    for month in months:
+        income, expenses = totals[month]['income'], totals[month]['expense']
+        balance += income - expenses
+        rows.append(ForecastRow(
+            month, from_minor(income), from_minor(expenses), from_minor(income - expenses), from_minor(balance)
+        ))
+    return rows
+
+@timed()
+def render_rules(rows: List[RecurringRuleRow], currency_symbol: str):
+    from rich.table import Table
+    from rich import box
+
+    table = Table(title="Recurring Rules", box=box.ROUNDED)
+    table.add_column("ID", style="cyan", justify="right")
+    table.add_column("Type", style="magenta")
+    table.add_column("Amount", style="green", justify="right")
+    table.add_column("Category", style="blue")
+    table.add_column("Rule", style="yellow")
+    table.add_column("Next", style="cyan")
+    table.add_column("Until")
+    table.add_column("Description")
+    for row in rows:
+        table.add_row(
+            str(row.id), row.type.capitalize(), format_currency(row.amount, currency_symbol), row.category,
+            row.rule, row.next_date.isoformat() if row.next_date else "done",
+            row.end_date.isoformat() if row.end_date else "", row.description
+        )
+    console.print(table)
+
+@timed()
+def render_forecast(rows: List[ForecastRow], currency_symbol: str, title: str):
+    from rich.table import Table
+    from rich import box
+
+    table = Table(title=title, box=box.ROUNDED)
+    table.add_column("Month", style="cyan")
+    table.add_column("Income", style="green", justify="right")
+    table.add_column("Expenses", style="red", justify="right")
+    table.add_column("Net", style="blue", justify="right")
+    table.add_column("Balance", style="bold", justify="right")
+    for row in rows:
+        table.add_row(
+            row.month,
+            format_currency(row.income, currency_symbol),
+            format_currency(row.expenses, currency_symbol),
+            ("-" if row.net < 0 else "") + format_currency(row.net, currency_symbol),
+            ("-" if row.balance < 0 else "") + format_currency(row.balance, currency_symbol)
+        )
+    console.print(table)
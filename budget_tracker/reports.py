@@ -1,85 +1,361 @@
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from datetime import date, datetime
-from typing import List, Dict
-import csv
-from rich.table import Table
+from datetime import date, timedelta
+from typing import List, Dict, NamedTuple, Optional, Tuple
 from rich.console import Console
-from rich import box
-from .database import Transaction, Settings
-from .utils import get_current_month_range, format_currency
+from .currency import Converter, foreign_totals, format_amount
+from .database import NATIVE, NOT_DELETED, MonthlyRollup, Transaction, session_ledger
+from .profiling import timed
+from .rollups import get_category_totals, month_key
+from .settings import get_currency_symbol
+from .transactions import Cursor, TransactionRow, format_cursor, get_transactions, transaction_row
+from .utils import get_current_month_range, format_currency, add_months, percentile, from_minor
 
 console = Console()
 
-def generate_monthly_report(session: Session):
-    start_date, end_date = get_current_month_range()
-    transactions = session.query(Transaction).filter(
-        Transaction.date >= start_date,
-        Transaction.date < end_date
-    ).all()
+# get_* functions return plain named tuples; render_* functions draw them with
+# rich and import the table machinery only when something is actually drawn.
 
-    category_totals: Dict[str, float] = {}
-    for transaction in transactions:
-        if transaction.category not in category_totals:
-            category_totals[transaction.category] = 0.0
-        if transaction.type == 'expense':
-            category_totals[transaction.category] += transaction.amount
+class MonthlyCategoryRow(NamedTuple):
+    category: str
+    # Expenses net of income in the category; negative when income dominates.
+    amount: float
+    type: str
+
+class MonthlyReport(NamedTuple):
+    month: date
+    categories: List[MonthlyCategoryRow]
+    total_income: float
+    total_expenses: float
+    net: float
+
+@timed()
+def get_monthly_report(session: Session, month: Optional[date] = None) -> MonthlyReport:
+    start_date = month or get_current_month_range()[0]
+    rows = get_category_totals(session, month_key(start_date))
+
+    # Accumulate in integer minor units and convert once at the end.
+    category_totals: Dict[str, int] = {}
+    total_income = 0
+    total_expenses = 0
+    for category, trans_type, amount in rows:
+        if trans_type == 'expense':
+            category_totals[category] = category_totals.get(category, 0) + amount
+            total_expenses += amount
         else:
-            category_totals[transaction.category] -= transaction.amount
+            category_totals[category] = category_totals.get(category, 0) - amount
+            total_income += amount
 
-    settings = session.query(Settings).first()
-    currency_symbol = settings.currency_symbol if settings else '$'
+    categories = [
+        MonthlyCategoryRow(category, from_minor(amount), 'expense' if amount > 0 else 'income')
+        for category, amount in sorted(category_totals.items(), key=lambda x: abs(x[1]), reverse=True)
+    ]
+    return MonthlyReport(
+        start_date.replace(day=1),
+        categories,
+        from_minor(total_income),
+        from_minor(total_expenses),
+        from_minor(total_income - total_expenses)
+    )
+
+@timed()
+def render_monthly_report(report: MonthlyReport, currency_symbol: str):
+    from rich.table import Table
 
-    table = Table(title=f"Monthly Report - {start_date.strftime('%B %Y')}")
+    table = Table(title=f"Monthly Report - {report.month.strftime('%B %Y')}")
     table.add_column("Category", style="cyan")
     table.add_column("Amount", style="green")
     table.add_column("Type", style="magenta")
 
-    total_income = sum(t.amount for t in transactions if t.type == 'income')
-    total_expenses = sum(t.amount for t in transactions if t.type == 'expense')
+    for row in report.categories:
+        table.add_row(row.category, format_currency(row.amount, currency_symbol), row.type.capitalize())
+
+    console.print(table)
+    console.print(f"\nTotal Income: [green]{format_currency(report.total_income, currency_symbol)}[/green]")
+    console.print(f"Total Expenses: [red]{format_currency(report.total_expenses, currency_symbol)}[/red]")
+    console.print(f"Net: [blue]{format_currency(report.net, currency_symbol)}[/blue]")
+
+def generate_monthly_report(session: Session):
+    render_monthly_report(get_monthly_report(session), get_currency_symbol(session))
+
+TREND_GROUPINGS = ['month', 'week', 'category']
+
+class TrendRow(NamedTuple):
+    period: str
+    income: float
+    expenses: float
+    net: float
+    rolling_expenses: float
+    expense_delta: Optional[float]
+
+class CategoryTrendRow(NamedTuple):
+    category: str
+    expenses: float
+    share: float
+    monthly_average: float
+    median_month: float
+    p90_month: float
+
+def _month_periods(start_date: date, end_date: date) -> List[str]:
+    periods = []
+    month = date(start_date.year, start_date.month, 1)
+    while month < end_date:
+        periods.append(month_key(month))
+        month = add_months(month, 1)
+    return periods
+
+def _week_periods(start_date: date, end_date: date) -> List[str]:
+    periods = []
+    week = start_date - timedelta(days=start_date.weekday())
+    while week < end_date:
+        periods.append(week.isoformat())
+        week += timedelta(days=7)
+    return periods
+
+def _rollup_totals(session: Session, start_month: date, end_month: date, by_category: bool):
+    group_cols = [MonthlyRollup.month, MonthlyRollup.category if by_category else MonthlyRollup.type]
+    return session.query(*group_cols, func.sum(MonthlyRollup.total)).filter(
+        MonthlyRollup.ledger_id == session_ledger(session),
+        MonthlyRollup.month >= month_key(start_month),
+        MonthlyRollup.month < month_key(end_month),
+        *([MonthlyRollup.type == 'expense'] if by_category else [])
+    ).group_by(*group_cols).all()
+
+def _transaction_totals(session: Session, start_date: date, end_date: date, period_col, by_category: bool):
+    group_cols = [period_col, Transaction.category if by_category else Transaction.type]
+    return session.query(*group_cols, func.sum(Transaction.amount_minor)).filter(
+        Transaction.ledger_id == session_ledger(session),
+        NOT_DELETED,
+        NATIVE,
+        Transaction.date >= start_date,
+        Transaction.date < end_date,
+        *([Transaction.type == 'expense'] if by_category else [])
+    ).group_by(*group_cols).all()
+
+def _foreign_totals(session: Session, start_date: date, end_date: date, period_col, by_category: bool):
+    # Rows in other currencies are never in the rollups, so the whole range is
+    # read in one pass and converted at each row's date.
+    group_cols = [period_col, Transaction.category if by_category else Transaction.type]
+    totals = foreign_totals(session, group_cols, start_date, end_date, conditions=[
+        Transaction.ledger_id == session_ledger(session),
+        *([Transaction.type == 'expense'] if by_category else [])
+    ])
+    return [(period, key, total) for (period, key), total in totals.items()]
+
+def _monthly_totals(session: Session, start_date: date, end_date: date, by_category: bool):
+    # Whole months come from the rollup table; only partial edge months touch transactions.
+    first_full = start_date if start_date.day == 1 else add_months(start_date, 1)
+    last_full = date(end_date.year, end_date.month, 1)
+    month_col = func.strftime('%Y-%m', Transaction.date)
+    foreign = _foreign_totals(session, start_date, end_date, month_col, by_category)
+    if first_full >= last_full:
+        return _transaction_totals(session, start_date, end_date, month_col, by_category) + foreign
+
+    rows = _rollup_totals(session, first_full, last_full, by_category) + foreign
+    if start_date < first_full:
+        rows += _transaction_totals(session, start_date, first_full, month_col, by_category)
+    if last_full < end_date:
+        rows += _transaction_totals(session, last_full, end_date, month_col, by_category)
+    return rows
 
-    for category, amount in sorted(category_totals.items(), key=lambda x: abs(x[1]), reverse=True):
-        trans_type = "Expense" if amount > 0 else "Income"
-        table.add_row(category, format_currency(amount, currency_symbol), trans_type)
+def _weekly_totals(session: Session, start_date: date, end_date: date):
+    # Daily sums come straight off the (ledger, date, type, amount) covering index.
+    totals: Dict[Tuple[str, str], int] = {}
+    for day, trans_type, total in (
+        _transaction_totals(session, start_date, end_date, Transaction.date, False)
+        + _foreign_totals(session, start_date, end_date, Transaction.date, False)
+    ):
+        week = (day - timedelta(days=day.weekday())).isoformat()
+        totals[(week, trans_type)] = totals.get((week, trans_type), 0) + total
+    return [(week, trans_type, total) for (week, trans_type), total in totals.items()]
 
+@timed()
+def get_period_trends(
+    session: Session,
+    start_date: date,
+    end_date: date,
+    by: str = 'month',
+    window: int = 3
+) -> List[TrendRow]:
+    periods = _week_periods(start_date, end_date) if by == 'week' else _month_periods(start_date, end_date)
+    income = dict.fromkeys(periods, 0)
+    expenses = dict.fromkeys(periods, 0)
+    if by == 'week':
+        totals = _weekly_totals(session, start_date, end_date)
+    else:
+        totals = _monthly_totals(session, start_date, end_date, False)
+    for period, trans_type, total in totals:
+        target = expenses if trans_type == 'expense' else income
+        target[period] = target.get(period, 0) + total
+
+    rows = []
+    running = 0
+    previous = None
+    for index, period in enumerate(periods):
+        spent = expenses[period]
+        running += spent
+        if index >= window:
+            running -= expenses[periods[index - window]]
+        rows.append(TrendRow(
+            period,
+            from_minor(income[period]),
+            from_minor(spent),
+            from_minor(income[period] - spent),
+            from_minor(running) / min(index + 1, window),
+            None if previous is None else from_minor(spent - previous)
+        ))
+        previous = spent
+    return rows
+
+@timed()
+def get_category_trends(session: Session, start_date: date, end_date: date) -> List[CategoryTrendRow]:
+    months = _month_periods(start_date, end_date)
+    monthly: Dict[str, List[int]] = {}
+    for _, category, total in _monthly_totals(session, start_date, end_date, True):
+        monthly.setdefault(category, []).append(total)
+
+    grand_total = sum(sum(values) for values in monthly.values())
+    rows = []
+    for category, values in monthly.items():
+        values = values + [0] * (len(months) - len(values))
+        total = sum(values)
+        rows.append(CategoryTrendRow(
+            category,
+            from_minor(total),
+            total / grand_total * 100 if grand_total else 0.0,
+            from_minor(total) / len(values),
+            from_minor(percentile(values, 50)),
+            from_minor(percentile(values, 90))
+        ))
+    return sorted(rows, key=lambda row: row.expenses, reverse=True)
+
+@timed()
+def render_category_trends(rows: List[CategoryTrendRow], currency_symbol: str, title: str):
+    from rich.table import Table
+    from rich import box
+
+    table = Table(title=title, box=box.ROUNDED)
+    table.add_column("Category", style="cyan")
+    table.add_column("Expenses", style="red", justify="right")
+    table.add_column("Share", style="magenta", justify="right")
+    table.add_column("Monthly Avg", style="yellow", justify="right")
+    table.add_column("Median Month", style="yellow", justify="right")
+    table.add_column("P90 Month", style="yellow", justify="right")
+    for row in rows:
+        table.add_row(
+            row.category,
+            format_currency(row.expenses, currency_symbol),
+            f"{row.share:.1f}%",
+            format_currency(row.monthly_average, currency_symbol),
+            format_currency(row.median_month, currency_symbol),
+            format_currency(row.p90_month, currency_symbol)
+        )
     console.print(table)
-    console.print(f"\nTotal Income: [green]{format_currency(total_income, currency_symbol)}[/green]")
-    console.print(f"Total Expenses: [red]{format_currency(total_expenses, currency_symbol)}[/red]")
-    console.print(f"Net: [blue]{format_currency(total_income - total_expenses, currency_symbol)}[/blue]")
 
-def export_to_csv(session: Session, filename: str = "budget_export.csv"):
-    transactions = session.query(Transaction).order_by(Transaction.date.desc()).all()
+@timed()
+def render_period_trends(rows: List[TrendRow], currency_symbol: str, title: str, by: str = 'month', window: int = 3):
+    from rich.table import Table
+    from rich import box
 
-    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['id', 'type', 'amount', 'category', 'description', 'date']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+    table = Table(title=title, box=box.ROUNDED)
+    table.add_column("Week of" if by == 'week' else "Month", style="cyan", no_wrap=True)
+    table.add_column("Income", style="green", justify="right")
+    table.add_column("Expenses", style="red", justify="right")
+    table.add_column("Net", style="blue", justify="right")
+    table.add_column(f"Avg ({window})", style="yellow", justify="right")
+    table.add_column("Change", justify="right")
+    for row in rows:
+        if row.expense_delta is None:
+            change = "-"
+        elif row.expense_delta == 0:
+            change = format_currency(0, currency_symbol)
+        else:
+            style = "red" if row.expense_delta > 0 else "green"
+            sign = "+" if row.expense_delta > 0 else "-"
+            change = f"[{style}]{sign}{format_currency(row.expense_delta, currency_symbol)}[/{style}]"
+        table.add_row(
+            row.period,
+            format_currency(row.income, currency_symbol),
+            format_currency(row.expenses, currency_symbol),
+            ("-" if row.net < 0 else "") + format_currency(row.net, currency_symbol),
+            format_currency(row.rolling_expenses, currency_symbol),
+            change
+        )
+    console.print(table)
+
+    spent = [row.expenses for row in rows]
+    if spent:
+        console.print(f"\nAverage {by}ly spend: [yellow]{format_currency(sum(spent) / len(spent), currency_symbol)}[/yellow]")
+        console.print(f"Median: [yellow]{format_currency(percentile(spent, 50), currency_symbol)}[/yellow]  "
+                      f"P90: [yellow]{format_currency(percentile(spent, 90), currency_symbol)}[/yellow]")
+
+def trend_title(start_date: date, end_date: date, by: str) -> str:
+    return f"Trends by {by} - {start_date.isoformat()} to {(end_date - timedelta(days=1)).isoformat()}"
 
-        writer.writeheader()
-        for transaction in transactions:
-            writer.writerow({
-                'id': transaction.id,
-                'type': transaction.type,
-                'amount': transaction.amount,
-                'category': transaction.category,
-                'description': transaction.description,
-                'date': transaction.date.isoformat()
-            })
+def show_trend_report(session: Session, start_date: date, end_date: date, by: str = 'month', window: int = 3):
+    currency_symbol = get_currency_symbol(session)
+    title = trend_title(start_date, end_date, by)
+    if by == 'category':
+        render_category_trends(get_category_trends(session, start_date, end_date), currency_symbol, title)
+    else:
+        render_period_trends(get_period_trends(session, start_date, end_date, by, window), currency_symbol, title, by, window)
 
-    console.print(f"[green]✓ Exported {len(transactions)} transactions to {filename}[/green]")
+def export_to_csv(session: Session, filename: str = "budget_export.csv"):
+    from .exporters import export_transactions
 
-def show_category_report(session: Session, category: str = None, type_filter: str = None, limit: int = 20):
-    from .transactions import get_transactions
+    count = export_transactions(session, filename, 'csv')
+    console.print(f"[green]✓ Exported {count} transactions to {filename}[/green]")
 
-    transactions = get_transactions(session, category=category, type=type_filter, limit=limit)
-    settings = session.query(Settings).first()
-    currency_symbol = settings.currency_symbol if settings else '$'
+class TransactionPage(NamedTuple):
+    transactions: List[TransactionRow]
+    total_income: float
+    total_expenses: float
+    # Cursor for the following page, set when this page was full.
+    next_cursor: Optional[str]
 
+@timed()
+def get_transaction_page(
+    session: Session,
+    category: Optional[str] = None,
+    type_filter: Optional[str] = None,
+    limit: int = 20,
+    after: Optional[Cursor] = None,
+    category_match: str = 'contains'
+) -> TransactionPage:
+    transactions = get_transactions(
+        session, category=category, type=type_filter, limit=limit,
+        after=after, category_match=category_match
+    )
+    totals = {'income': 0, 'expense': 0}
+    converter = None
+    for t in transactions:
+        amount_minor = t.amount_minor
+        if t.currency:
+            converter = converter or Converter(session)
+            amount_minor = converter.try_convert(amount_minor, t.currency, t.date) or 0
+        totals[t.type] += amount_minor
+    return TransactionPage(
+        [transaction_row(t) for t in transactions],
+        from_minor(totals['income']),
+        from_minor(totals['expense']),
+        format_cursor(transactions[-1]) if transactions and len(transactions) == limit else None
+    )
+
+@timed()
+def render_transaction_page(
+    page: TransactionPage,
+    currency_symbol: str,
+    category: Optional[str] = None,
+    type_filter: Optional[str] = None
+):
+    from rich.table import Table
+    from rich import box
+
+    transactions = page.transactions
     if not transactions:
         console.print("[yellow]No transactions found[/yellow]")
         return
 
-    total_income = sum(t.amount for t in transactions if t.type == 'income')
-    total_expenses = sum(t.amount for t in transactions if t.type == 'expense')
-
     table = Table(
         title=f"Transactions ({len(transactions)} found)" +
               (f" - Category: {category}" if category else "") +
@@ -96,7 +372,7 @@ def show_category_report(session: Session, category: str = None, type_filter: st
     for transaction in transactions:
         amount_style = "red" if transaction.type == 'expense' else "green"
         amount_prefix = "-" if transaction.type == 'expense' else "+"
-        amount_display = f"{amount_prefix}{format_currency(transaction.amount, currency_symbol)}"
+        amount_display = f"{amount_prefix}{format_amount(transaction.amount, transaction.currency, currency_symbol)}"
 
         table.add_row(
             str(transaction.id),
@@ -109,8 +385,22 @@ def show_category_report(session: Session, category: str = None, type_filter: st
 
     console.print(table)
 
-    if total_income > 0 or total_expenses > 0:
+    if page.next_cursor:
+        console.print(f"[dim]Next page: --after {page.next_cursor}[/dim]")
+
+    if page.total_income > 0 or page.total_expenses > 0:
         console.print(f"\n[bold]Summary:[/bold]")
-        console.print(f"Income: [green]+{format_currency(total_income, currency_symbol)}[/green]")
-        console.print(f"Expenses: [red]-{format_currency(total_expenses, currency_symbol)}[/red]")
-        console.print(f"Net: [blue]{format_currency(total_income - total_expenses, currency_symbol)}[/blue]")
+        console.print(f"Income: [green]+{format_currency(page.total_income, currency_symbol)}[/green]")
+        console.print(f"Expenses: [red]-{format_currency(page.total_expenses, currency_symbol)}[/red]")
+        console.print(f"Net: [blue]{format_currency(page.total_income - page.total_expenses, currency_symbol)}[/blue]")
+
+def show_category_report(
+    session: Session,
+    category: str = None,
+    type_filter: str = None,
+    limit: int = 20,
+    after: Optional[Tuple[date, int]] = None,
+    category_match: str = 'contains'
+):
+    page = get_transaction_page(session, category, type_filter, limit, after, category_match)
+    render_transaction_page(page, get_currency_symbol(session), category, type_filter)
@@ -0,0 +1,73 @@
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+from .currency import foreign_totals
+from .database import NATIVE, NOT_DELETED, MonthlyRollup, Transaction, REBUILD_ROLLUPS_SQL, session_ledger
+from .utils import parse_period_bound
+
+RollupKey = Tuple[str, str, str]
+# Totals are integer minor units, so rollups compare exactly against transactions.
+RollupMismatch = Tuple[RollupKey, Tuple[int, int], Tuple[int, int]]
+
+def month_key(day: date) -> str:
+    return day.strftime('%Y-%m')
+
+def _month_range(month: Optional[str]) -> Tuple[Optional[date], Optional[date]]:
+    if not month:
+        return None, None
+    return parse_period_bound(month), parse_period_bound(month, end=True)
+
+# Rollups only hold rows in the ledger's own currency; rows in other currencies
+# are converted at read time and added on top.
+def get_type_totals(session: Session, month: Optional[str] = None) -> Dict[str, int]:
+    query = session.query(MonthlyRollup.type, func.sum(MonthlyRollup.total)).filter(
+        MonthlyRollup.ledger_id == session_ledger(session)
+    )
+    if month:
+        query = query.filter(MonthlyRollup.month == month)
+    totals = {trans_type: total for trans_type, total in query.group_by(MonthlyRollup.type).all()}
+    for (trans_type,), total in foreign_totals(session, [Transaction.type], *_month_range(month)).items():
+        totals[trans_type] = totals.get(trans_type, 0) + total
+    return totals
+
+def get_category_totals(session: Session, month: str) -> List[Tuple[str, str, int]]:
+    rows = session.query(
+        MonthlyRollup.category, MonthlyRollup.type, MonthlyRollup.total
+    ).filter(MonthlyRollup.ledger_id == session_ledger(session), MonthlyRollup.month == month).all()
+    foreign = foreign_totals(session, [Transaction.category, Transaction.type], *_month_range(month))
+    if not foreign:
+        return rows
+    totals = {(category, trans_type): total for category, trans_type, total in rows}
+    for key, total in foreign.items():
+        totals[key] = totals.get(key, 0) + total
+    return [(category, trans_type, total) for (category, trans_type), total in totals.items()]
+
+def rebuild_rollups(session: Session) -> int:
+    session.execute(text("DELETE FROM monthly_rollups"))
+    session.execute(text(REBUILD_ROLLUPS_SQL))
+    session.commit()
+    return session.query(MonthlyRollup).count()
+
+def check_rollups(session: Session) -> List[RollupMismatch]:
+    month = func.strftime('%Y-%m', Transaction.date)
+    ledger = session_ledger(session)
+    expected = {
+        (row[0], row[1], row[2]): (row[3], row[4])
+        for row in session.query(
+            month, Transaction.category, Transaction.type,
+            func.sum(Transaction.amount_minor), func.count()
+        ).filter(Transaction.ledger_id == ledger, NOT_DELETED, NATIVE).group_by(month, Transaction.category, Transaction.type)
+    }
+    actual = {
+        (row.month, row.category, row.type): (row.total, row.count)
+        for row in session.query(MonthlyRollup).filter(MonthlyRollup.ledger_id == ledger)
+    }
+
+    mismatches = []
+    for key in sorted(expected.keys() | actual.keys()):
+        want = expected.get(key, (0, 0))
+        have = actual.get(key, (0, 0))
+        if want != have:
+            mismatches.append((key, want, have))
+    return mismatches
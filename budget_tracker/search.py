@@ -0,0 +1,101 @@
+from sqlalchemy import column, func, literal_column, table, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from datetime import date
+from typing import List, Optional, Tuple
+from rich.table import Table
+from rich.console import Console
+from rich import box
+from .currency import format_amount
+from .database import NOT_DELETED, Transaction, session_ledger
+from .profiling import timed
+from .settings import get_currency_symbol
+
+console = Console()
+
+SEARCH_MODES = ['terms', 'prefix', 'phrase', 'raw']
+
+_fts = table('transactions_fts', column('rowid'))
+
+def build_match_query(query: str, mode: str = 'terms') -> str:
+    if mode not in SEARCH_MODES:
+        raise ValueError("Search mode must be 'terms', 'prefix', 'phrase' or 'raw'")
+    if mode == 'raw':
+        return query
+
+    # Quote user input so punctuation like '-' or ':' is never parsed as FTS5 syntax.
+    if mode == 'phrase':
+        return '"' + query.replace('"', '""') + '"'
+    suffix = '*' if mode == 'prefix' else ''
+    terms = ['"' + term.replace('"', '""') + '"' + suffix for term in query.split()]
+    if not terms:
+        raise ValueError("Search query is empty")
+    return ' '.join(terms)
+
+@timed()
+def search_transactions(
+    session: Session,
+    query: str,
+    mode: str = 'terms',
+    limit: int = 20,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    type: Optional[str] = None
+) -> List[Tuple[Transaction, float]]:
+    rank = func.bm25(literal_column('transactions_fts'))
+    results = session.query(Transaction, rank).join(
+        _fts, _fts.c.rowid == Transaction.id
+    ).filter(
+        text("transactions_fts MATCH :match")
+    ).filter(
+        Transaction.ledger_id == session_ledger(session), NOT_DELETED
+    ).params(match=build_match_query(query, mode))
+
+    if start_date:
+        results = results.filter(Transaction.date >= start_date)
+    if end_date:
+        results = results.filter(Transaction.date < end_date)
+    if type:
+        results = results.filter(Transaction.type == type)
+
+    try:
+        return results.order_by(rank, Transaction.date.desc()).limit(limit).all()
+    except OperationalError as e:
+        raise ValueError(f"Invalid search query: {e.orig}")
+
+def show_search_results(
+    session: Session,
+    query: str,
+    mode: str = 'terms',
+    limit: int = 20,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    type: Optional[str] = None
+):
+    results = search_transactions(session, query, mode, limit, start_date, end_date, type)
+    if not results:
+        console.print(f"[yellow]No transactions match '{query}'[/yellow]")
+        return
+
+    currency_symbol = get_currency_symbol(session)
+    table = Table(title=f"Search: {query} ({len(results)} found)", box=box.ROUNDED)
+    table.add_column("ID", style="cyan", no_wrap=True)
+    table.add_column("Date", style="yellow", no_wrap=True)
+    table.add_column("Type", style="magenta", no_wrap=True)
+    table.add_column("Category", style="blue", no_wrap=True)
+    table.add_column("Amount", style="green", justify="right")
+    table.add_column("Description", style="white")
+
+    for transaction, _ in results:
+        amount_style = "red" if transaction.type == 'expense' else "green"
+        amount_prefix = "-" if transaction.type == 'expense' else "+"
+        table.add_row(
+            str(transaction.id),
+            transaction.date.strftime('%Y-%m-%d'),
+            transaction.type.capitalize(),
+            transaction.category,
+            f"[{amount_style}]{amount_prefix}{format_amount(transaction.amount, transaction.currency, currency_symbol)}[/{amount_style}]",
+            transaction.description or "-"
+        )
+
+    console.print(table)
@@ -1,20 +1,94 @@
 from sqlalchemy.orm import Session
-from .database import Settings
+from datetime import datetime
+from typing import Dict, NamedTuple, Optional, Tuple
+from urllib.parse import unquote
+from .database import DataVersion, Settings, data_version, session_ledger
+from .profiling import timed
+from .utils import from_minor
+
+class SettingsSnapshot(NamedTuple):
+    currency_symbol: str = '$'
+    monthly_budget_minor: int = 0
+    savings_goal_minor: int = 0
+    savings_goal_name: str = 'Savings Goal'
+    updated_at: Optional[datetime] = None
+    currency_code: Optional[str] = None
+
+    @property
+    def monthly_budget(self) -> float:
+        return from_minor(self.monthly_budget_minor)
+
+    @property
+    def savings_goal_amount(self) -> float:
+        return from_minor(self.savings_goal_minor)
+
+# One snapshot per database and ledger, replaced by every setter and stamped
+# with the connection's data_version, so a commit from another connection or
+# process (a long-lived daemon or aio embedder) forces one fresh read.
+_cache: Dict[Tuple[str, str], Tuple[DataVersion, SettingsSnapshot]] = {}
+
+def _cache_key(session: Session) -> Tuple[str, str]:
+    # The database path, so sync, async and read-only engines on one file share an entry.
+    database = session.get_bind().url.database
+    if database.startswith('file:'):
+        database = unquote(database[len('file:'):])
+    return database, session_ledger(session)
+
+def _query_settings(session: Session) -> Optional[Settings]:
+    return session.query(Settings).filter(Settings.ledger_id == session_ledger(session)).first()
+
+def _snapshot(settings: Settings) -> SettingsSnapshot:
+    return SettingsSnapshot(
+        settings.currency_symbol or '$',
+        settings.monthly_budget_minor or 0,
+        settings.savings_goal_minor or 0,
+        settings.savings_goal_name or 'Savings Goal',
+        settings.updated_at,
+        settings.currency_code
+    )
+
+def clear_settings_cache():
+    _cache.clear()
+
+@timed()
+def load_settings(session: Session) -> SettingsSnapshot:
+    key = _cache_key(session)
+    version = data_version(session)
+    cached = _cache.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    settings = _query_settings(session)
+    snapshot = _snapshot(settings) if settings else SettingsSnapshot()
+    _cache[key] = (version, snapshot)
+    return snapshot
 
 def get_settings(session: Session) -> Settings:
-    settings = session.query(Settings).first()
+    settings = _query_settings(session)
     if not settings:
-        settings = Settings()
+        settings = Settings(ledger_id=session_ledger(session))
         session.add(settings)
         session.commit()
     return settings
 
-def set_currency_symbol(session: Session, symbol: str) -> Settings:
-    settings = get_settings(session)
-    settings.currency_symbol = symbol
+def update_settings(session: Session, **values) -> Settings:
+    settings = _query_settings(session)
+    if not settings:
+        settings = Settings(ledger_id=session_ledger(session))
+        session.add(settings)
+    for name, value in values.items():
+        setattr(settings, name, value)
+    session.flush()
+    snapshot = _snapshot(settings)
+    _cache.pop(_cache_key(session), None)
     session.commit()
+    _cache[_cache_key(session)] = (data_version(session), snapshot)
     return settings
 
+def set_currency_symbol(session: Session, symbol: str) -> Settings:
+    return update_settings(session, currency_symbol=symbol)
+
+def set_currency_code(session: Session, code: Optional[str]) -> Settings:
+    return update_settings(session, currency_code=code)
+
 def get_currency_symbol(session: Session) -> str:
-    settings = get_settings(session)
-    return settings.currency_symbol
+    return load_settings(session).currency_symbol
@@ -1,65 +1,428 @@
+from sqlalchemy import delete, insert, or_, text, tuple_, update
 from sqlalchemy.orm import Session
-from datetime import date
-from typing import List, Optional
-from .database import Transaction
-from .utils import validate_date, validate_amount
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+import time
+from .config import DEFAULT_ADD_BATCH_SIZE, DEFAULT_ADD_BATCH_WINDOW
+from .currency import Converter, MissingRateError, normalize_currency_code
+from .database import FOREIGN, NOT_DELETED, MonthlyRollup, Transaction, UndoEntry, normalize_category, session_ledger
+from .profiling import timed
+from .settings import load_settings
+from .utils import currency_exponent, validate_date, validate_amount, to_minor
 
-def add_transaction(
-    session: Session,
+def transaction_record(
+    ledger: str,
     type: str,
-    amount: float,
+    amount: Any,
     category: str,
     description: str = "",
-    transaction_date: Optional[str] = None
-) -> Transaction:
+    transaction_date: Optional[str] = None,
+    currency: Optional[str] = None,
+    ledger_currency: Optional[str] = None
+) -> Dict[str, Any]:
     if type not in ['expense', 'income']:
         raise ValueError("Type must be 'expense' or 'income'")
+    # NULL means the ledger's own currency, so only foreign amounts carry a code.
+    if currency:
+        currency = normalize_currency_code(currency)
+        if currency == ledger_currency:
+            currency = None
 
     validated_amount = validate_amount(str(amount))
     validated_date = validate_date(transaction_date)
+    amount_minor = to_minor(validated_amount, currency_exponent(currency))
+    if amount_minor <= 0:
+        raise ValueError("Amount is smaller than the currency's minor unit")
 
-    transaction = Transaction(
-        type=type,
-        amount=validated_amount,
-        category=category.strip(),
-        description=description.strip(),
-        date=validated_date
-    )
+    return {
+        'ledger_id': ledger,
+        'type': type,
+        'amount_minor': amount_minor,
+        'category': category.strip(),
+        'description': description.strip(),
+        'date': validated_date,
+        'currency': currency or None,
+    }
+
+@timed()
+def add_transaction(
+    session: Session,
+    type: str,
+    amount: float,
+    category: str,
+    description: str = "",
+    transaction_date: Optional[str] = None,
+    on_alert: Optional[Callable[..., None]] = None,
+    currency: Optional[str] = None
+) -> Transaction:
+    transaction = Transaction(**transaction_record(
+        session_ledger(session), type, amount, category, description, transaction_date,
+        currency, load_settings(session).currency_code if currency else None
+    ))
 
     session.add(transaction)
     session.commit()
+
+    # Called with a budgets.BudgetAlert when this expense crosses a category threshold.
+    if on_alert and type == 'expense':
+        from .budgets import check_category_budget
+        amount_minor = transaction.amount_minor
+        if transaction.currency:
+            try:
+                amount_minor = Converter(session).convert(amount_minor, transaction.currency, transaction.date)
+            except MissingRateError:
+                return transaction
+        alert = check_category_budget(session, transaction.category, transaction.date, amount_minor)
+        if alert:
+            on_alert(alert)
     return transaction
 
+class TransactionBatch:
+    # Unit of work for scripted inserts: records are validated as they are
+    # added and written with one multi-row INSERT and a single commit per
+    # batch, so a batch lands entirely or not at all. A batch is flushed once
+    # it holds batch_size records or its oldest record is window seconds old.
+    # add() checks the window; a caller that blocks waiting for input should
+    # wait at most time_left() and flush() when it runs out. Whatever is pending
+    # is flushed when the block exits normally; on an exception it is discarded.
+
+    def __init__(
+        self,
+        session: Session,
+        batch_size: int = DEFAULT_ADD_BATCH_SIZE,
+        window: float = DEFAULT_ADD_BATCH_WINDOW,
+        on_commit: Optional[Callable[[int], None]] = None
+    ):
+        if batch_size < 1:
+            raise ValueError("Batch size must be at least 1")
+        self.session = session
+        self.ledger = session_ledger(session)
+        self.batch_size = batch_size
+        self.window = window
+        self.on_commit = on_commit
+        self.currency = load_settings(session).currency_code
+        self.committed = 0
+        self.pending: List[Dict[str, Any]] = []
+        self._opened = 0.0
+
+    def __enter__(self) -> 'TransactionBatch':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+        else:
+            self.discard()
+        return False
+
+    def add(
+        self,
+        type: str,
+        amount: Any,
+        category: str,
+        description: str = "",
+        transaction_date: Optional[str] = None,
+        currency: Optional[str] = None
+    ):
+        record = transaction_record(
+            self.ledger, type, amount, category, description, transaction_date, currency, self.currency
+        )
+        record['category_key'] = normalize_category(record['category'])
+        if not self.pending:
+            self._opened = time.monotonic()
+        self.pending.append(record)
+        if len(self.pending) >= self.batch_size or time.monotonic() - self._opened >= self.window:
+            self.flush()
+
+    def time_left(self) -> Optional[float]:
+        # Seconds until the pending records are due; None when nothing is pending.
+        if not self.pending:
+            return None
+        return max(0.0, self._opened + self.window - time.monotonic())
+
+    @timed('transactions.TransactionBatch.flush')
+    def flush(self) -> int:
+        if not self.pending:
+            return 0
+        try:
+            self.session.execute(insert(Transaction.__table__), self.pending)
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            self.pending = []
+            raise
+        count = len(self.pending)
+        self.committed += count
+        self.pending = []
+        if self.on_commit:
+            self.on_commit(count)
+        return count
+
+    def discard(self):
+        self.pending = []
+
+def add_transactions(
+    session: Session,
+    records: Iterable[Mapping[str, Any]],
+    batch_size: int = DEFAULT_ADD_BATCH_SIZE,
+    window: float = DEFAULT_ADD_BATCH_WINDOW
+) -> int:
+    # records are mappings with the add_transaction argument names
+    # (type, amount, category, description, transaction_date, currency).
+    with TransactionBatch(session, batch_size, window) as batch:
+        for record in records:
+            batch.add(**record)
+    return batch.committed
+
+class TransactionRow(NamedTuple):
+    id: int
+    date: date
+    type: str
+    category: str
+    amount: float
+    description: str
+    # ISO code of a foreign-currency amount; None in the ledger's own currency.
+    currency: Optional[str] = None
+
+def transaction_row(transaction: Transaction) -> TransactionRow:
+    return TransactionRow(
+        transaction.id, transaction.date, transaction.type,
+        transaction.category, transaction.amount, transaction.description or '',
+        transaction.currency
+    )
+
+CATEGORY_MATCHES = ['exact', 'prefix', 'contains']
+
+Cursor = Tuple[date, int]
+
+def parse_cursor(value: str) -> Cursor:
+    day, sep, transaction_id = value.partition(',')
+    if not sep or not transaction_id.strip().isdigit():
+        raise ValueError("Cursor must look like YYYY-MM-DD,ID")
+    return validate_date(day.strip()), int(transaction_id)
+
+def format_cursor(transaction: Transaction) -> str:
+    return f"{transaction.date.isoformat()},{transaction.id}"
+
+@timed()
+def match_category_keys(session: Session, category: str, category_match: str = 'contains') -> List[str]:
+    if category_match not in CATEGORY_MATCHES:
+        raise ValueError("Category match must be 'exact', 'prefix' or 'contains'")
+    key = normalize_category(category)
+    if category_match == 'exact':
+        return [key]
+
+    # Resolve partial names against the small set of known categories so the
+    # transactions query is always an equality seek on category_key. Rollups
+    # only cover the ledger's own currency, so foreign rows add their names too.
+    ledger = session_ledger(session)
+    known = {
+        normalize_category(name) for (name,) in session.query(MonthlyRollup.category).filter(
+            MonthlyRollup.ledger_id == ledger
+        ).distinct().union(session.query(Transaction.category).filter(
+            Transaction.ledger_id == ledger, FOREIGN, NOT_DELETED
+        ).distinct())
+    }
+    if category_match == 'prefix':
+        return sorted(name for name in known if name.startswith(key))
+    return sorted(name for name in known if key in name)
+
+@timed()
 def get_transactions(
     session: Session,
     limit: int = 50,
     category: Optional[str] = None,
-    type: Optional[str] = None
+    type: Optional[str] = None,
+    after: Optional[Cursor] = None,
+    category_match: str = 'contains'
 ) -> List[Transaction]:
-    query = session.query(Transaction)
+    query = session.query(Transaction).filter(Transaction.ledger_id == session_ledger(session), NOT_DELETED)
 
     if category:
-        query = query.filter(Transaction.category.ilike(f"%{category}%"))
+        query = query.filter(Transaction.category_key.in_(
+            match_category_keys(session, category, category_match)
+        ))
 
     if type:
         query = query.filter(Transaction.type == type)
 
-    return query.order_by(Transaction.date.desc()).limit(limit).all()
+    if after:
+        query = query.filter(tuple_(Transaction.date, Transaction.id) < tuple_(*after))
 
-def delete_transaction(session: Session, transaction_id: int) -> bool:
-    transaction = session.query(Transaction).filter(Transaction.id == transaction_id).first()
-    if transaction:
-        session.delete(transaction)
+    return query.order_by(Transaction.date.desc(), Transaction.id.desc()).limit(limit).all()
+
+IdRange = Tuple[int, int]
+
+def parse_id_ranges(values: Iterable[str]) -> List[IdRange]:
+    # "12", "15-20" and comma-separated lists of either.
+    ranges = []
+    for value in values:
+        for part in value.split(','):
+            low, sep, high = part.strip().partition('-')
+            if not low.strip().isdigit() or (sep and not high.strip().isdigit()):
+                raise ValueError(f"Invalid id or range '{part.strip()}'; use e.g. 12 or 15-20")
+            low_id = int(low)
+            high_id = int(high) if sep else low_id
+            if high_id < low_id:
+                raise ValueError(f"Range '{part.strip()}' ends before it starts")
+            ranges.append((low_id, high_id))
+    return ranges
+
+def _describe_delete(
+    ids: Sequence[IdRange],
+    start_date: Optional[date],
+    end_date: Optional[date],
+    category: Optional[str],
+    type: Optional[str]
+) -> str:
+    parts = []
+    if ids:
+        parts.append("ids " + ", ".join(str(low) if low == high else f"{low}-{high}" for low, high in ids))
+    if start_date:
+        parts.append(f"from {start_date.isoformat()}")
+    if end_date:
+        parts.append(f"to {(end_date - timedelta(days=1)).isoformat()}")
+    if category:
+        parts.append(f"category {category}")
+    if type:
+        parts.append(f"type {type}")
+    return ", ".join(parts)
+
+@timed()
+def delete_transactions(
+    session: Session,
+    ids: Sequence[IdRange] = (),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    category: Optional[str] = None,
+    type: Optional[str] = None,
+    category_match: str = 'exact',
+    hard: bool = False
+) -> int:
+    if not (ids or start_date or end_date or category or type):
+        raise ValueError("Give ids or at least one filter; refusing to delete every transaction")
+    if type and type not in ['expense', 'income']:
+        raise ValueError("Type must be 'expense' or 'income'")
+
+    # One set-based statement; the triggers take the rows out of the rollups and FTS index.
+    conditions = [Transaction.ledger_id == session_ledger(session), NOT_DELETED]
+    if ids:
+        conditions.append(or_(*(
+            Transaction.id == low if low == high else Transaction.id.between(low, high) for low, high in ids
+        )))
+    if start_date:
+        conditions.append(Transaction.date >= start_date)
+    if end_date:
+        conditions.append(Transaction.date < end_date)
+    if category:
+        keys = match_category_keys(session, category, category_match)
+        if not keys:
+            return 0
+        conditions.append(Transaction.category_key.in_(keys))
+    if type:
+        conditions.append(Transaction.type == type)
+
+    if hard:
+        count = session.execute(
+            delete(Transaction).where(*conditions).execution_options(synchronize_session=False)
+        ).rowcount
         session.commit()
-        return True
-    return False
+        return count
+
+    # Soft delete: tombstone the rows with a journal entry so `undo` can restore them.
+    entry = UndoEntry(
+        ledger_id=session_ledger(session),
+        description=_describe_delete(ids, start_date, end_date, category, type)
+    )
+    session.add(entry)
+    session.flush()
+    count = session.execute(
+        update(Transaction).where(*conditions).values(deleted_by=entry.id).execution_options(synchronize_session=False)
+    ).rowcount
+    if not count:
+        session.rollback()
+        return 0
+    entry.count = count
+    session.commit()
+    return count
+
+def delete_transaction(session: Session, transaction_id: int) -> bool:
+    return delete_transactions(session, ids=[(transaction_id, transaction_id)]) > 0
+
+class UndoRow(NamedTuple):
+    id: int
+    description: str
+    count: int
+    created_at: datetime
+
+def undo_row(entry: UndoEntry) -> UndoRow:
+    return UndoRow(entry.id, entry.description, entry.count, entry.created_at)
+
+def get_undo_journal(session: Session, limit: int = 20) -> List[UndoRow]:
+    entries = session.query(UndoEntry).filter(
+        UndoEntry.ledger_id == session_ledger(session)
+    ).order_by(UndoEntry.id.desc()).limit(limit)
+    return [undo_row(entry) for entry in entries]
+
+@timed()
+def undo_delete(session: Session) -> Optional[UndoRow]:
+    entry = session.query(UndoEntry).filter(
+        UndoEntry.ledger_id == session_ledger(session)
+    ).order_by(UndoEntry.id.desc()).first()
+    if entry is None:
+        return None
+    # OR IGNORE: a recurring occurrence re-posted by a backfill since the delete
+    # stays a tombstone instead of becoming a duplicate.
+    session.execute(
+        update(Transaction).where(Transaction.deleted_by == entry.id).values(deleted_by=None)
+        .prefix_with('OR IGNORE').execution_options(synchronize_session=False)
+    )
+    row = undo_row(entry)
+    session.delete(entry)
+    session.commit()
+    return row
+
+class CompactResult(NamedTuple):
+    purged: int
+    bytes_before: int
+    bytes_after: int
+
+def _database_bytes(session: Session) -> int:
+    connection = session.connection()
+    page_size = connection.exec_driver_sql("PRAGMA page_size").scalar()
+    return page_size * connection.exec_driver_sql("PRAGMA page_count").scalar()
+
+@timed()
+def compact(session: Session, vacuum: bool = True) -> CompactResult:
+    # Purges this ledger's tombstones (they can no longer be undone), then
+    # rebuilds the file so the freed pages go back to the filesystem.
+    bytes_before = _database_bytes(session)
+    ledger = session_ledger(session)
+    purged = session.execute(
+        delete(Transaction).where(Transaction.ledger_id == ledger, Transaction.deleted_by.is_not(None))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    session.execute(delete(UndoEntry).where(UndoEntry.ledger_id == ledger))
+    session.execute(text("INSERT INTO transactions_fts (transactions_fts) VALUES ('optimize')"))
+    session.commit()
+
+    if vacuum:
+        # VACUUM cannot run inside a transaction.
+        with session.get_bind().connect() as connection:
+            connection.execution_options(isolation_level='AUTOCOMMIT').exec_driver_sql("VACUUM")
+    bytes_after = _database_bytes(session)
+    session.commit()
+    return CompactResult(purged, bytes_before, bytes_after)
 
+@timed()
 def get_transactions_by_date_range(
     session: Session,
     start_date: date,
     end_date: date
 ) -> List[Transaction]:
     return session.query(Transaction).filter(
+        Transaction.ledger_id == session_ledger(session),
+        NOT_DELETED,
         Transaction.date >= start_date,
         Transaction.date < end_date
     ).order_by(Transaction.date.desc()).all()
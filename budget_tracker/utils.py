@@ -1,34 +1,96 @@
-from datetime import datetime, date
-from typing import Optional
+from datetime import date, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, TypeVar, Union
+import math
 import re
+from .config import DATE_ORDERS, get_date_order
+
+# Plain decimals ("12", "12.50", ".5") are the overwhelmingly common input and
+# skip float()'s exception path; anything else (1e3, " 7 ") still goes through it.
+_PLAIN_AMOUNT = re.compile(r'^\+?(?:\d+(?:\.\d*)?|\.\d+)$')
 
 def validate_amount(amount: str) -> float:
-    try:
+    if _PLAIN_AMOUNT.match(amount):
         amount_float = float(amount)
-        if amount_float <= 0:
-            raise ValueError("Amount must be positive")
-        return amount_float
-    except ValueError:
-        raise ValueError("Amount must be a valid number")
+    else:
+        try:
+            amount_float = float(amount)
+        except ValueError:
+            raise ValueError("Amount must be a valid number")
+        if not math.isfinite(amount_float):
+            raise ValueError("Amount must be a valid number")
+    if amount_float <= 0:
+        raise ValueError("Amount must be positive")
+    return amount_float
+
+# YYYY-MM-DD with unpadded month/day allowed, like strptime('%Y-%m-%d') accepted.
+_ISO_DATE = re.compile(r'^(\d{4})-(\d{1,2})-(\d{1,2})$')
+_SLASH_DATE = re.compile(r'^(\d{1,2})/(\d{1,2})/(\d{4})$')
+DATE_ERROR = "Date must be in YYYY-MM-DD, MM/DD/YYYY, or DD/MM/YYYY format"
+
+def parse_date(value: str, order: Optional[str] = None) -> date:
+    # Canonical ISO dates never reach the regexes.
+    if len(value) == 10 and value[4] == '-' and value[7] == '-':
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            pass
+
+    match = _ISO_DATE.match(value)
+    if match:
+        year, month, day = match.groups()
+        try:
+            return date(int(year), int(month), int(day))
+        except ValueError:
+            raise ValueError(DATE_ERROR)
+
+    match = _SLASH_DATE.match(value)
+    if match:
+        first, second, year = int(match.group(1)), int(match.group(2)), int(match.group(3))
+        # 03/04/2024 is ambiguous: the preferred order wins, the other is the
+        # fallback for dates only it can read (13/04/2024 is always April 13th).
+        if (order or get_date_order()) == 'dmy':
+            first, second = second, first
+        try:
+            return date(year, first, second)
+        except ValueError:
+            pass
+        try:
+            return date(year, second, first)
+        except ValueError:
+            pass
+    raise ValueError(DATE_ERROR)
 
 def validate_date(date_str: Optional[str]) -> date:
     if not date_str:
         return date.today()
+    return parse_date(date_str)
 
-    try:
-        return datetime.strptime(date_str, '%Y-%m-%d').date()
-    except ValueError:
-        pass
+RowError = Tuple[int, str]
 
-    try:
-        return datetime.strptime(date_str, '%m/%d/%Y').date()
-    except ValueError:
-        pass
+class ParsedColumn(NamedTuple):
+    # One slot per input row; None where the row is listed in errors.
+    values: list
+    errors: List[RowError]
 
-    try:
-        return datetime.strptime(date_str, '%d/%m/%Y').date()
-    except ValueError:
-        raise ValueError("Date must be in YYYY-MM-DD, MM/DD/YYYY, or DD/MM/YYYY format")
+def parse_dates(values: Sequence[str], order: Optional[str] = None) -> ParsedColumn:
+    order = order or get_date_order()
+    if order not in DATE_ORDERS:
+        raise ValueError("Date order must be 'mdy' or 'dmy'")
+    parsed: List[Optional[date]] = []
+    errors: List[RowError] = []
+    for index, value in enumerate(values):
+        value = value.strip()
+        if not value:
+            parsed.append(None)
+            errors.append((index, "Date is required"))
+            continue
+        try:
+            parsed.append(parse_date(value, order))
+        except ValueError as e:
+            parsed.append(None)
+            errors.append((index, str(e)))
+    return ParsedColumn(parsed, errors)
 
 def format_currency(amount: float, currency_symbol: str = '$') -> str:
     return f"{currency_symbol}{abs(amount):.2f}"
@@ -43,3 +105,99 @@ def get_current_month_range():
         end_date = date(today.year, today.month + 1, 1)
 
     return start_date, end_date
+
+def add_months(day: date, months: int) -> date:
+    month_index = day.year * 12 + day.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+# Accepts YYYY-MM or any validate_date format; end bounds come back exclusive.
+def parse_period_bound(value: str, end: bool = False) -> date:
+    match = re.match(r'^(\d{4})-(\d{1,2})$', value.strip())
+    if match:
+        first = date(int(match.group(1)), int(match.group(2)), 1)
+        return add_months(first, 1) if end else first
+
+    day = validate_date(value)
+    return day + timedelta(days=1) if end else day
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+# Amounts are stored as integers in the currency's minor unit (cents for USD).
+# The ledger's own amounts always use the default; amounts recorded in another
+# currency use that currency's exponent.
+DEFAULT_CURRENCY_EXPONENT = 2
+
+CURRENCY_EXPONENTS = {
+    'BIF': 0, 'CLP': 0, 'DJF': 0, 'GNF': 0, 'ISK': 0, 'JPY': 0, 'KMF': 0, 'KRW': 0,
+    'PYG': 0, 'RWF': 0, 'UGX': 0, 'VND': 0, 'VUV': 0, 'XAF': 0, 'XOF': 0, 'XPF': 0,
+    'BHD': 3, 'IQD': 3, 'JOD': 3, 'KWD': 3, 'LYD': 3, 'OMR': 3, 'TND': 3,
+}
+
+def currency_exponent(currency_code: Optional[str] = None) -> int:
+    if not currency_code:
+        return DEFAULT_CURRENCY_EXPONENT
+    return CURRENCY_EXPONENTS.get(currency_code.upper(), DEFAULT_CURRENCY_EXPONENT)
+
+def to_minor(amount: Union[str, float, int, Decimal], exponent: int = DEFAULT_CURRENCY_EXPONENT) -> int:
+    # repr() of a float is its shortest round-tripping decimal, so 0.29 -> 29 exactly.
+    value = amount if isinstance(amount, Decimal) else Decimal(repr(amount) if isinstance(amount, float) else str(amount))
+    return int(value.scaleb(exponent).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def from_minor(minor: int, exponent: int = DEFAULT_CURRENCY_EXPONENT) -> float:
+    return minor / 10 ** exponent
+
+def format_minor(minor: int, exponent: int = DEFAULT_CURRENCY_EXPONENT) -> str:
+    return str(Decimal(minor).scaleb(-exponent))
+
+_DECIMAL_AMOUNT = re.compile(r'^(\d*)(?:\.(\d*))?$')
+
+def parse_amounts_minor(values: Sequence[str], exponent: int = DEFAULT_CURRENCY_EXPONENT) -> ParsedColumn:
+    # Positive amounts straight to integer minor units, rounding half up like
+    # to_minor(); plain decimals are split as digits instead of going via Decimal.
+    scale = 10 ** exponent
+    parsed: List[Optional[int]] = []
+    errors: List[RowError] = []
+    for index, value in enumerate(values):
+        value = value.strip()
+        match = _DECIMAL_AMOUNT.match(value[1:] if value.startswith('+') else value)
+        try:
+            if match and (match.group(1) or match.group(2)):
+                whole, fraction = match.group(1), match.group(2) or ''
+                minor = int(whole or 0) * scale
+                if exponent:
+                    minor += int(fraction[:exponent].ljust(exponent, '0'))
+                if len(fraction) > exponent and fraction[exponent] >= '5':
+                    minor += 1
+                if minor <= 0:
+                    raise ValueError(
+                        "Amount is smaller than the currency's minor unit" if (whole + fraction).strip('0')
+                        else "Amount must be positive"
+                    )
+            else:
+                minor = to_minor(validate_amount(value), exponent)
+                if minor <= 0:
+                    raise ValueError("Amount is smaller than the currency's minor unit")
+            parsed.append(minor)
+        except ValueError as e:
+            parsed.append(None)
+            errors.append((index, str(e)))
+    return ParsedColumn(parsed, errors)
+
+T = TypeVar('T')
+
+def chunked(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Measure cold-start latency of the budget CLI.
+
+Every run is a fresh interpreter, so the numbers include Python startup and
+all module imports, as a shell script calling `budget` would see them.
+
+    python scripts/cold_start.py                      # `budget version`, 20 runs
+    python scripts/cold_start.py -n 50 -- list -l 5   # any other command
+    python scripts/cold_start.py --max-ms 250         # exit 1 if the median is slower
+    python scripts/cold_start.py --imports            # slowest imports of one run
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run_once(command):
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-m", "budget_tracker", *command],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True
+    )
+    return (time.perf_counter() - start) * 1000
+
+def slowest_imports(command, count):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "budget_tracker", *command],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True
+    )
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, module = line.split("|")
+        if cumulative.strip().isdigit():
+            timings.append((int(cumulative), module.rstrip()))
+    return sorted(timings, reverse=True)[:count]
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start timing for the budget CLI")
+    parser.add_argument("-n", "--runs", type=int, default=20, help="number of fresh processes (default: 20)")
+    parser.add_argument("--warmup", type=int, default=2, help="untimed runs to warm the OS file cache")
+    parser.add_argument("--max-ms", type=float, help="fail if the median exceeds this many milliseconds")
+    parser.add_argument("--imports", action="store_true", help="show the slowest imports instead of timing")
+    parser.add_argument("command", nargs="*", default=["version"], help="CLI arguments (default: version)")
+    args = parser.parse_args()
+
+    if args.imports:
+        for cumulative, module in slowest_imports(args.command, 25):
+            print(f"{cumulative / 1000:8.1f} ms  {module}")
+        return 0
+
+    for _ in range(args.warmup):
+        run_once(args.command)
+    timings = [run_once(args.command) for _ in range(args.runs)]
+    median = statistics.median(timings)
+    print(f"budget {' '.join(args.command)}: {args.runs} runs")
+    print(f"  min {min(timings):.1f} ms  median {median:.1f} ms  max {max(timings):.1f} ms")
+
+    if args.max_ms is not None and median > args.max_ms:
+        print(f"  FAIL: median above budget of {args.max_ms:.0f} ms")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
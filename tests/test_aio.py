@@ -0,0 +1,125 @@
+import pytest
+import asyncio
+import sqlite3
+import time
+from datetime import date
+from sqlalchemy.exc import OperationalError
+
+pytest.importorskip('aiosqlite')
+pytest.importorskip('greenlet')
+
+from budget_tracker import aio
+from budget_tracker.budgets import set_monthly_budget
+from budget_tracker.database import get_session
+from budget_tracker.reports import MonthlyReport
+from budget_tracker.transactions import TransactionRow
+
+def run(coroutine):
+    async def wrapped():
+        try:
+            return await coroutine
+        finally:
+            await aio.dispose_async_engines()
+    return asyncio.run(wrapped())
+
+def test_async_add_and_list(tmp_path):
+    """Test adding and listing transactions through the async API"""
+    db_path = str(tmp_path / "budget.db")
+
+    async def scenario():
+        async with aio.get_async_session(db_path) as session:
+            added = await aio.add_transaction(session, 'expense', 12.5, 'Food', 'Lunch', '2024-01-15')
+            await aio.add_transaction(session, 'income', 100, 'Salary', transaction_date='2024-01-01')
+            foreign = await aio.add_transaction(session, 'expense', 1600, 'Hotel', transaction_date='2024-01-02', currency='jpy')
+            rows = await aio.get_transactions(session, category='fo')
+            deleted = await aio.delete_transaction(session, added.id)
+            return added, foreign, rows, deleted
+
+    added, foreign, rows, deleted = run(scenario())
+    assert added == TransactionRow(1, date(2024, 1, 15), 'expense', 'Food', 12.5, 'Lunch')
+    assert (foreign.amount, foreign.currency) == (1600.0, 'JPY')
+    assert rows == [added]
+    assert deleted
+
+def test_async_concurrent_sessions(tmp_path):
+    """Test that many concurrent sessions can write and read one database"""
+    db_path = str(tmp_path / "budget.db")
+
+    async def one(index):
+        async with aio.get_async_session(db_path) as session:
+            await aio.add_transaction(session, 'expense', index + 1, 'Misc')
+            return await aio.get_budget_summary(session, all_time=True)
+
+    async def scenario():
+        await asyncio.gather(*[one(index) for index in range(20)])
+        async with aio.get_async_session(db_path) as session:
+            return await aio.get_budget_summary(session, all_time=True), len(await aio.get_transactions(session, limit=100))
+
+    session = get_session(db_path)
+    set_monthly_budget(session, 500.0)
+    session.close()
+
+    (budget, spent, remaining), count = run(scenario())
+    assert count == 20
+    assert (budget, spent, remaining) == (500.0, 210.0, 290.0)
+
+def test_async_session_sees_settings_from_other_writers(tmp_path):
+    """Test that cached settings are reloaded after another process changes them"""
+    db_path = str(tmp_path / "budget.db")
+    session = get_session(db_path)
+    set_monthly_budget(session, 100.0)
+    session.close()
+
+    async def scenario():
+        async with aio.get_async_session(db_path) as session:
+            before = await aio.get_budget_summary(session)
+            # Another process: its own connection, invisible to this one's cache.
+            with sqlite3.connect(db_path) as other:
+                other.execute("UPDATE settings SET monthly_budget_minor = 50000")
+            return before, await aio.get_budget_summary(session)
+
+    before, after = run(scenario())
+    assert before.budget == 100.0
+    assert after.budget == 500.0
+
+def test_async_writer_honours_busy_timeout(tmp_path, monkeypatch):
+    """Test that an async write waits BUDGET_BUSY_TIMEOUT for another writer's lock"""
+    db_path = str(tmp_path / "budget.db")
+    get_session(db_path).close()
+    monkeypatch.setenv('BUDGET_BUSY_TIMEOUT', '0.05')
+
+    writer = sqlite3.connect(db_path, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+
+    async def scenario():
+        async with aio.get_async_session(db_path) as session:
+            started = time.monotonic()
+            with pytest.raises(OperationalError):
+                await aio.add_transaction(session, 'expense', 1, 'Misc')
+            return time.monotonic() - started
+
+    try:
+        assert run(scenario()) < 2
+    finally:
+        writer.rollback()
+        writer.close()
+
+def test_async_reports(tmp_path):
+    """Test that report builders return plain data"""
+    db_path = str(tmp_path / "budget.db")
+
+    async def scenario():
+        async with aio.get_async_session(db_path) as session:
+            await aio.add_transaction(session, 'expense', 30, 'Food', transaction_date='2024-02-10')
+            await aio.add_transaction(session, 'income', 100, 'Salary', transaction_date='2024-02-01')
+            report = await aio.get_monthly_report(session, date(2024, 2, 1))
+            trends = await aio.get_period_trends(session, date(2024, 1, 1), date(2024, 3, 1))
+            categories = await aio.get_category_trends(session, date(2024, 1, 1), date(2024, 3, 1))
+            return report, trends, categories
+
+    report, trends, categories = run(scenario())
+    assert isinstance(report, MonthlyReport)
+    assert [(row.category, row.amount, row.type) for row in report.categories] == [('Salary', -100.0, 'income'), ('Food', 30.0, 'expense')]
+    assert (report.total_income, report.total_expenses, report.net) == (100.0, 30.0, 70.0)
+    assert [(row.period, row.expenses) for row in trends] == [('2024-01', 0.0), ('2024-02', 30.0)]
+    assert [row.category for row in categories] == ['Food']
@@ -0,0 +1,48 @@
+import pytest
+import os
+from datetime import date
+from sqlalchemy import text
+from budget_tracker.batch import batch_report
+from budget_tracker.database import dispose_engines, get_session
+from budget_tracker.transactions import add_transaction
+
+@pytest.fixture
+def ledger_files(tmp_path):
+    """Two account files with the same shape and different amounts"""
+    paths = []
+    for scale in (1, 2):
+        path = str(tmp_path / f"account{scale}.db")
+        session = get_session(path)
+        add_transaction(session, 'expense', 10.0 * scale, 'Food', transaction_date='2024-01-15')
+        add_transaction(session, 'expense', 99.0, 'Food', transaction_date='2024-01-02')
+        add_transaction(session, 'income', 100.0 * scale, 'Salary', transaction_date='2024-02-01')
+        add_transaction(session, 'expense', 5.0 * scale, 'Rent', transaction_date='2024-03-20')
+        session.close()
+        paths.append(path)
+    dispose_engines()
+    yield paths
+
+def test_parallel_report_matches_serial(ledger_files):
+    """Test that the process pool merges the same totals as a serial run"""
+    parallel = batch_report(ledger_files, date(2024, 1, 10), date(2024, 3, 15), jobs=2)
+    serial = batch_report(ledger_files, date(2024, 1, 10), date(2024, 3, 15), jobs=1)
+    assert parallel == serial
+
+    assert [(row.income, row.expenses) for row in parallel.files] == [(100.0, 10.0), (200.0, 20.0)]
+    assert [(row.month, row.income, row.expenses) for row in parallel.months] == [
+        ('2024-01', 0.0, 30.0), ('2024-02', 300.0, 0.0), ('2024-03', 0.0, 0.0),
+    ]
+    assert (parallel.total_income, parallel.total_expenses, parallel.net) == (300.0, 30.0, 270.0)
+
+def test_batch_report_is_read_only(ledger_files):
+    """Test that workers never write and refuse files that need a migration"""
+    before = [os.path.getmtime(path) for path in ledger_files]
+    batch_report(ledger_files, date(2024, 1, 1), date(2025, 1, 1), jobs=2)
+    assert [os.path.getmtime(path) for path in ledger_files] == before
+
+    session = get_session(ledger_files[0])
+    session.execute(text("PRAGMA user_version=1"))
+    session.close()
+    dispose_engines()
+    with pytest.raises(ValueError):
+        batch_report(ledger_files, date(2024, 1, 1), date(2025, 1, 1), jobs=1)
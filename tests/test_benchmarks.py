@@ -0,0 +1,31 @@
+from datetime import date
+from sqlalchemy import func
+from sqlalchemy.orm import sessionmaker
+from benchmarks.synthetic import LedgerSpec, build_ledger, iter_rows
+from budget_tracker.database import Transaction, dispose_engines, init_db
+from budget_tracker.rollups import check_rollups
+
+def test_synthetic_rows_are_deterministic():
+    """Test that the same spec always generates the same rows"""
+    spec = LedgerSpec(rows=500, categories=7, days=90, end=date(2024, 3, 31), seed=3)
+    first = [row for chunk in iter_rows(spec, chunk_size=128) for row in chunk]
+    second = [row for chunk in iter_rows(spec, chunk_size=128) for row in chunk]
+
+    assert first == second
+    assert len(first) == 500
+    assert {row['category'] for row in first} <= {f"Category {i:03d}" for i in range(7)}
+    assert min(row['date'] for row in first) >= date(2024, 1, 2)
+    assert max(row['date'] for row in first) <= date(2024, 3, 31)
+
+def test_build_ledger(tmp_path):
+    """Test that a generated ledger has its rows and consistent rollups"""
+    spec = LedgerSpec(rows=300, categories=5, days=60, end=date(2024, 2, 29))
+    path = build_ledger(spec, str(tmp_path / "ledger.db"))
+
+    session = sessionmaker(bind=init_db(path))()
+    try:
+        assert session.query(func.count(Transaction.id)).scalar() == 300
+        assert check_rollups(session) == []
+    finally:
+        session.close()
+        dispose_engines()
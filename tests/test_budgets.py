@@ -1,11 +1,16 @@
 import pytest
-from budget_tracker.database import Settings, init_db
-from budget_tracker.budgets import set_monthly_budget, get_budget_summary
+from sqlalchemy.orm import sessionmaker
+from budget_tracker.database import init_db
+from budget_tracker.budgets import (
+    set_monthly_budget, set_savings_goal, get_budget_summary, get_savings_progress,
+    set_category_budget, get_category_budgets
+)
+from budget_tracker.transactions import add_transaction
 
 @pytest.fixture
-def test_session():
+def test_session(tmp_path):
     """Create a test database session"""
-    engine = init_db()
+    engine = init_db(str(tmp_path / "budget.db"))
     Session = sessionmaker(bind=engine)
     session = Session()
     yield session
@@ -25,3 +30,73 @@ def test_get_budget_summary(test_session):
     assert budget == 1000.0
     assert spent == 0.0
     assert remaining == 1000.0
+
+def test_get_budget_summary_with_expenses(test_session):
+    """Test that only current-month expenses count against the budget"""
+    set_monthly_budget(test_session, 1000.0)
+    add_transaction(test_session, 'expense', 150.0, 'Food')
+    add_transaction(test_session, 'expense', 50.0, 'Transport')
+    add_transaction(test_session, 'income', 500.0, 'Salary')
+    add_transaction(test_session, 'expense', 75.0, 'Food', transaction_date='2000-01-15')
+
+    budget, spent, remaining = get_budget_summary(test_session)
+    assert spent == 200.0
+    assert remaining == 800.0
+
+    budget, spent, remaining = get_budget_summary(test_session, all_time=True)
+    assert spent == 275.0
+
+def test_get_savings_progress(test_session):
+    """Test savings progress from the monthly surplus"""
+    set_savings_goal(test_session, 1000.0)
+    add_transaction(test_session, 'income', 500.0, 'Salary')
+    add_transaction(test_session, 'expense', 250.0, 'Rent')
+
+    goal, surplus, percent = get_savings_progress(test_session)
+    assert goal == 1000.0
+    assert surplus == 250.0
+    assert percent == 25.0
+
+def test_budget_summary_sums_exactly(test_session):
+    """Test that many small amounts add up without float drift"""
+    set_monthly_budget(test_session, 1.0)
+    for _ in range(10):
+        add_transaction(test_session, 'expense', 0.1, 'Coffee')
+
+    budget, spent, remaining = get_budget_summary(test_session)
+    assert spent == 1.0
+    assert remaining == 0.0
+
+    # 1.1 - 1.0 in floats is 0.10000000000000009.
+    set_monthly_budget(test_session, 1.1)
+    assert get_budget_summary(test_session).remaining == 0.1
+
+def test_category_budget_alerts_fire_once_per_threshold(test_session):
+    """Test that add_transaction reports the 80% and 100% crossings as they happen"""
+    set_category_budget(test_session, 'Food', 100.0)
+    alerts = []
+    for amount in (50.0, 31.0, 5.0, 20.0, 1.0):
+        add_transaction(test_session, 'expense', amount, 'food', on_alert=alerts.append)
+    add_transaction(test_session, 'income', 500.0, 'Food', on_alert=alerts.append)
+
+    assert [(alert.category, alert.threshold, alert.spent) for alert in alerts] == [
+        ('Food', 80, 81.0), ('Food', 100, 106.0),
+    ]
+
+def test_get_category_budgets(test_session):
+    """Test that category budgets report spend from the rollups and can be removed"""
+    set_category_budget(test_session, 'Food', 200.0, warn_percent=90)
+    set_category_budget(test_session, 'Fun', 50.0)
+    add_transaction(test_session, 'expense', 50.0, 'Food')
+    add_transaction(test_session, 'expense', 25.0, 'FOOD')
+    add_transaction(test_session, 'expense', 10.0, 'Food', transaction_date='2020-01-01')
+
+    rows = get_category_budgets(test_session)
+    assert [(row.category, row.spent, row.remaining, row.percent, row.warn_percent) for row in rows] == [
+        ('Food', 75.0, 125.0, 37.5, 90), ('Fun', 0.0, 50.0, 0.0, 80),
+    ]
+
+    assert set_category_budget(test_session, 'fun', 0) is None
+    assert [row.category for row in get_category_budgets(test_session)] == ['Food']
+    with pytest.raises(ValueError):
+        set_category_budget(test_session, 'Food', 10.0, warn_percent=0)
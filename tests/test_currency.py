@@ -0,0 +1,208 @@
+import pytest
+import io
+import json
+import sqlite3
+from datetime import date
+from sqlalchemy.orm import sessionmaker
+from budget_tracker.budgets import get_category_budgets, set_category_budget
+from budget_tracker.cli import run_command
+from budget_tracker.currency import Converter, MissingRateError, _series, format_amount, import_rates, read_rates_csv
+from budget_tracker.database import Transaction, init_db
+from budget_tracker.exporters import export_transactions
+from budget_tracker.importers import import_transactions, read_csv
+from budget_tracker.reports import get_monthly_report, get_period_trends
+from budget_tracker.rollups import check_rollups, get_type_totals
+from budget_tracker.settings import set_currency_code
+from budget_tracker.transactions import add_transaction
+
+RATES = (
+    "date,currency,rate\n"
+    "2024-01-02,USD,1.10\n"
+    "2024-01-02,GBP,0.80\n"
+    "2024-01-10,USD,1.20\n"
+)
+
+@pytest.fixture
+def test_session(tmp_path):
+    """Create a test database session with a USD ledger and EUR-based rates"""
+    engine = init_db(str(tmp_path / "budget.db"))
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    set_currency_code(session, 'USD')
+    import_rates(session, read_rates_csv(io.StringIO(RATES)), base='EUR')
+    yield session
+    session.rollback()
+    session.close()
+
+def test_converter_uses_latest_rate_and_cross_rates(test_session):
+    """Test that conversion picks the last rate on or before the day and crosses through the base"""
+    converter = Converter(test_session)
+    assert converter.convert(10000, 'EUR', date(2024, 1, 5)) == 11000
+    assert converter.convert(10000, 'EUR', date(2024, 1, 10)) == 12000
+    # GBP -> USD through EUR: 1.20 / 0.80
+    assert converter.convert(1000, 'GBP', date(2024, 2, 1)) == 1500
+    assert converter.convert(1000, 'USD', date(2023, 1, 1)) == 1000
+    assert any(key[1:] == ('EUR', 'USD') for key in _series)
+
+    with pytest.raises(MissingRateError):
+        converter.convert(1000, 'EUR', date(2024, 1, 1))
+    with pytest.raises(MissingRateError):
+        converter.convert(1000, 'JPY', date(2024, 1, 5))
+
+def test_add_keeps_native_currency_null(test_session):
+    """Test that only amounts in another currency store a code"""
+    native = add_transaction(test_session, 'expense', 10.0, 'Food', transaction_date='2024-01-05', currency='usd')
+    foreign = add_transaction(test_session, 'expense', 10.0, 'Food', transaction_date='2024-01-05', currency='eur')
+    assert native.currency is None
+    assert foreign.currency == 'EUR'
+
+    with pytest.raises(ValueError):
+        add_transaction(test_session, 'expense', 10.0, 'Food', currency='euro')
+
+def test_aggregations_convert_foreign_rows(test_session):
+    """Test that summaries, reports and category budgets add converted foreign amounts"""
+    add_transaction(test_session, 'expense', 10.0, 'Food', transaction_date='2024-01-05')
+    add_transaction(test_session, 'expense', 100.0, 'Hotel', transaction_date='2024-01-05', currency='EUR')
+    add_transaction(test_session, 'expense', 20.0, 'Food', transaction_date='2024-01-12', currency='GBP')
+    add_transaction(test_session, 'income', 50.0, 'Refund', transaction_date='2024-02-01', currency='EUR')
+
+    assert get_type_totals(test_session, '2024-01') == {'expense': 1000 + 11000 + 3000}
+    assert get_type_totals(test_session) == {'expense': 15000, 'income': 6000}
+
+    report = get_monthly_report(test_session, date(2024, 1, 1))
+    assert report.total_expenses == 150.0
+    assert {row.category: row.amount for row in report.categories} == {'Hotel': 110.0, 'Food': 40.0}
+
+    trends = get_period_trends(test_session, date(2024, 1, 3), date(2024, 2, 15))
+    assert [(row.period, row.income, row.expenses) for row in trends] == [
+        ('2024-01', 0.0, 150.0), ('2024-02', 60.0, 0.0)
+    ]
+
+    set_category_budget(test_session, 'food', 50.0)
+    [row] = get_category_budgets(test_session, date(2024, 1, 1))
+    assert row.spent == 40.0
+
+    # Rollups hold the ledger's own currency only and stay consistent.
+    assert check_rollups(test_session) == []
+    assert test_session.query(Transaction).filter(Transaction.currency.is_(None)).count() == 1
+
+def test_import_rates_replaces_existing_days(test_session):
+    """Test that re-importing a day overwrites its rate and clears the series cache"""
+    assert Converter(test_session).factor('EUR', date(2024, 1, 3)) == pytest.approx(1.10)
+    imported, errors = import_rates(test_session, read_rates_csv(io.StringIO(
+        "date,currency,rate,base\n"
+        "2024-01-02,USD,1.05,EUR\n"
+        "2024-01-02,USD,0,EUR\n"
+        "2024-01-02,USD,1.05,\n"
+    )))
+    assert imported == 1
+    assert [line for line, _ in errors] == [3, 4]
+    assert Converter(test_session).factor('EUR', date(2024, 1, 3)) == pytest.approx(1.05)
+
+    with pytest.raises(ValueError):
+        list(read_rates_csv(io.StringIO("day,currency,rate\n")))
+
+def test_rate_cache_sees_other_writers(test_session):
+    """Test that rates imported by another connection replace cached and missing series, and other writes don't"""
+    day = date(2024, 1, 5)
+    assert Converter(test_session).factor('EUR', day) == pytest.approx(1.10)
+    with pytest.raises(MissingRateError):
+        Converter(test_session).factor('JPY', day)
+    cached = dict(_series)
+
+    with sqlite3.connect(test_session.get_bind().url.database) as other:
+        other.execute("INSERT INTO transactions (ledger_id, date, type, category, category_key, amount_minor, description) "
+                      "VALUES ('default', '2024-01-05', 'expense', 'Food', 'food', 100, '')")
+    test_session.commit()
+    Converter(test_session).factor('EUR', day)
+    assert all(_series[key] is entry for key, entry in cached.items())
+
+    # What import_rates writes: a replaced day gets a new row.
+    with sqlite3.connect(test_session.get_bind().url.database) as other:
+        other.execute("INSERT OR REPLACE INTO exchange_rates (base, currency, date, rate) VALUES ('EUR', 'USD', '2024-01-02', 1.5)")
+        other.execute("INSERT INTO exchange_rates (base, currency, date, rate) VALUES ('EUR', 'JPY', '2024-01-02', 150.0)")
+    test_session.commit()
+
+    converter = Converter(test_session)
+    assert converter.factor('EUR', day) == pytest.approx(1.5)
+    assert converter.factor('JPY', day) == pytest.approx(1.5 / 150.0)
+
+def test_foreign_amounts_use_their_minor_units(test_session, tmp_path):
+    """Test that yen are stored, shown, exported and converted without decimals"""
+    import_rates(test_session, read_rates_csv(io.StringIO("date,currency,rate\n2024-01-02,JPY,160\n")), base='EUR')
+    lunch = add_transaction(test_session, 'expense', 1600, 'Food', transaction_date='2024-01-05', currency='JPY')
+    assert (lunch.amount_minor, lunch.amount) == (1600, 1600.0)
+    assert format_amount(lunch.amount, lunch.currency, '$') == '1600 JPY'
+    # 1600 JPY = 10 EUR = 11 USD
+    assert get_type_totals(test_session, '2024-01') == {'expense': 1100}
+
+    result = import_transactions(test_session, read_csv(io.StringIO(
+        "type,amount,category,description,date,currency\n"
+        "expense,800,Food,Ramen,2024-01-06,jpy\n"
+        "expense,0.4,Food,Candy,2024-01-06,JPY\n"
+    )))
+    assert result.imported == 1
+    assert [line for line, _ in result.errors] == [3]
+    assert get_type_totals(test_session, '2024-01') == {'expense': 1650}
+
+    export_path = str(tmp_path / "out.csv")
+    export_transactions(test_session, export_path)
+    with open(export_path) as handle:
+        assert [row.split(',')[2] for row in handle.read().splitlines()[1:]] == ['800', '1600']
+
+def test_cli_rates_and_currency_option(tmp_path, capsys):
+    """Test rates import/list and add --currency through the CLI"""
+    db_path = str(tmp_path / "budget.db")
+    rates_path = tmp_path / "rates.csv"
+    rates_path.write_text(RATES)
+    run_command(['--db', db_path, 'set-currency', '$', '--code', 'USD'])
+    run_command(['--db', db_path, 'rates', 'import', str(rates_path), '--base', 'EUR'])
+    run_command(['--db', db_path, 'add', 'expense', '100', 'Hotel', '--currency', 'EUR', '--date', '2024-01-05'])
+    capsys.readouterr()
+
+    run_command(['--db', db_path, 'rates', 'list', '--format', 'csv'])
+    assert capsys.readouterr().out.splitlines()[1:] == [
+        'EUR,GBP,2024-01-02,2024-01-02,1,0.8',
+        'EUR,USD,2024-01-02,2024-01-10,2,1.2',
+    ]
+
+    run_command(['--db', db_path, 'report', 'trends', '--from', '2024-01', '--to', '2024-01', '--format', 'csv'])
+    assert capsys.readouterr().out.splitlines()[1].startswith('2024-01,0.0,110.0,')
+
+def test_amounts_without_rate_are_left_out_with_warning(tmp_path, capsys):
+    """Test that a row without a rate is left out of totals instead of failing list, summary and reports"""
+    db_path = str(tmp_path / "budget.db")
+    rates_path = tmp_path / "rates.csv"
+    rates_path.write_text(RATES)
+    run_command(['--db', db_path, 'set-currency', '$', '--code', 'USD'])
+    run_command(['--db', db_path, 'rates', 'import', str(rates_path), '--base', 'EUR'])
+    run_command(['--db', db_path, 'add', 'expense', '10', 'Food', '--date', '2024-01-05'])
+    capsys.readouterr()
+
+    run_command(['--db', db_path, 'add', 'expense', '1600', 'Food', '--currency', 'JPY', '--date', '2024-01-05'])
+    assert 'left out of totals' in capsys.readouterr().out
+
+    run_command(['--db', db_path, 'list', '--format', 'json'])
+    captured = capsys.readouterr()
+    assert json.loads(captured.out)['total_expenses'] == 10.0
+    assert 'No JPY->USD exchange rate' in captured.err
+
+    run_command(['--db', db_path, 'report', 'trends', '--from', '2024-01', '--to', '2024-01', '--format', 'csv'])
+    captured = capsys.readouterr()
+    assert captured.out.splitlines()[1].startswith('2024-01,0.0,10.0,')
+    assert 'JPY amounts are left out of totals' in captured.err
+
+def test_rate_cache_survives_between_commands(tmp_path, capsys):
+    """Test that shell and daemon commands reuse rate series loaded by an earlier command"""
+    db_path = str(tmp_path / "budget.db")
+    rates_path = tmp_path / "rates.csv"
+    rates_path.write_text(RATES)
+    run_command(['--db', db_path, 'set-currency', '$', '--code', 'USD'])
+    run_command(['--db', db_path, 'rates', 'import', str(rates_path), '--base', 'EUR'])
+    run_command(['--db', db_path, 'add', 'expense', '100', 'Hotel', '--currency', 'EUR', '--date', '2024-01-05'])
+    run_command(['--db', db_path, 'report', 'trends', '--from', '2024-01', '--to', '2024-01'])
+    cached = dict(_series)
+    assert cached
+
+    run_command(['--db', db_path, 'report', 'trends', '--from', '2024-01', '--to', '2024-01'])
+    assert all(_series[key] is entry for key, entry in cached.items())
@@ -0,0 +1,70 @@
+import pytest
+import os
+import socket
+import threading
+from sqlalchemy.orm import sessionmaker
+from budget_tracker import client, daemon
+from budget_tracker.database import Transaction, init_db
+from budget_tracker.cli import run_command
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason="Unix sockets only")
+
+@pytest.fixture
+def served_db(tmp_path, monkeypatch):
+    """Run a daemon in a thread for a temporary database"""
+    db_path = str(tmp_path / "budget.db")
+    sock = str(tmp_path / "budget.sock")
+    monkeypatch.setenv('BUDGET_SOCKET', sock)
+    monkeypatch.delenv('BUDGET_NO_DAEMON', raising=False)
+
+    ready = threading.Event()
+    thread = threading.Thread(target=daemon.serve, args=(db_path,), kwargs={'on_ready': lambda path: ready.set()})
+    thread.start()
+    assert ready.wait(10)
+    yield db_path
+    daemon.stop(db_path)
+    thread.join(10)
+
+def test_forward_runs_command_in_daemon(served_db, capsys):
+    """Test that forwarded commands run in the daemon and print its output"""
+    assert client.forward(['--db', served_db, 'add', 'expense', '12.50', 'Food', 'Lunch']) == 0
+    assert 'Added expense' in capsys.readouterr().out
+
+    assert client.forward(['list', '--bogus']) == 2
+    assert 'No such option' in capsys.readouterr().err
+    assert client.forward(['add', '--stdin']) is None
+
+    session = sessionmaker(bind=init_db(served_db))()
+    try:
+        assert [(t.category, t.amount_minor) for t in session.query(Transaction)] == [('Food', 1250)]
+    finally:
+        session.close()
+
+def test_forward_falls_back_without_daemon(tmp_path, monkeypatch):
+    """Test that the client declines when no daemon is listening or the command is local-only"""
+    monkeypatch.setenv('BUDGET_SOCKET', str(tmp_path / "missing.sock"))
+    assert client.forward(['add', 'expense', '1', 'Food']) is None
+    assert client.forward(['export', '-f', 'out.csv']) is None
+    assert client.split_global_options(['--db=x.db', '--ledger', 'bob', 'list', '-l', '5']) == ('x.db', 'bob', ['list', '-l', '5'])
+
+def test_forward_refuses_socket_others_can_open(tmp_path, monkeypatch, capsys):
+    """Test that the client never sends commands to a socket readable by other users"""
+    sock = str(tmp_path / "budget.sock")
+    monkeypatch.setenv('BUDGET_SOCKET', sock)
+    monkeypatch.delenv('BUDGET_NO_DAEMON', raising=False)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        server.bind(sock)
+        server.listen(1)
+        os.chmod(sock, 0o666)
+        assert client.forward(['list']) is None
+        assert 'accessible to other users' in capsys.readouterr().err
+    finally:
+        server.close()
+
+def test_run_command_exit_codes(tmp_path):
+    """Test that in-process commands report their exit codes"""
+    db_path = str(tmp_path / "budget.db")
+    assert run_command(['--db', db_path, 'add', 'income', '100', 'Salary']) == 0
+    assert run_command(['--db', db_path, 'rebuild-rollups', '--check']) == 0
+    assert run_command(['--db', db_path, 'nosuchcommand']) == 2
@@ -0,0 +1,112 @@
+import pytest
+import sqlite3
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError
+from budget_tracker.database import (
+    SCHEMA_VERSION, Transaction, dispose_engines, get_engine, get_readonly_session, get_session
+)
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Path to a throwaway database file"""
+    yield str(tmp_path / "budget.db")
+    dispose_engines()
+
+def test_engine_is_cached(db_path):
+    """Test that repeated lookups reuse one engine per database file"""
+    assert get_engine(db_path) is get_engine(db_path)
+
+def test_schema_version_marker(db_path):
+    """Test that a new database is stamped with the current schema version"""
+    with get_engine(db_path).connect() as connection:
+        assert connection.execute(text("PRAGMA user_version")).scalar() == SCHEMA_VERSION
+
+def test_sqlite_pragmas_applied(db_path):
+    """Test that sessions run with the configured SQLite pragmas"""
+    session = get_session(db_path)
+    try:
+        assert session.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert session.execute(text("PRAGMA synchronous")).scalar() == 1
+    finally:
+        session.close()
+
+def test_sqlite_pragma_overrides_are_validated(db_path, monkeypatch, capsys):
+    """Test that BUDGET_SQLITE_* overrides must be a known keyword or an integer"""
+    from budget_tracker.cli import run_command
+    from budget_tracker.config import get_sqlite_pragmas
+
+    monkeypatch.setenv('BUDGET_SQLITE_SYNCHRONOUS', 'full')
+    monkeypatch.setenv('BUDGET_SQLITE_CACHE_SIZE', '-2000')
+    assert get_sqlite_pragmas()['synchronous'] == 'FULL'
+    assert get_sqlite_pragmas()['cache_size'] == -2000
+
+    monkeypatch.setenv('BUDGET_SQLITE_JOURNAL_MODE', 'WAL; DROP TABLE transactions')
+    with pytest.raises(ValueError, match='BUDGET_SQLITE_JOURNAL_MODE'):
+        get_engine(db_path)
+    monkeypatch.setenv('BUDGET_SQLITE_JOURNAL_MODE', 'wal')
+    monkeypatch.setenv('BUDGET_SQLITE_MMAP_SIZE', '1e9')
+    assert run_command(['--db', db_path, 'list']) == 1
+    assert 'must be an integer' in capsys.readouterr().out
+
+def test_migrates_unversioned_database(db_path):
+    """Test that a database created before versioning gains the new indexes"""
+    connection = sqlite3.connect(db_path)
+    connection.execute(
+        "CREATE TABLE transactions (id INTEGER PRIMARY KEY, type VARCHAR NOT NULL, "
+        "amount FLOAT NOT NULL, category VARCHAR NOT NULL, description VARCHAR, "
+        "date DATE NOT NULL, created_at DATETIME)"
+    )
+    connection.execute(
+        "CREATE TABLE settings (id INTEGER PRIMARY KEY, currency_symbol VARCHAR, monthly_budget FLOAT, "
+        "savings_goal_amount FLOAT, savings_goal_name VARCHAR, created_at DATETIME, updated_at DATETIME)"
+    )
+    connection.execute("INSERT INTO transactions (type, amount, category, date) VALUES ('expense', 5.29, 'Food', '2024-01-02')")
+    connection.execute("INSERT INTO settings (currency_symbol, monthly_budget, savings_goal_amount) VALUES ('$', 1500.1, 0)")
+    connection.commit()
+    connection.close()
+
+    with get_engine(db_path).connect() as connection:
+        indexes = {index["name"] for index in inspect(connection).get_indexes("transactions")}
+        assert {
+            "ix_transactions_ledger_date_type_amount", "ix_transactions_ledger_category_key_date", "ix_transactions_deleted_by"
+        } <= indexes
+        assert connection.execute(text("PRAGMA user_version")).scalar() == SCHEMA_VERSION
+        assert connection.execute(text("SELECT category_key FROM transactions")).scalar() == "food"
+        assert connection.execute(text("SELECT amount_minor FROM transactions")).scalar() == 529
+        assert connection.execute(text("SELECT total FROM monthly_rollups WHERE month = '2024-01'")).scalar() == 529
+        assert connection.execute(text("SELECT category_key FROM monthly_rollups")).scalar() == "food"
+        assert "ix_monthly_rollups_ledger_month_category_key" in {
+            index["name"] for index in inspect(connection).get_indexes("monthly_rollups")
+        }
+        assert connection.execute(text("SELECT monthly_budget_minor FROM settings")).scalar() == 150010
+        assert connection.execute(text("SELECT DISTINCT ledger_id FROM transactions")).scalars().all() == ["default"]
+        assert connection.execute(text("SELECT ledger_id FROM settings")).scalar() == "default"
+
+def test_readonly_session_reads_a_snapshot(db_path):
+    """Test that read-only sessions never write and see one snapshot while a writer holds its lock"""
+    reader = get_readonly_session(db_path)
+    assert reader.execute(text("PRAGMA user_version")).scalar() == SCHEMA_VERSION
+    try:
+        assert reader.query(Transaction).count() == 0
+
+        writer = sqlite3.connect(db_path, isolation_level=None)
+        writer.execute("BEGIN IMMEDIATE")
+        writer.execute(
+            "INSERT INTO transactions (ledger_id, type, amount_minor, category, category_key, date) "
+            "VALUES ('default', 'expense', 100, 'Food', 'food', '2024-01-01')"
+        )
+        other = get_readonly_session(db_path)
+        try:
+            assert other.query(Transaction).count() == 0
+        finally:
+            other.close()
+        writer.execute("COMMIT")
+        writer.close()
+
+        assert reader.query(Transaction).count() == 0
+        reader.rollback()
+        assert reader.query(Transaction).count() == 1
+        with pytest.raises(OperationalError):
+            reader.execute(text("DELETE FROM transactions"))
+    finally:
+        reader.close()
@@ -0,0 +1,55 @@
+import pytest
+import csv
+import gzip
+import json
+from datetime import date
+from sqlalchemy.orm import sessionmaker
+from budget_tracker.database import init_db
+from budget_tracker.exporters import export_transactions
+from budget_tracker.transactions import add_transaction
+
+@pytest.fixture
+def test_session(tmp_path):
+    """Create a test database session with a few transactions"""
+    engine = init_db(str(tmp_path / "budget.db"))
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    add_transaction(session, 'expense', 25.50, 'Food', 'Lunch', '2024-01-15')
+    add_transaction(session, 'income', 1200.00, 'Salary', 'Monthly', '2024-02-01')
+    add_transaction(session, 'expense', 9.99, 'Food', 'Snack', '2024-02-03')
+    yield session
+    session.rollback()
+    session.close()
+
+def test_export_csv_with_filters(test_session, tmp_path):
+    """Test that date range and category filters are applied"""
+    test_file = tmp_path / "export.csv"
+    count = export_transactions(
+        test_session, str(test_file), start_date=date(2024, 2, 1), category='Food'
+    )
+
+    with open(test_file, newline='') as handle:
+        rows = list(csv.DictReader(handle))
+    assert count == 1
+    assert rows[0]['description'] == 'Snack'
+    assert rows[0]['date'] == '2024-02-03'
+
+def test_export_gzip_jsonl(test_session, tmp_path):
+    """Test JSON Lines output written through gzip"""
+    test_file = tmp_path / "export.jsonl.gz"
+    count = export_transactions(test_session, str(test_file), 'jsonl', compress=True, type='expense', batch_size=1)
+
+    with gzip.open(test_file, 'rt') as handle:
+        records = [json.loads(line) for line in handle]
+    assert count == 2
+    assert [r['amount'] for r in records] == [9.99, 25.50]
+
+def test_export_parquet(test_session, tmp_path):
+    """Test Parquet output when pyarrow is available"""
+    parquet = pytest.importorskip("pyarrow.parquet")
+    test_file = tmp_path / "export.parquet"
+    export_transactions(test_session, str(test_file), 'parquet')
+
+    table = parquet.read_table(test_file)
+    assert table.num_rows == 3
+    assert table.column('category').to_pylist() == ['Food', 'Salary', 'Food']
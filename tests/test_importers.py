@@ -0,0 +1,60 @@
+import pytest
+import io
+from sqlalchemy.orm import sessionmaker
+from budget_tracker.database import Transaction, init_db
+from budget_tracker.importers import import_transactions, parse_column_map, read_csv, read_ofx, read_qif
+
+@pytest.fixture
+def test_session(tmp_path):
+    """Create a test database session"""
+    engine = init_db(str(tmp_path / "budget.db"))
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    yield session
+    session.rollback()
+    session.close()
+
+def test_import_exported_csv(test_session):
+    """Test importing the CSV layout written by export_to_csv"""
+    handle = io.StringIO(
+        "id,type,amount,category,description,date\n"
+        "1,expense,25.50,Food,Lunch,2024-01-15\n"
+        "2,income,1200,Salary,Monthly,2024-01-01\n"
+    )
+    result = import_transactions(test_session, read_csv(handle), chunk_size=1)
+
+    assert result.imported == 2
+    assert result.errors == []
+    assert test_session.query(Transaction).count() == 2
+
+def test_import_reports_bad_rows(test_session):
+    """Test that invalid rows are reported without aborting the import"""
+    handle = io.StringIO(
+        "Posted,Value,Memo\n"
+        "2024-01-15,-25.50,Coffee\n"
+        "not-a-date,10,Oops\n"
+        "2024-01-16,abc,Oops\n"
+        "01/20/2024,300,Refund\n"
+    )
+    column_map = parse_column_map(["date=Posted", "amount=Value", "description=Memo"])
+    result = import_transactions(test_session, read_csv(handle, column_map))
+
+    assert result.imported == 2
+    assert [line for line, _ in result.errors] == [3, 4]
+    types = sorted(t.type for t in test_session.query(Transaction).all())
+    assert types == ['expense', 'income']
+
+def test_read_ofx_and_qif():
+    """Test parsing OFX and QIF statements into raw rows"""
+    ofx = io.StringIO(
+        "<OFX><BANKTRANLIST>\n<STMTTRN>\n<TRNTYPE>DEBIT\n<DTPOSTED>20240115120000\n"
+        "<TRNAMT>-42.10\n<NAME>Grocer\n</STMTTRN>\n</BANKTRANLIST></OFX>\n"
+    )
+    [(_, row)] = list(read_ofx(ofx))
+    assert row['amount'] == '-42.10'
+    assert row['date'] == '2024-01-15'
+
+    qif = io.StringIO("!Type:Bank\nD1/15'24\nT-42.10\nPGrocer\nLFood\n^\n")
+    [(_, row)] = list(read_qif(qif))
+    assert row['date'] == '1/15/2024'
+    assert row['category'] == 'Food'
@@ -0,0 +1,65 @@
+import pytest
+from budget_tracker import database
+from budget_tracker.budgets import get_budget_summary, set_monthly_budget
+from budget_tracker.database import dispose_engines, get_session
+from budget_tracker.ledgers import LedgerRouter, list_ledgers
+from budget_tracker.search import search_transactions
+from budget_tracker.settings import get_currency_symbol, set_currency_symbol
+from budget_tracker.transactions import add_transaction, delete_transaction, get_transactions
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Path to a throwaway database file"""
+    yield str(tmp_path / "budget.db")
+    dispose_engines()
+
+def test_ledgers_are_isolated(db_path):
+    """Test that transactions, settings and totals never cross ledgers"""
+    alice = get_session(db_path, ledger='alice')
+    bob = get_session(db_path, ledger='bob')
+    carol = get_session(db_path, ledger='carol')
+    try:
+        lunch = add_transaction(alice, 'expense', 12.0, 'Food', 'Lunch')
+        add_transaction(bob, 'expense', 30.0, 'Food', 'Dinner')
+        set_monthly_budget(alice, 100.0)
+        set_currency_symbol(bob, '€')
+
+        assert [t.description for t in get_transactions(alice)] == ['Lunch']
+        assert [t.description for t, _ in search_transactions(bob, 'lunch')] == []
+        assert get_budget_summary(alice) == (100.0, 12.0, 88.0)
+        assert get_budget_summary(bob) == (0.0, 0.0, 0.0)
+        assert (get_currency_symbol(alice), get_currency_symbol(bob)) == ('$', '€')
+
+        assert not delete_transaction(bob, lunch.id)
+        # Only foreign-currency rows, which have no rollups.
+        add_transaction(carol, 'expense', 5.0, 'Food', currency='EUR')
+        assert list_ledgers(alice) == ['alice', 'bob', 'carol']
+    finally:
+        alice.close()
+        bob.close()
+        carol.close()
+
+def test_sharded_router_bounds_open_engines(tmp_path, monkeypatch):
+    """Test that sharded ledgers get their own files and the engine pool stays bounded"""
+    monkeypatch.setenv('BUDGET_MAX_ENGINES', '2')
+    router = LedgerRouter(shard_dir=str(tmp_path / "shards"))
+    (tmp_path / "shards").mkdir()
+
+    first = router.session('user-0')
+    add_transaction(first, 'expense', 1.0, 'Food')
+    try:
+        for index in range(1, 5):
+            session = router.session(f'user-{index}')
+            add_transaction(session, 'expense', index + 1.0, 'Food')
+            session.close()
+        assert len(database._engines) <= 2
+
+        # A session whose engine was evicted keeps working until it is closed.
+        assert [t.amount for t in get_transactions(first)] == [1.0]
+    finally:
+        first.close()
+        dispose_engines()
+
+    assert router.ledgers() == [f'user-{index}' for index in range(5)]
+    with pytest.raises(ValueError):
+        router.path_for('../escape')
@@ -0,0 +1,42 @@
+import pytest
+import csv
+import io
+import json
+from budget_tracker.cli import run_command
+from budget_tracker.output import check_format, to_plain, write_csv
+from budget_tracker.transactions import TransactionRow
+from datetime import date
+
+def test_to_plain_and_csv():
+    """Test converting result tuples to JSON-ready values and CSV rows"""
+    row = TransactionRow(1, date(2024, 1, 5), 'expense', 'Food', 12.5, 'Lunch')
+    assert to_plain({'rows': [row], 'next': None}) == {
+        'rows': [{'id': 1, 'date': '2024-01-05', 'type': 'expense', 'category': 'Food', 'amount': 12.5, 'description': 'Lunch', 'currency': None}],
+        'next': None,
+    }
+
+    handle = io.StringIO()
+    write_csv([row], TransactionRow._fields, handle)
+    assert handle.getvalue() == "id,date,type,category,amount,description,currency\n1,2024-01-05,expense,Food,12.5,Lunch,\n"
+
+    with pytest.raises(ValueError):
+        check_format('xml')
+
+def test_cli_machine_readable_output(tmp_path, capsys):
+    """Test --format json and csv on list, summary and report"""
+    db_path = str(tmp_path / "budget.db")
+    run_command(['--db', db_path, 'set-budget', '200'])
+    run_command(['--db', db_path, 'add', 'expense', '50', 'Food', 'Groceries'])
+    capsys.readouterr()
+
+    run_command(['--db', db_path, 'list', '--format', 'json'])
+    page = json.loads(capsys.readouterr().out)
+    assert [(t['category'], t['amount']) for t in page['transactions']] == [('Food', 50.0)]
+
+    run_command(['--db', db_path, 'summary', '--format', 'json'])
+    summary = json.loads(capsys.readouterr().out)
+    assert (summary['budget'], summary['spent'], summary['remaining'], summary['progress']) == (200.0, 50.0, 150.0, 25.0)
+
+    run_command(['--db', db_path, 'report', 'monthly', '--format', 'csv'])
+    rows = list(csv.DictReader(io.StringIO(capsys.readouterr().out)))
+    assert rows == [{'category': 'Food', 'amount': '50.0', 'type': 'expense'}]
@@ -0,0 +1,31 @@
+import pstats
+from budget_tracker import profiling
+from budget_tracker.database import dispose_engines, get_session
+from budget_tracker.transactions import add_transaction, get_transactions
+
+def test_timers_and_sql_are_recorded_only_while_enabled(tmp_path):
+    """Test that the profile counts timed calls and SQL statements, and nothing when off"""
+    session = get_session(str(tmp_path / "budget.db"))
+    try:
+        add_transaction(session, 'expense', 5.0, 'Food')
+
+        profiling.enable(str(tmp_path / "stats.out"))
+        get_transactions(session)
+        get_transactions(session, category='foo')
+        report = profiling.disable()
+
+        get_transactions(session)
+    finally:
+        session.close()
+        dispose_engines()
+
+    timers = {row.name: row.calls for row in report.timers}
+    assert timers['transactions.get_transactions'] == 2
+    assert timers['transactions.match_category_keys'] == 1
+    assert 'transactions.add_transaction' not in timers
+    assert report.sql_calls == 3
+    assert report.total_ms >= report.sql_ms
+    assert pstats.Stats(str(tmp_path / "stats.out")).total_calls > 0
+
+    profiling.enable()
+    assert profiling.disable().timers == []
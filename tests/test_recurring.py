@@ -0,0 +1,95 @@
+import pytest
+from datetime import date
+from sqlalchemy.orm import sessionmaker
+from budget_tracker.database import NOT_DELETED, Transaction, init_db
+from budget_tracker.recurring import add_rule, delete_rule, get_forecast, get_rules, materialize
+from budget_tracker.transactions import add_transaction, delete_transaction
+
+@pytest.fixture
+def test_session(tmp_path):
+    """Create a test database session"""
+    engine = init_db(str(tmp_path / "budget.db"))
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    yield session
+    session.rollback()
+    session.close()
+
+def posted_dates(session, rule_id):
+    return [
+        row.date.isoformat() for row in session.query(Transaction)
+        .filter(Transaction.recurring_rule_id == rule_id, NOT_DELETED).order_by(Transaction.date)
+    ]
+
+def test_materialize_is_incremental_and_idempotent(test_session):
+    """Test that runs post each occurrence once, matching a single full expansion"""
+    rule = add_rule(
+        test_session, 'expense', 10.0, 'Rent', 'FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,FR;COUNT=9',
+        start_date='2024-01-03'
+    )
+    assert (rule.next_date, rule.end_date) == (date(2024, 1, 5), date(2024, 3, 1))
+
+    assert materialize(test_session, date(2024, 1, 20)) == 3
+    assert materialize(test_session, date(2024, 1, 20)) == 0
+    assert materialize(test_session, date(2024, 12, 31)) == 6
+    assert posted_dates(test_session, rule.id) == [
+        '2024-01-05', '2024-01-15', '2024-01-19', '2024-01-29', '2024-02-02',
+        '2024-02-12', '2024-02-16', '2024-02-26', '2024-03-01',
+    ]
+    assert get_rules(test_session)[0].next_date is None
+
+def test_deleted_occurrences_stay_deleted_until_backfilled(test_session):
+    """Test that the lazy run respects deletions and a range run restores them"""
+    rule = add_rule(test_session, 'income', 1000.0, 'Salary', 'monthly', start_date='2024-01-31')
+    assert materialize(test_session, date(2024, 6, 30)) == 3
+    assert posted_dates(test_session, rule.id) == ['2024-01-31', '2024-03-31', '2024-05-31']
+
+    march = test_session.query(Transaction).filter(Transaction.date == date(2024, 3, 31)).one()
+    delete_transaction(test_session, march.id)
+    assert materialize(test_session, date(2024, 6, 30)) == 0
+    assert materialize(test_session, date(2024, 6, 30), start=date(2024, 1, 1)) == 1
+
+    assert delete_rule(test_session, rule.id)
+    assert len(posted_dates(test_session, rule.id)) == 3
+
+def test_forecast_projects_without_writing(test_session):
+    """Test that the forecast adds pending occurrences to recorded totals"""
+    add_transaction(test_session, 'income', 500.0, 'Gift', transaction_date='2024-01-10')
+    add_rule(test_session, 'income', 1000.0, 'Salary', 'FREQ=MONTHLY;BYMONTHDAY=25', start_date='2024-02-01')
+    add_rule(test_session, 'expense', 100.0, 'Gym', 'FREQ=WEEKLY;BYDAY=MO', start_date='2024-02-01', end_date='2024-02-29')
+    count = test_session.query(Transaction).count()
+
+    rows = get_forecast(test_session, date(2024, 4, 1), date(2024, 2, 1))
+    assert [(row.month, row.income, row.expenses, row.balance) for row in rows] == [
+        ('2024-02', 1000.0, 400.0, 1100.0),
+        ('2024-03', 1000.0, 0.0, 2100.0),
+    ]
+    assert test_session.query(Transaction).count() == count
+
+def test_invalid_rules_are_rejected(test_session):
+    """Test that sub-daily, multi-rule and empty schedules raise ValueError"""
+    with pytest.raises(ValueError):
+        add_rule(test_session, 'expense', 5.0, 'Coffee', 'FREQ=HOURLY')
+    with pytest.raises(ValueError):
+        add_rule(test_session, 'expense', 5.0, 'Coffee', 'FREQ=DAILY;DTSTART=20240101')
+    with pytest.raises(ValueError):
+        add_rule(test_session, 'expense', 5.0, 'Coffee', 'FREQ=YEARLY;BYMONTH=2;BYMONTHDAY=30')
+
+def test_read_only_commands_post_due_rules(tmp_path):
+    """Test that a read-only command still posts due occurrences before reading"""
+    from budget_tracker.cli import run_command
+    from budget_tracker.database import get_session
+
+    db_path = str(tmp_path / "ro.db")
+    session = get_session(db_path)
+    try:
+        add_rule(session, 'expense', 5.0, 'Gym', 'monthly', start_date='2024-01-01', end_date='2024-03-01')
+    finally:
+        session.close()
+
+    assert run_command(['--db', db_path, 'list']) == 0
+    session = get_session(db_path)
+    try:
+        assert session.query(Transaction).count() == 3
+    finally:
+        session.close()
@@ -1,12 +1,17 @@
 import pytest
+from sqlalchemy.orm import sessionmaker
 import os
+from datetime import date
 from budget_tracker.database import init_db
-from budget_tracker.reports import export_to_csv
+from budget_tracker.reports import (
+    export_to_csv, get_category_trends, get_monthly_report, get_period_trends, get_transaction_page, render_period_trends
+)
+from budget_tracker.transactions import add_transaction
 
 @pytest.fixture
-def test_session():
+def test_session(tmp_path):
     """Create a test database session"""
-    engine = init_db()
+    engine = init_db(str(tmp_path / "budget.db"))
     Session = sessionmaker(bind=engine)
     session = Session()
     yield session
@@ -24,3 +29,67 @@ def test_export_to_csv(test_session, tmp_path):
     # Clean up
     if test_file.exists():
         os.remove(test_file)
+
+def test_period_trends(test_session):
+    """Test monthly totals, rolling average and month-over-month change"""
+    add_transaction(test_session, 'expense', 100.0, 'Food', transaction_date='2024-01-10')
+    add_transaction(test_session, 'expense', 300.0, 'Rent', transaction_date='2024-03-01')
+    add_transaction(test_session, 'income', 1000.0, 'Salary', transaction_date='2024-03-02')
+
+    rows = get_period_trends(test_session, date(2024, 1, 1), date(2024, 4, 1), 'month', window=2)
+    assert [row.period for row in rows] == ['2024-01', '2024-02', '2024-03']
+    assert [row.expenses for row in rows] == [100.0, 0.0, 300.0]
+    assert [row.rolling_expenses for row in rows] == [100.0, 50.0, 150.0]
+    assert [row.expense_delta for row in rows] == [None, -100.0, 300.0]
+    assert rows[2].net == 700.0
+
+    partial = get_period_trends(test_session, date(2024, 1, 15), date(2024, 3, 2), 'month')
+    assert [row.expenses for row in partial] == [0.0, 0.0, 300.0]
+
+def test_render_period_trends_unsigned_zero_change(test_session, capsys):
+    """Test that an unchanged period shows its change without a sign"""
+    add_transaction(test_session, 'expense', 100.0, 'Food', transaction_date='2024-01-10')
+    add_transaction(test_session, 'expense', 100.0, 'Food', transaction_date='2024-02-10')
+    add_transaction(test_session, 'expense', 40.0, 'Food', transaction_date='2024-03-10')
+
+    rows = get_period_trends(test_session, date(2024, 1, 1), date(2024, 4, 1), 'month')
+    render_period_trends(rows, '$', 'Trends')
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split()[-2] for line in lines if line.startswith('│ 2024-0')] == ['-', '$0.00', '-$60.00']
+
+def test_weekly_and_category_trends(test_session):
+    """Test week bucketing and per-category percentiles"""
+    add_transaction(test_session, 'expense', 10.0, 'Food', transaction_date='2024-01-01')
+    add_transaction(test_session, 'expense', 20.0, 'Food', transaction_date='2024-01-07')
+    add_transaction(test_session, 'expense', 40.0, 'Food', transaction_date='2024-01-08')
+
+    weeks = get_period_trends(test_session, date(2024, 1, 1), date(2024, 1, 15), 'week')
+    assert [(row.period, row.expenses) for row in weeks] == [('2024-01-01', 30.0), ('2024-01-08', 40.0)]
+
+    [food] = get_category_trends(test_session, date(2024, 1, 1), date(2024, 3, 1))
+    assert food.expenses == 70.0
+    assert food.share == 100.0
+    assert food.monthly_average == 35.0
+    assert food.median_month == 35.0
+
+def test_monthly_report_data(test_session):
+    """Test the monthly report numbers without rendering"""
+    add_transaction(test_session, 'expense', 30.0, 'Food', transaction_date='2024-02-10')
+    add_transaction(test_session, 'expense', 5.0, 'Food', transaction_date='2024-02-11')
+    add_transaction(test_session, 'income', 100.0, 'Salary', transaction_date='2024-02-01')
+
+    report = get_monthly_report(test_session, date(2024, 2, 1))
+    assert report.month == date(2024, 2, 1)
+    assert [tuple(row) for row in report.categories] == [('Salary', -100.0, 'income'), ('Food', 35.0, 'expense')]
+    assert (report.total_income, report.total_expenses, report.net) == (100.0, 35.0, 65.0)
+
+def test_transaction_page(test_session):
+    """Test that a full page carries totals and the next cursor"""
+    for day in range(1, 4):
+        add_transaction(test_session, 'expense', 10.0, 'Food', transaction_date=f'2024-01-0{day}')
+
+    page = get_transaction_page(test_session, limit=2)
+    assert [row.date.day for row in page.transactions] == [3, 2]
+    assert (page.total_income, page.total_expenses) == (0.0, 20.0)
+    assert page.next_cursor == f"2024-01-02,{page.transactions[-1].id}"
+    assert get_transaction_page(test_session, limit=5).next_cursor is None
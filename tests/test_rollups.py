@@ -0,0 +1,43 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+from budget_tracker.database import init_db
+from budget_tracker.rollups import check_rollups, get_category_totals, get_type_totals, rebuild_rollups
+from budget_tracker.transactions import add_transaction, delete_transaction
+
+@pytest.fixture
+def test_session(tmp_path):
+    """Create a test database session"""
+    engine = init_db(str(tmp_path / "budget.db"))
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    yield session
+    session.rollback()
+    session.close()
+
+def test_rollups_follow_inserts_and_deletes(test_session):
+    """Test that adding and deleting transactions maintains the monthly sums"""
+    add_transaction(test_session, 'expense', 10.0, 'Food', transaction_date='2024-01-05')
+    lunch = add_transaction(test_session, 'expense', 15.0, 'Food', transaction_date='2024-01-20')
+    add_transaction(test_session, 'income', 100.0, 'Salary', transaction_date='2024-02-01')
+
+    assert sorted(get_category_totals(test_session, '2024-01')) == [('Food', 'expense', 2500)]
+    assert get_type_totals(test_session) == {'expense': 2500, 'income': 10000}
+
+    delete_transaction(test_session, lunch.id)
+    assert get_type_totals(test_session, '2024-01') == {'expense': 1000}
+    assert check_rollups(test_session) == []
+
+def test_check_and_rebuild_rollups(test_session):
+    """Test that a drifted rollup is detected and repaired by a rebuild"""
+    add_transaction(test_session, 'expense', 10.0, 'Food', transaction_date='2024-01-05')
+    test_session.execute(text("UPDATE monthly_rollups SET total = 9900"))
+    test_session.commit()
+
+    [(key, expected, stored)] = check_rollups(test_session)
+    assert key == ('2024-01', 'Food', 'expense')
+    assert expected == (1000, 1)
+    assert stored == (9900, 1)
+
+    assert rebuild_rollups(test_session) == 1
+    assert check_rollups(test_session) == []
@@ -0,0 +1,46 @@
+import pytest
+from datetime import date
+from sqlalchemy.orm import sessionmaker
+from budget_tracker.database import init_db
+from budget_tracker.search import build_match_query, search_transactions
+from budget_tracker.transactions import add_transaction, delete_transaction
+
+@pytest.fixture
+def test_session(tmp_path):
+    """Create a test database session"""
+    engine = init_db(str(tmp_path / "budget.db"))
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    yield session
+    session.rollback()
+    session.close()
+
+def test_search_terms_prefix_and_phrase(test_session):
+    """Test the term, prefix and phrase search modes"""
+    add_transaction(test_session, 'income', 30.0, 'Shopping', 'Amazon refund', '2024-03-01')
+    add_transaction(test_session, 'expense', 30.0, 'Shopping', 'Refund from amazon marketplace', '2024-02-01')
+    add_transaction(test_session, 'expense', 8.0, 'Food', 'Coffee', '2024-02-02')
+
+    assert len(search_transactions(test_session, 'amazon refund')) == 2
+    assert len(search_transactions(test_session, 'amazon refund', mode='phrase')) == 1
+    assert [t.description for t, _ in search_transactions(test_session, 'cof', mode='prefix')] == ['Coffee']
+    assert search_transactions(test_session, 'cof') == []
+
+def test_search_filters_and_sync(test_session):
+    """Test date/type filters and that deleted rows leave the index"""
+    first = add_transaction(test_session, 'income', 30.0, 'Shopping', 'Amazon refund', '2024-03-01')
+    add_transaction(test_session, 'expense', 30.0, 'Shopping', 'Amazon order', '2024-02-01')
+
+    [(match, _)] = search_transactions(test_session, 'amazon', type='income')
+    assert match.id == first.id
+    assert len(search_transactions(test_session, 'amazon', start_date=date(2024, 2, 15))) == 1
+
+    delete_transaction(test_session, first.id)
+    assert len(search_transactions(test_session, 'refund')) == 0
+
+def test_build_match_query_quotes_input():
+    """Test that user input cannot inject FTS5 operators"""
+    assert build_match_query('a-b OR c') == '"a-b" "OR" "c"'
+    assert build_match_query('amaz', 'prefix') == '"amaz"*'
+    with pytest.raises(ValueError):
+        build_match_query('   ')
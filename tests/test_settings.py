@@ -0,0 +1,60 @@
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.orm import sessionmaker
+from budget_tracker.database import init_db
+from budget_tracker.budgets import get_budget_summary, set_monthly_budget, show_budget_summary
+from budget_tracker.reports import generate_monthly_report
+from budget_tracker.settings import clear_settings_cache, get_currency_symbol, load_settings, set_currency_symbol
+
+@pytest.fixture
+def test_session(tmp_path):
+    """Create a test database session"""
+    engine = init_db(str(tmp_path / "budget.db"))
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    yield session
+    session.rollback()
+    session.close()
+
+@pytest.fixture
+def settings_reads(test_session):
+    """Count SELECTs against the settings table"""
+    statements = []
+    engine = test_session.get_bind()
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and 'FROM settings' in statement:
+            statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', count)
+    yield statements
+    event.remove(engine, 'before_cursor_execute', count)
+
+def test_settings_read_once_per_command(test_session, settings_reads):
+    """Test that the summary and report share one settings read"""
+    clear_settings_cache()
+    show_budget_summary(test_session)
+    generate_monthly_report(test_session)
+    get_budget_summary(test_session, all_time=True)
+    assert len(settings_reads) == 1
+
+def test_setters_refresh_cache(test_session, settings_reads):
+    """Test that setters replace the cached snapshot without another read"""
+    set_monthly_budget(test_session, 250.0)
+    set_currency_symbol(test_session, '€')
+    reads = len(settings_reads)
+
+    settings = load_settings(test_session)
+    assert (settings.currency_symbol, settings.monthly_budget, settings.monthly_budget_minor) == ('€', 250.0, 25000)
+    assert settings.updated_at is not None
+    assert len(settings_reads) == reads
+
+def test_clear_cache_sees_external_writes(test_session):
+    """Test that clearing the cache picks up changes from other writers"""
+    set_currency_symbol(test_session, '$')
+    test_session.execute(text("UPDATE settings SET currency_symbol = 'MAD'"))
+    test_session.commit()
+    assert get_currency_symbol(test_session) == '$'
+
+    clear_settings_cache()
+    assert get_currency_symbol(test_session) == 'MAD'
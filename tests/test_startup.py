@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only load inside the commands that need them.
+HEAVY_MODULES = ['sqlalchemy', 'rich.table', 'rich.panel', 'rich.progress', 'csv', 'budget_tracker.database']
+
+# Generous ceiling on the cumulative import time of budget_tracker.cli; override
+# with BUDGET_IMPORT_BUDGET_MS on slow machines.
+IMPORT_BUDGET_MS = float(os.environ.get('BUDGET_IMPORT_BUDGET_MS', 400))
+
+def _importtime(*args):
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-m', 'budget_tracker', *args],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, module = line.split('|')
+            if cumulative.strip().isdigit():
+                timings[module.strip()] = int(cumulative) / 1000
+    return timings
+
+def test_version_does_not_import_heavy_modules():
+    """Test that `budget version` never loads SQLAlchemy or rich tables"""
+    timings = _importtime('version')
+    assert 'budget_tracker.cli' in timings
+    assert [module for module in HEAVY_MODULES if module in timings] == []
+
+def test_cli_import_time_budget():
+    """Test that importing the CLI stays within the startup budget"""
+    timings = _importtime('version')
+    assert timings['budget_tracker.cli'] < IMPORT_BUDGET_MS
@@ -1,13 +1,19 @@
+import io
 import pytest
+from sqlalchemy.orm import sessionmaker
 from datetime import date
 from sqlalchemy.orm import Session
-from budget_tracker.database import Transaction, init_db
-from budget_tracker.transactions import add_transaction, get_transactions, delete_transaction
+from budget_tracker.database import MonthlyRollup, Transaction, init_db
+from budget_tracker.search import search_transactions
+from budget_tracker.transactions import (
+    TransactionBatch, add_transaction, add_transactions, compact, delete_transactions, get_transactions,
+    delete_transaction, format_cursor, get_undo_journal, parse_cursor, parse_id_ranges, undo_delete
+)
 
 @pytest.fixture
-def test_session():
+def test_session(tmp_path):
     """Create a test database session"""
-    engine = init_db()
+    engine = init_db(str(tmp_path / "budget.db"))
     Session = sessionmaker(bind=engine)
     session = Session()
     yield session
@@ -45,3 +51,159 @@ def test_delete_transaction(test_session: Session):
 
     transactions = get_transactions(test_session)
     assert len(transactions) == 0
+
+def test_get_transactions_keyset_pagination(test_session: Session):
+    """Test that pages continue after the (date, id) cursor without gaps"""
+    for day in ('2024-01-01', '2024-01-02', '2024-01-02', '2024-01-03'):
+        add_transaction(test_session, 'expense', 10.0, 'Food', transaction_date=day)
+
+    first_page = get_transactions(test_session, limit=2)
+    second_page = get_transactions(test_session, limit=2, after=parse_cursor(format_cursor(first_page[-1])))
+
+    seen = [t.id for t in first_page + second_page]
+    assert seen == [4, 3, 2, 1]
+
+def test_get_transactions_category_match(test_session: Session):
+    """Test exact, prefix and contains category matching ignore case"""
+    add_transaction(test_session, 'expense', 10.0, 'Groceries')
+    add_transaction(test_session, 'expense', 10.0, 'Gym')
+    add_transaction(test_session, 'expense', 10.0, 'Seafood')
+
+    assert [t.category for t in get_transactions(test_session, category='groceries', category_match='exact')] == ['Groceries']
+    assert {t.category for t in get_transactions(test_session, category='G', category_match='prefix')} == {'Groceries', 'Gym'}
+    assert [t.category for t in get_transactions(test_session, category='FOOD', category_match='prefix')] == []
+    # Substring matching is the default, as it always was.
+    assert [t.category for t in get_transactions(test_session, category='FOOD')] == ['Seafood']
+
+def test_amount_stored_in_minor_units(test_session: Session):
+    """Test that amounts are stored as integer cents"""
+    transaction = add_transaction(test_session, 'expense', 19.99, 'Food')
+    assert transaction.amount_minor == 1999
+    assert transaction.amount == 19.99
+
+    with pytest.raises(ValueError):
+        add_transaction(test_session, 'expense', 0.001, 'Food')
+
+def test_add_transactions_commits_in_batches(test_session: Session):
+    """Test that the unit of work commits every batch_size records and flushes the rest on exit"""
+    commits = []
+    with TransactionBatch(test_session, batch_size=2, window=60, on_commit=commits.append) as batch:
+        for amount in ('1', '2', '3'):
+            batch.add('expense', amount, ' Food ', transaction_date='2024-01-05')
+        assert commits == [2] and len(batch.pending) == 1
+    assert commits == [2, 1]
+
+    records = [{'type': 'income', 'amount': 10, 'category': 'Salary', 'transaction_date': '2024-01-06'}] * 5
+    assert add_transactions(test_session, records, batch_size=2) == 5
+
+    food = test_session.query(Transaction).filter(Transaction.category_key == 'food').all()
+    assert [t.amount_minor for t in food] == [100, 200, 300]
+    rollup = test_session.get(MonthlyRollup, ('default', '2024-01', 'Salary', 'income'))
+    assert rollup.total == 5000
+
+def test_transaction_batch_window_and_failure(test_session: Session):
+    """Test the time window flush, and that an error discards only the uncommitted batch"""
+    with TransactionBatch(test_session, batch_size=100, window=0) as batch:
+        batch.add('expense', '5', 'Food')
+        assert batch.committed == 1
+
+    with pytest.raises(ValueError):
+        with TransactionBatch(test_session, batch_size=2, window=60) as batch:
+            for amount in ('1', '2', '3', '-4'):
+                batch.add('expense', amount, 'Food')
+    assert test_session.query(Transaction).count() == 3
+
+def test_add_stdin(tmp_path, monkeypatch, capsys):
+    """Test that `budget add --stdin` inserts JSON lines and reports bad ones"""
+    from budget_tracker.cli import run_command
+
+    db_path = str(tmp_path / "budget.db")
+    monkeypatch.setattr('sys.stdin', io.StringIO(
+        '{"type": "expense", "amount": 4.5, "category": "Coffee", "date": "2024-02-01"}\n'
+        '\n'
+        '{"type": "income", "amount": "100", "category": "Salary", "description": "Pay"}\n'
+        '{"type": "expense", "amount": 1}\n'
+        'not json\n'
+    ))
+    assert run_command(['--db', db_path, 'add', '--stdin', '--batch-size', '1']) == 0
+    output = capsys.readouterr().out
+    assert 'Added 2 transactions' in output and 'Skipped 2 invalid lines' in output
+
+    session = sessionmaker(bind=init_db(db_path))()
+    try:
+        assert sorted(t.amount_minor for t in session.query(Transaction)) == [450, 10000]
+    finally:
+        session.close()
+
+def test_add_stdin_commits_quiet_stream_within_window(tmp_path, monkeypatch, capsys):
+    """Test that a record is committed after --batch-window even while stdin stays open"""
+    import os
+    import sqlite3
+    import threading
+    import time
+    from budget_tracker.cli import run_command
+
+    db_path = str(tmp_path / "budget.db")
+    read_fd, write_fd = os.pipe()
+    monkeypatch.setattr('sys.stdin', os.fdopen(read_fd))
+    thread = threading.Thread(target=run_command, args=(['--db', db_path, 'add', '--stdin', '--batch-window', '0.1'],))
+    thread.start()
+    try:
+        os.write(write_fd, b'{"type": "expense", "amount": 3, "category": "Coffee"}\n')
+        count = 0
+        for _ in range(50):
+            time.sleep(0.1)
+            try:
+                with sqlite3.connect(f"file:{db_path}?mode=ro", uri=True) as connection:
+                    count = connection.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+            except sqlite3.OperationalError:
+                # Not created yet.
+                continue
+            if count:
+                break
+        assert count == 1
+    finally:
+        os.close(write_fd)
+        thread.join(10)
+    assert 'Added 1 transactions' in capsys.readouterr().out
+
+def test_bulk_delete_tombstones_and_undo(test_session: Session):
+    """Test set-based deletes by range and filter, and that undo restores rows, rollups and search"""
+    for day, category in [('2024-01-05', 'Food'), ('2024-01-10', 'Coffee'), ('2024-01-20', 'Coffee'), ('2024-02-01', 'Coffee')]:
+        add_transaction(test_session, 'expense', 10.0, category, 'beans', transaction_date=day)
+    rollup = lambda: test_session.get(MonthlyRollup, ('default', '2024-01', 'Coffee', 'expense'))
+
+    assert parse_id_ranges(['1', '3-4,7']) == [(1, 1), (3, 4), (7, 7)]
+    with pytest.raises(ValueError):
+        parse_id_ranges(['4-2'])
+    with pytest.raises(ValueError):
+        delete_transactions(test_session)
+
+    assert delete_transactions(test_session, category='coffee', start_date=date(2024, 1, 1), end_date=date(2024, 2, 1)) == 2
+    assert [t.id for t in get_transactions(test_session)] == [4, 1]
+    assert rollup() is None
+    assert len(search_transactions(test_session, 'beans')) == 2
+    assert delete_transactions(test_session, ids=[(1, 3)]) == 1
+    assert [entry.count for entry in get_undo_journal(test_session)] == [1, 2]
+
+    assert undo_delete(test_session).count == 1
+    assert undo_delete(test_session).description == 'from 2024-01-01, to 2024-01-31, category coffee'
+    assert undo_delete(test_session) is None
+    assert len(get_transactions(test_session)) == 4
+    assert (rollup().total, rollup().count) == (2000, 2)
+    assert len(search_transactions(test_session, 'beans')) == 4
+
+def test_hard_delete_and_compact(test_session: Session):
+    """Test that hard deletes skip the journal and compact purges tombstones"""
+    for amount in (1, 2, 3):
+        add_transaction(test_session, 'income', amount, 'Gift', transaction_date='2024-03-01')
+    assert delete_transactions(test_session, ids=[(1, 1)], hard=True) == 1
+    assert delete_transaction(test_session, 2)
+    assert test_session.query(Transaction).count() == 2
+
+    result = compact(test_session)
+    assert result.purged == 1 and result.bytes_after > 0
+    assert undo_delete(test_session) is None
+    assert [t.id for t in test_session.query(Transaction)] == [3]
+    rollup = test_session.get(MonthlyRollup, ('default', '2024-03', 'Gift', 'income'))
+    assert (rollup.total, rollup.count) == (300, 1)
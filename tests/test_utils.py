@@ -0,0 +1,51 @@
+import pytest
+from datetime import date
+from budget_tracker.utils import (
+    chunked, currency_exponent, format_minor, from_minor, parse_amounts_minor, parse_date, parse_dates,
+    to_minor, validate_amount, validate_date
+)
+
+def test_parse_date_formats_and_order(monkeypatch):
+    """Test ISO, unpadded ISO and slash dates, with the configured order for ambiguous ones"""
+    assert parse_date('2024-03-04') == date(2024, 3, 4)
+    assert parse_date('2024-3-4') == date(2024, 3, 4)
+    assert parse_date('03/04/2024') == date(2024, 3, 4)
+    assert parse_date('03/04/2024', 'dmy') == date(2024, 4, 3)
+    assert parse_date('13/04/2024') == parse_date('04/13/2024', 'dmy') == date(2024, 4, 13)
+
+    monkeypatch.setenv('BUDGET_DATE_ORDER', 'dmy')
+    assert validate_date('03/04/2024') == date(2024, 4, 3)
+    for value in ('2024-13-01', '2024/01/05', '31/31/2024', 'soon'):
+        with pytest.raises(ValueError):
+            parse_date(value)
+
+def test_batch_parsers_return_values_and_row_errors():
+    """Test that a column parses to aligned values with per-row errors"""
+    dates = parse_dates(['2024-01-31', '', '1/2/2024', 'bad'], order='dmy')
+    assert dates.values == [date(2024, 1, 31), None, date(2024, 2, 1), None]
+    assert [index for index, _ in dates.errors] == [1, 3]
+
+    raw = ['12', '12.345', '0.005', '+.5', '1e2', '0', '0.004', 'abc', 'nan', '-5']
+    amounts = parse_amounts_minor(raw)
+    assert amounts.values[:5] == [to_minor(value) for value in ('12', '12.345', '0.005', '.5', '1e2')]
+    assert [index for index, _ in amounts.errors] == [5, 6, 7, 8, 9]
+    assert parse_amounts_minor(['1.5'], exponent=0).values == [2]
+    assert list(chunked(iter(range(5)), 2)) == [[0, 1], [2, 3], [4]]
+
+def test_validate_amount_messages():
+    """Test that non-numbers and non-positive amounts get distinct errors"""
+    assert validate_amount('12.50') == 12.5
+    assert validate_amount('1e3') == 1000.0
+    with pytest.raises(ValueError, match='valid number'):
+        validate_amount('inf')
+    with pytest.raises(ValueError, match='positive'):
+        validate_amount('-3')
+
+def test_minor_units_follow_currency_exponent():
+    """Test that zero- and three-decimal currencies convert with their own exponent"""
+    assert [currency_exponent(code) for code in (None, 'usd', 'JPY', 'KWD')] == [2, 2, 0, 3]
+    assert to_minor('1600', currency_exponent('JPY')) == 1600
+    assert to_minor('1.2345', currency_exponent('KWD')) == 1235
+    assert from_minor(1235, 3) == 1.235
+    assert format_minor(1600, 0) == '1600'
+    assert parse_amounts_minor(['12.5', '0.4'], 0) == ([13, None], [(1, "Amount is smaller than the currency's minor unit")])